@@ -0,0 +1,152 @@
+"""
+End-to-end latency harness: CaaSClient against local CaaS/Mattermost fakes
+
+    python -m benchmarks.e2e_latency                              # 30s, steady arrivals every 2s
+    python -m benchmarks.e2e_latency --pattern poisson --interval 1 --duration 60
+    python -m benchmarks.e2e_latency --caas-latency-ms 80 --caas-error-rate 0.05 --poll-interval 0.5
+    python -m benchmarks.e2e_latency --competitor-ms 500          # tasks get taken by someone else after 500ms
+
+Reports, from the fake server's clock:
+  detection  - task published -> first returned by /work/available
+  accept     - task published -> accepted via /work/start
+  and the number / rate of webhook posts the Mattermost fake received.
+State files are written to a temporary directory, never to src/data.
+"""
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# Accept around the clock so results do not depend on when the harness runs
+for _name in ("DEFAULT", "EXTENDED"):
+    os.environ[f"AUTO_ACCEPT_{_name}_START"] = "00:00"
+    os.environ[f"AUTO_ACCEPT_{_name}_END"] = "23:59"
+os.environ.setdefault("STATE_BACKEND", "json")
+
+from benchmarks.fake_servers import ArrivalPattern, FakeCaaSServer, FakeMattermostServer  # noqa: E402
+from benchmarks.synthetic import make_work  # noqa: E402
+from src.clients.caas_client import CaaSClient  # noqa: E402
+from src.clients.mattermost_client import MattermostClient  # noqa: E402
+from src.clients.task_keywords import BACKEND_KEYWORDS, FRONTEND_KEYWORDS  # noqa: E402
+from src.utils.metrics import POLLS  # noqa: E402
+
+
+def acceptable_work(task_id, rng):
+    """A work item whose skills always qualify for auto-accept"""
+    work = make_work(task_id, rng)
+    work["skills"] = [rng.choice(FRONTEND_KEYWORDS + BACKEND_KEYWORDS) for _ in range(rng.randint(1, 4))]
+    return work
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def _format_ms(value):
+    return "-" if value is None else f"{value * 1000:.1f}ms"
+
+
+def summarize(name, values):
+    return (
+        f"{name:<10} n={len(values):<5} p50={_format_ms(percentile(values, 50)):>10} "
+        f"p95={_format_ms(percentile(values, 95)):>10} max={_format_ms(max(values) if values else None):>10}"
+    )
+
+
+def run(args):
+    arrival = ArrivalPattern(args.pattern, interval=args.interval, burst_size=args.burst_size, seed=args.seed)
+    caas = FakeCaaSServer(
+        arrival=arrival,
+        competitor_delay_ms=args.competitor_ms,
+        task_ttl_s=args.task_ttl,
+        work_factory=make_work if args.mix == "random" else acceptable_work,
+        latency_ms=args.caas_latency_ms,
+        error_rate=args.caas_error_rate,
+        seed=args.seed,
+        etag=args.etag,
+    ).start()
+    mattermost = FakeMattermostServer(
+        latency_ms=args.mattermost_latency_ms,
+        error_rate=args.mattermost_error_rate,
+        seed=args.seed + 1,
+    ).start()
+
+    workdir = tempfile.mkdtemp(prefix="caas-e2e-")
+    previous_cwd = os.getcwd()
+    os.chdir(workdir)
+    client = None
+    polls = 0
+    try:
+        client = CaaSClient(base_url=caas.base_url, mattermost=MattermostClient(webhook_url=mattermost.webhook_url))
+        client.mattermost.start_sender()
+        if not client.login():
+            print("Login against the fake CaaS server failed")
+            return 1
+
+        deadline = time.time() + args.duration
+        while time.time() < deadline:
+            started = time.time()
+            client.get_available_tasks_and_send_notification()
+            polls += 1
+            time.sleep(max(0.0, args.poll_interval - (time.time() - started)))
+    finally:
+        if client:
+            client.close()
+            client.mattermost.close()
+        os.chdir(previous_cwd)
+        caas.stop()
+        mattermost.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    tasks = list(caas.tasks.values())
+    detection = [t["first_seen_at"] - t["appeared_at"] for t in tasks if t["first_seen_at"]]
+    accept = [t["accepted_at"] - t["appeared_at"] for t in tasks if t["accepted_at"]]
+    detect_to_accept = [t["accepted_at"] - t["first_seen_at"] for t in tasks if t["accepted_at"]]
+    lost = sum(1 for t in tasks if t["taken_by_competitor"])
+
+    print(f"Published {len(tasks)} tasks over {args.duration:.0f}s, {polls} polls, pattern={args.pattern}")
+    print(summarize("detection", detection))
+    print(summarize("accept", accept))
+    print(summarize("seen->acc", detect_to_accept))
+    print(f"Accepted {len(accept)}/{len(tasks)}, taken by competitor {lost}")
+    print(f"Webhook posts: {len(mattermost.posts)} ({len(mattermost.posts) / args.duration:.2f}/s)")
+    print(f"CaaS requests: {dict(sorted(caas.request_counts.items()))}")
+    print(f"Poll results: {({result: int(POLLS.value(result=result)) for result in ('task', 'empty', 'unchanged', 'error')})}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure detection-to-accept latency against local fakes")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to poll for")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds between polls")
+    parser.add_argument("--pattern", choices=["steady", "burst", "poisson"], default="steady", help="Task arrival pattern")
+    parser.add_argument("--interval", type=float, default=2.0, help="Mean seconds between arrivals (between bursts for 'burst')")
+    parser.add_argument("--burst-size", type=int, default=5, help="Tasks per burst")
+    parser.add_argument("--mix", choices=["acceptable", "random"], default="acceptable", help="Only auto-acceptable tasks, or the random synthetic mix")
+    parser.add_argument("--task-ttl", type=float, default=30.0, help="Seconds before an unaccepted task disappears")
+    parser.add_argument("--competitor-ms", type=float, default=None, help="Another worker takes each task after this many ms")
+    parser.add_argument("--caas-latency-ms", type=float, default=0.0)
+    parser.add_argument("--caas-error-rate", type=float, default=0.0, help="Fraction of CaaS requests answered with 503")
+    parser.add_argument("--mattermost-latency-ms", type=float, default=0.0)
+    parser.add_argument("--mattermost-error-rate", type=float, default=0.0, help="Fraction of webhook posts answered with 503")
+    parser.add_argument("--etag", action="store_true", help="Have the fake CaaS server send ETags and answer If-None-Match with 304")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true", help="Show the client's log output")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+    )
+    return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
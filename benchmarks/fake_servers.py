@@ -0,0 +1,247 @@
+"""In-process stand-ins for the CaaS API and the Mattermost incoming webhook.
+
+Both servers run on 127.0.0.1 in a background thread and support configurable
+response latency and error rates. The CaaS fake publishes synthetic tasks
+following an arrival pattern and records when each task appeared, was first
+returned by /work/available and was accepted, so a harness can measure
+detection-to-accept latency from the server's point of view.
+"""
+
+import base64
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.synthetic import make_work
+
+
+def _fake_jwt(expires_in=3600):
+    def encode(data):
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip("=")
+
+    return f"{encode({'alg': 'none'})}.{encode({'exp': int(time.time() + expires_in)})}.fake"
+
+
+class ArrivalPattern:
+    """Schedule of task arrival times (seconds after server start)"""
+
+    def __init__(self, kind="steady", interval=5.0, burst_size=5, seed=0):
+        if kind not in ("steady", "burst", "poisson"):
+            raise ValueError(f"Unknown arrival pattern: {kind}")
+        self.kind = kind
+        self.interval = interval
+        self.burst_size = burst_size
+        self._rng = random.Random(seed)
+        self._next = interval
+        self._pending_in_burst = 0
+
+    def next_arrival(self):
+        if self.kind == "burst":
+            if self._pending_in_burst == 0:
+                self._pending_in_burst = self.burst_size
+                self._burst_at = self._next
+                self._next += self.interval
+            self._pending_in_burst -= 1
+            return self._burst_at
+
+        arrival = self._next
+        step = self._rng.expovariate(1.0 / self.interval) if self.kind == "poisson" else self.interval
+        self._next += step
+        return arrival
+
+
+class _FakeServer:
+    def __init__(self, latency_ms=0.0, error_rate=0.0, seed=0):
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        handler = self._make_handler()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        self.started_at = time.time()
+        return self
+
+    def stop(self):
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _simulate(self):
+        """Apply latency and decide whether this request fails"""
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+        with self._lock:
+            return self._rng.random() < self.error_rate
+
+    def handle(self, method, path, body, headers):
+        """Return (status, JSON payload or None) or (status, payload, extra response headers)"""
+        raise NotImplementedError
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _dispatch(self, method):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                try:
+                    body = json.loads(raw) if raw else None
+                except ValueError:
+                    body = None
+
+                extra_headers = {}
+                if server._simulate():
+                    status, payload = 503, {"status": "error", "message": "injected failure"}
+                else:
+                    status, payload, *rest = server.handle(method, self.path, body, self.headers)
+                    extra_headers = rest[0] if rest else {}
+
+                data = json.dumps(payload).encode() if payload is not None else b""
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in extra_headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._dispatch("GET")
+
+            def do_POST(self):
+                self._dispatch("POST")
+
+        return Handler
+
+
+class FakeCaaSServer(_FakeServer):
+    """Fake of /signin, /refresh-token, /work/available and /work/start"""
+
+    def __init__(self, arrival=None, max_tasks=None, competitor_delay_ms=None, task_ttl_s=60.0, work_factory=None, etag=False, **kwargs):
+        super().__init__(**kwargs)
+        self.etag = etag
+        self.arrival = arrival or ArrivalPattern()
+        self.max_tasks = max_tasks
+        self.competitor_delay_ms = competitor_delay_ms
+        self.task_ttl_s = task_ttl_s
+        self.work_factory = work_factory or make_work
+        self.tasks = {}
+        self._pending = []
+        self._next_arrival = None
+        self._next_id = 1
+        self.request_counts = {}
+
+    @property
+    def base_url(self):
+        return f"{self.url}/backend/api/v1"
+
+    def _advance(self, now):
+        """Publish every task whose scheduled arrival time has passed"""
+        if self._next_arrival is None:
+            self._next_arrival = self.started_at + self.arrival.next_arrival()
+        while now >= self._next_arrival and (self.max_tasks is None or self._next_id <= self.max_tasks):
+            task_id = self._next_id
+            self._next_id += 1
+            self.tasks[task_id] = {
+                "work": self.work_factory(task_id, self._rng),
+                "appeared_at": self._next_arrival,
+                "first_seen_at": None,
+                "accepted_at": None,
+                "taken_by_competitor": False,
+                "expired": False,
+            }
+            self._pending.append(task_id)
+            self._next_arrival = self.started_at + self.arrival.next_arrival()
+
+        # Tasks nobody accepts (manual-only ones) drop off so they do not hide newer work
+        for task_id in list(self._pending):
+            task = self.tasks[task_id]
+            age = now - task["appeared_at"]
+            if self.competitor_delay_ms is not None and age >= self.competitor_delay_ms / 1000.0:
+                task["taken_by_competitor"] = True
+                self._pending.remove(task_id)
+            elif self.task_ttl_s is not None and age >= self.task_ttl_s:
+                task["expired"] = True
+                self._pending.remove(task_id)
+
+    def handle(self, method, path, body, headers):
+        now = time.time()
+        route = path.split("/backend/api/v1", 1)[-1]
+        with self._lock:
+            self.request_counts[route] = self.request_counts.get(route, 0) + 1
+            self._advance(now)
+
+            if route in ("/signin", "/refresh-token") and method == "POST":
+                return 200, {"status": "ok", "data": {"accessToken": _fake_jwt(), "refreshToken": _fake_jwt(86400), "userId": 1}}
+
+            if not headers.get("authorization"):
+                return 401, {"status": "error", "message": "unauthorized"}
+
+            if route == "/work/available" and method == "GET":
+                if not self._pending:
+                    payload = {"status": "error", "message": "No work available"}
+                else:
+                    task = self.tasks[self._pending[0]]
+                    task["first_seen_at"] = task["first_seen_at"] or now
+                    payload = {"status": "ok", "data": {"work": task["work"]}}
+                if not self.etag:
+                    return 200, payload
+                etag = '"%s"' % hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+                if headers.get("If-None-Match") == etag:
+                    return 304, None, {"ETag": etag}
+                return 200, payload, {"ETag": etag}
+
+            if route == "/work/start" and method == "POST":
+                task_id = (body or {}).get("workId")
+                if task_id not in self._pending:
+                    return 409, {"status": "error", "message": "Work no longer available"}
+                self._pending.remove(task_id)
+                self.tasks[task_id]["accepted_at"] = now
+                return 200, {"status": "ok", "data": {"workToken": "fake"}}
+
+        return 404, {"status": "error", "message": f"Unknown route {method} {route}"}
+
+
+class FakeMattermostServer(_FakeServer):
+    """Fake incoming-webhook receiver that records every post"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.posts = []
+
+    @property
+    def webhook_url(self):
+        return f"{self.url}/hooks/fake"
+
+    def handle(self, method, path, body, headers):
+        if method != "POST":
+            return 405, {"status": "error"}
+        with self._lock:
+            self.posts.append({"received_at": time.time(), "payload": body})
+        return 200, {"status": "ok"}
@@ -0,0 +1,278 @@
+"""
+Micro-benchmarks for the classifier, the task history store and the formatter
+
+    python -m benchmarks.run                          # default sizes, compare with baselines
+    python -m benchmarks.run --sizes 1000,1000000     # custom history/work-item sizes
+    python -m benchmarks.run --save-baseline          # record current numbers as the baseline
+    python -m benchmarks.run --backend sqlite         # history benchmarks on the SQLite store
+
+Numbers are seconds per operation (best of --repeat runs). A result slower than
+its baseline by more than --threshold is reported as a regression and makes the
+command exit with status 1.
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from benchmarks import synthetic
+from src.clients import keyword_matcher
+from src.clients.notification_formatter import format_daily_summary
+from src.clients.task_classifier import get_tags_for_task, get_task_stack_type
+from src.utils import json_codec
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), "baselines.json")
+DEFAULT_SIZES = "1000,10000,100000"
+
+BENCHMARKS = []
+
+
+def benchmark(name):
+    """Register a benchmark; the decorated function gets (size, workdir, backend) and returns a Case"""
+    def decorator(fn):
+        BENCHMARKS.append((name, fn))
+        return fn
+    return decorator
+
+
+class Case:
+    """A prepared benchmark: `run` is timed, `reset` (untimed) runs before every repeat"""
+
+    def __init__(self, run, ops, reset=None):
+        self.run = run
+        self.ops = ops
+        self.reset = reset
+
+
+def _history_store(workdir, backend, size):
+    """Create a history store pre-filled with `size` synthetic entries"""
+    if backend == "sqlite":
+        from src.clients.sqlite_store import SQLiteTaskHistory
+
+        history = SQLiteTaskHistory(os.path.join(workdir, f"history-{size}.db"))
+        history.initialize()
+        history.import_entries(synthetic.iter_history_entries(size))
+        return history
+
+    from src.clients.task_history import TaskHistory
+
+    path = os.path.join(workdir, f"history-{size}.jsonl")
+    synthetic.write_jsonl_history(path, size)
+    # Split into day segments and build the rollups once, as a long-lived store would have them
+    history = TaskHistory(os.path.join(workdir, f"history-{size}"), legacy_files=(path,))
+    history.initialize()
+    return history
+
+
+def _history_factory(workdir, backend, size):
+    """Return a function that restores a pristine pre-filled store for destructive benchmarks"""
+    template = _history_store(workdir, backend, size)
+    if backend == "sqlite":
+        source = template.db.db_path
+        template.db.close()
+    else:
+        source = template.history_dir
+
+    def fresh():
+        target = source + ".run"
+        if backend == "sqlite":
+            from src.clients.sqlite_store import SQLiteTaskHistory
+
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(target + suffix):
+                    os.remove(target + suffix)
+            shutil.copyfile(source, target)
+            return SQLiteTaskHistory(target)
+        from src.clients.task_history import TaskHistory
+
+        shutil.rmtree(target, ignore_errors=True)
+        shutil.copytree(source, target)
+        return TaskHistory(target, legacy_files=())
+
+    return fresh
+
+
+@benchmark("classifier.get_task_stack_type.cold")
+def bench_stack_type_cold(size, workdir, backend):
+    works = synthetic.make_works(size)
+    return Case(lambda: [get_task_stack_type(w) for w in works], len(works), reset=keyword_matcher.feature_cache.clear)
+
+
+@benchmark("classifier.get_task_stack_type.warm")
+def bench_stack_type_warm(size, workdir, backend):
+    works = synthetic.make_works(min(size, keyword_matcher.feature_cache.maxsize))
+    for work in works:
+        get_task_stack_type(work)
+    return Case(lambda: [get_task_stack_type(w) for w in works], len(works))
+
+
+@benchmark("classifier.get_tags_for_task.cold")
+def bench_tags_cold(size, workdir, backend):
+    works = synthetic.make_works(size)
+    return Case(lambda: [get_tags_for_task(w) for w in works], len(works), reset=keyword_matcher.feature_cache.clear)
+
+
+@benchmark("history.log_task")
+def bench_log_task(size, workdir, backend):
+    fresh = _history_factory(workdir, backend, size)
+    new_works = synthetic.make_works(size + 100)[size:]
+    state = {}
+
+    def reset():
+        state["history"] = fresh()
+        state["history"].has_task(None)  # build the index outside the timed section
+
+    return Case(lambda: [state["history"].log_task(w) for w in new_works], len(new_works), reset=reset)
+
+
+@benchmark("history.index_build")
+def bench_index_build(size, workdir, backend):
+    fresh = _history_factory(workdir, backend, size)
+    state = {}
+
+    def reset():
+        state["history"] = fresh()
+
+    return Case(lambda: state["history"].has_task(-1), 1, reset=reset)
+
+
+@benchmark("history.has_task")
+def bench_has_task(size, workdir, backend):
+    history = _history_store(workdir, backend, size)
+    history.has_task(-1)
+    ids = list(range(1, size + 1, max(1, size // 1000)))
+    return Case(lambda: [history.has_task(task_id) for task_id in ids], len(ids))
+
+
+@benchmark("history.get_last_24_hours_summary")
+def bench_summary(size, workdir, backend):
+    history = _history_store(workdir, backend, size)
+    return Case(history.get_last_24_hours_summary, 1)
+
+
+@benchmark("history.cleanup_old_tasks")
+def bench_cleanup(size, workdir, backend):
+    fresh = _history_factory(workdir, backend, size)
+    state = {}
+
+    def reset():
+        state["history"] = fresh()
+
+    return Case(lambda: state["history"].cleanup_old_tasks(7), 1, reset=reset)
+
+
+@benchmark("formatter.format_daily_summary")
+def bench_format_summary(size, workdir, backend):
+    history = _history_store(workdir, backend, size)
+    summary = history.get_last_24_hours_summary()
+    return Case(lambda: format_daily_summary(summary), 1)
+
+
+def time_case(case, repeat):
+    best = None
+    for _ in range(repeat):
+        if case.reset:
+            case.reset()
+        started = time.perf_counter()
+        case.run()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best / case.ops
+
+
+def run_benchmarks(sizes, repeat, backend, only=None):
+    results = {}
+    workdir = tempfile.mkdtemp(prefix="caas-bench-")
+    try:
+        for size in sizes:
+            for name, fn in BENCHMARKS:
+                if only and only not in name:
+                    continue
+                key = f"{name}[{size}]"
+                case = fn(size, workdir, backend)
+                results[key] = time_case(case, repeat)
+                print(f"{key:<55} {_format_seconds(results[key]):>12}/op", flush=True)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def _format_seconds(value):
+    if value >= 1:
+        return f"{value:.2f}s"
+    if value >= 1e-3:
+        return f"{value * 1e3:.2f}ms"
+    return f"{value * 1e6:.2f}us"
+
+
+def load_baselines(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_baselines(path, results, backend):
+    data = load_baselines(path)
+    data.setdefault(backend, {}).update(results)
+    data["_recorded_at"] = datetime.now(timezone.utc).isoformat()
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+
+
+def find_regressions(results, baselines, threshold):
+    regressions = []
+    for key, value in results.items():
+        baseline = baselines.get(key)
+        if baseline and value > baseline * (1 + threshold):
+            regressions.append((key, baseline, value))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run CaaS automation micro-benchmarks")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Comma-separated history/work-item sizes")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per benchmark; the best one counts")
+    parser.add_argument("--backend", choices=["json", "sqlite"], default="json", help="History store to benchmark")
+    parser.add_argument("--json-codec", choices=["auto"] + list(json_codec.BACKENDS), help="JSON codec to use (default: JSON_CODEC)")
+    parser.add_argument("--only", help="Only run benchmarks whose name contains this text")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="Baseline file to compare with / save to")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown before flagging (0.25 = 25%%)")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.WARNING)
+    if args.json_codec:
+        json_codec.use_backend(args.json_codec)
+    print(f"JSON codec: {json_codec.BACKEND}")
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    results = run_benchmarks(sizes, max(1, args.repeat), args.backend, args.only)
+
+    if args.save_baseline:
+        save_baselines(args.baseline, results, args.backend)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    baselines = load_baselines(args.baseline).get(args.backend, {})
+    if not baselines:
+        print("\nNo baseline recorded yet, run with --save-baseline to create one")
+        return 0
+
+    regressions = find_regressions(results, baselines, args.threshold)
+    if not regressions:
+        print(f"\nNo regressions above {args.threshold:.0%}")
+        return 0
+
+    print(f"\nRegressions above {args.threshold:.0%}:")
+    for key, baseline, value in regressions:
+        print(f"  {key}: {_format_seconds(baseline)} -> {_format_seconds(value)} (+{value / baseline - 1:.0%})")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
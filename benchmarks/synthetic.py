@@ -0,0 +1,60 @@
+"""Synthetic work items and history files for benchmarks."""
+
+import json
+import os
+import random
+from datetime import datetime, timedelta, timezone
+
+from src.clients.task_keywords import ANDROID_KEYWORDS, BACKEND_KEYWORDS, FRONTEND_KEYWORDS, QA_KEYWORDS
+
+FILLER_SKILLS = ["haskell", "excel", "copywriting", "data entry", "blockchain", "solidity"]
+FILLER_WORDS = "implement fix update refactor page screen endpoint flow migration report button form".split()
+STACKS = ["frontend", "backend", "android", "qa"]
+
+
+def make_work(task_id, rng):
+    """Build one work item shaped like the /work/available payload"""
+    pools = [FRONTEND_KEYWORDS, BACKEND_KEYWORDS, ANDROID_KEYWORDS, QA_KEYWORDS, FILLER_SKILLS]
+    skills = [rng.choice(rng.choice(pools)) for _ in range(rng.randint(1, 5))]
+    words = [rng.choice(FILLER_WORDS + FRONTEND_KEYWORDS + BACKEND_KEYWORDS) for _ in range(40)]
+    return {
+        "id": task_id,
+        "title": " ".join(words[:6]).capitalize(),
+        "description": " ".join(words),
+        "priority": rng.randint(1, 4),
+        "skills": skills,
+        "repoUrl": f"https://example.com/repo/{task_id}",
+        "branchName": f"task-{task_id}",
+    }
+
+
+def make_works(count, seed=0):
+    rng = random.Random(seed)
+    return [make_work(task_id, rng) for task_id in range(1, count + 1)]
+
+
+def make_history_entry(task_id, timestamp, rng):
+    return {
+        "task_id": task_id,
+        "title": f"Synthetic task {task_id}",
+        "stack_type": rng.choice(STACKS),
+        "timestamp": timestamp.isoformat(),
+        "priority": rng.randint(1, 4),
+        "skills": [rng.choice(FRONTEND_KEYWORDS + BACKEND_KEYWORDS) for _ in range(3)],
+    }
+
+
+def iter_history_entries(count, days=30, seed=0, now=None):
+    """Yield `count` entries spread evenly over the last `days` days, oldest first"""
+    rng = random.Random(seed)
+    now = now or datetime.now(timezone.utc)
+    span = timedelta(days=days)
+    for i in range(count):
+        yield make_history_entry(i + 1, now - span + span * (i + 1) / count, rng)
+
+
+def write_jsonl_history(path, count, days=30, seed=0):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        for entry in iter_history_entries(count, days, seed):
+            f.write(json.dumps(entry) + "\n")
@@ -1,14 +1,18 @@
 #!/usr/bin/env python3
 """
 CaaS Task Check Script
-This script can be run directly or via cron job
+This script can be run directly, via cron job, or as a long-running poller (--daemon)
 """
 
+import argparse
 import logging
+import signal
 import sys
+import threading
+import time
 
-from src.clients.caas_client import CaaSClient
-from src.utils.timezone_utils import now_pakistan
+# Everything else (config, HTTP clients, asyncio) is imported where it is first
+# needed: a cron run pays this startup once a minute, see --startup-profile
 
 # Configure logging
 logging.basicConfig(
@@ -22,45 +26,453 @@ logging.basicConfig(
 
 logger = logging.getLogger()
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Check CaaS for available tasks")
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Keep running and poll continuously instead of checking once",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        help="Seconds between polls in daemon mode (default: POLL_INTERVAL_SECONDS)",
+    )
+    parser.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help="Run the daemon on the asyncio clients (requires aiohttp)",
+    )
+    parser.add_argument(
+        "--accounts",
+        help="JSON file of CaaS accounts to poll concurrently (default: CAAS_ACCOUNTS_FILE)",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        help="Serve Prometheus metrics on this port in daemon mode, 0 = off (default: METRICS_PORT)",
+    )
+    parser.add_argument(
+        "--startup-profile",
+        action="store_true",
+        help="Report import and init time per module and phase instead of polling",
+    )
+    parser.add_argument(
+        "--startup-budget-ms",
+        type=float,
+        help="With --startup-profile, exit with status 1 when startup takes longer (default: STARTUP_BUDGET_MS)",
+    )
+    return parser.parse_args(argv)
+
+
+def apply_config_defaults(args):
+    """Fill the options left unset on the command line from the configuration"""
+    from src import config
+
+    if args.interval is None:
+        args.interval = config.POLL_INTERVAL_SECONDS
+    if args.accounts is None:
+        args.accounts = config.ACCOUNTS_FILE or None
+    if args.metrics_port is None:
+        args.metrics_port = config.METRICS_PORT
+    if args.startup_budget_ms is None:
+        args.startup_budget_ms = config.STARTUP_BUDGET_MS
+    return args
+
+
+def export_metrics():
+    """Write the metrics textfile, if one is configured"""
+    from src.config import METRICS_TEXTFILE
+
+    if METRICS_TEXTFILE:
+        from src.utils import metrics
+
+        metrics.write_textfile(METRICS_TEXTFILE)
+
+
+def start_metrics_server(port):
+    if port:
+        from src.config import METRICS_ADDR
+        from src.utils import metrics
+
+        try:
+            metrics.start_http_server(port, METRICS_ADDR)
+        except OSError as e:
+            logger.error(f"Could not start metrics server on port {port}: {str(e)}")
+
+
+def build_run_lock():
+    """The configured single-instance lock (a no-op lock when RUN_LOCK_ENABLED is off)"""
+    from src.config import RUN_LOCK_CONFIG, RUN_LOCK_ENABLED
+    from src.utils.run_lock import RunLock
+
+    if not RUN_LOCK_ENABLED:
+        return RunLock(None)
+    return RunLock(RUN_LOCK_CONFIG["path"], RUN_LOCK_CONFIG["policy"], RUN_LOCK_CONFIG["wait_ms"])
+
+
+def take_run_lock(lock):
+    """Acquire the run lock under its policy; a busy lock counts as a skipped run"""
+    from src.utils.metrics import PHASE_SECONDS, SKIPPED_RUNS
+
+    with PHASE_SECONDS.time(phase="lock_wait"):
+        acquired = lock.acquire()
+    if not acquired:
+        SKIPPED_RUNS.inc()
+        logger.warning(f"Another poll run (pid {lock.holder() or '?'}) holds {lock.path}, skipping this one")
+    return acquired
+
+
+def run_check(client):
+    """Run one poll cycle followed by the time-based daily jobs"""
+    from src.clients.task_rules import UNCHANGED
+    from src.utils.timezone_utils import now_pakistan
+
+    # Get available tasks and send notifications
+    logger.info("Checking for available tasks...")
+    tasks = client.get_available_tasks_and_send_notification()
+    if tasks == UNCHANGED:
+        logger.info("Available tasks unchanged since the last poll")
+    elif tasks:
+        logger.info("Successfully checked for tasks and sent notifications")
+    else:
+        logger.info("No tasks available")
+
+    # Check Pakistan time (UTC+5) for daily summary
+    pakistan_now = now_pakistan()
+    current_hour_pakistan = pakistan_now.hour
+    # Send at 6 PM Pakistan time (which is 1 PM UTC)
+    if current_hour_pakistan == 18:
+        logger.info("Attempting to send daily summary at 6 PM Pakistan time...")
+        client.mattermost.send_daily_summary()
+
+    # End-of-day cleanup at 11:59 PM Pakistan time
+    if pakistan_now.hour == 23 and pakistan_now.minute == 59:
+        if client.mattermost.should_cleanup_end_of_day():
+            logger.info("Attempting end-of-day cleanup at 11:59 PM Pakistan time...")
+            client.mattermost.cleanup_json_files_end_of_day()
+
+
+def client_factory(accounts_file=None):
+    """Return a callable building the poller: one CaaSClient, or an AccountPool for an accounts file.
+
+    The callable takes an optional `mattermost` client to share instead of creating one.
+    """
+    if not accounts_file:
+        from src.clients.caas_client import CaaSClient
+
+        return CaaSClient
+
+    from src.clients.accounts import AccountPool, load_accounts
+
+    accounts = load_accounts(accounts_file)
+    logger.info(f"Multi-account mode: {', '.join(account.name for account in accounts)}")
+    return lambda mattermost=None: AccountPool(accounts, mattermost=mattermost)
+
+
+def seconds_until_next_cycle(interval, elapsed):
+    """Rest of the poll interval, cut short to poll ahead of and right at the opening of an auto-accept window.
+
+    The early poll refreshes the token and the pooled connection so the first
+    task of the window is accepted on a warm client; the second one sees it as
+    soon as the window opens instead of up to one interval later.
+    """
+    from src.clients.accept_schedule import get_schedule
+    from src.config import AUTO_ACCEPT_ENABLED, SCHEDULE_WARMUP_SECONDS
+    from src.utils.timezone_utils import now_pakistan
+
+    remaining = max(0.0, interval - elapsed)
+    if not AUTO_ACCEPT_ENABLED:
+        return remaining
+    try:
+        opens_in = get_schedule().seconds_until_open(now_pakistan())
+    except Exception as e:
+        # An unreadable schedule file must not stop the poller: keep the plain interval
+        logger.error(f"Error reading auto-accept schedule: {str(e)}")
+        return remaining
+    if not opens_in or opens_in > remaining + SCHEDULE_WARMUP_SECONDS:
+        return remaining
+    # A little past the boundary so the poll lands inside the first open minute
+    wake_ups = [opens_in - SCHEDULE_WARMUP_SECONDS, opens_in + 0.05]
+    delay = min((wake_up for wake_up in wake_ups if wake_up > 0), default=remaining)
+    if delay < remaining:
+        logger.info(f"Auto-accept window opens in {opens_in:.0f}s, next poll in {delay:.1f}s")
+        return delay
+    return remaining
+
+
+def run_daemon(interval, create_client=None, lock=None):
+    """Poll CaaS every `interval` seconds with a single long-lived client.
+
+    Each cycle runs under the run lock and is skipped while another process
+    holds it. SIGTERM/SIGINT finish the current cycle and exit; SIGHUP drops
+    the client so the next cycle starts with a fresh login. The Mattermost
+    client and its outbox sender live for the whole daemon: re-creating the
+    CaaS client after an error or SIGHUP never waits on the webhook.
+    """
+    from src.clients.mattermost_client import MattermostClient
+
+    create_client = create_client or client_factory()
+    lock = lock or build_run_lock()
+    stop_event = threading.Event()
+    reload_event = threading.Event()
+
+    def _handle_stop(signum, frame):
+        logger.info(f"Received signal {signum}, stopping after current cycle...")
+        stop_event.set()
+
+    def _handle_reload(signum, frame):
+        logger.info("Received SIGHUP, client will be re-created on next cycle")
+        reload_event.set()
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, _handle_stop)
+    signal.signal(signal.SIGINT, _handle_stop)
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, _handle_reload)
+
+    logger.info(f"Starting CaaS poller in daemon mode (interval={interval}s)...")
+    mattermost = MattermostClient()
+    mattermost.start_sender()
+    client = None
+    force_login = False
+
+    while True:
+        started = time.monotonic()
+        try:
+            # Token renewal after the first login is handled by the client itself
+            if client is None:
+                client = create_client(mattermost=mattermost)
+                logger.info("Attempting to login to CaaS...")
+                if client.login(force=force_login):
+                    force_login = False
+                else:
+                    logger.info("Failed to login to CaaS, retrying next cycle")
+                    client.close()
+                    client = None
+
+            if client is not None and take_run_lock(lock):
+                try:
+                    run_check(client)
+                finally:
+                    lock.release()
+        except Exception as e:
+            logger.error(f"Error in poll cycle: {str(e)}")
+            if client is not None:
+                client.close()
+            client = None
+
+        export_metrics()
+
+        # Sleep for the rest of the interval (or until just before the next auto-accept window); a signal wakes us up early
+        stop_event.wait(seconds_until_next_cycle(interval, time.monotonic() - started))
+        if reload_event.is_set():
+            reload_event.clear()
+            stop_event.clear()
+            if client is not None:
+                client.close()
+            client = None
+            force_login = True
+            continue
+        if stop_event.is_set():
+            break
+
+    if client is not None:
+        client.close()
+    # Final shutdown: stop the sender and flush what is still queued
+    mattermost.close()
+
+    logger.info("CaaS poller stopped")
+
+
+async def run_check_async(client):
+    """Async counterpart of run_check()"""
+    from src.clients.task_rules import UNCHANGED
+    from src.utils.timezone_utils import now_pakistan
+
+    logger.info("Checking for available tasks...")
+    tasks = await client.get_available_tasks_and_send_notification()
+    if tasks == UNCHANGED:
+        logger.info("Available tasks unchanged since the last poll")
+    elif tasks:
+        logger.info("Successfully checked for tasks and sent notifications")
+    else:
+        logger.info("No tasks available")
+
+    pakistan_now = now_pakistan()
+    if pakistan_now.hour == 18:
+        logger.info("Attempting to send daily summary at 6 PM Pakistan time...")
+        await client.mattermost.send_daily_summary()
+
+    if pakistan_now.hour == 23 and pakistan_now.minute == 59:
+        if client.mattermost.should_cleanup_end_of_day():
+            logger.info("Attempting end-of-day cleanup at 11:59 PM Pakistan time...")
+            client.mattermost.cleanup_json_files_end_of_day()
+
+
+async def run_async_daemon(interval, lock=None):
+    """Poll CaaS every `interval` seconds on one event loop with the asyncio clients.
+
+    The run lock, signals and the long-lived Mattermost client behave as in run_daemon().
+    """
+    import asyncio
+
+    from src.clients.async_caas_client import AsyncCaaSClient
+    from src.clients.async_mattermost_client import AsyncMattermostClient
+
+    lock = lock or build_run_lock()
+    loop = asyncio.get_running_loop()
+    stop_event = asyncio.Event()
+    reload_requested = False
+
+    def _handle_stop():
+        logger.info("Received stop signal, stopping after current cycle...")
+        stop_event.set()
+
+    def _handle_reload():
+        nonlocal reload_requested
+        logger.info("Received SIGHUP, client will be re-created on next cycle")
+        reload_requested = True
+        stop_event.set()
+
+    loop.add_signal_handler(signal.SIGTERM, _handle_stop)
+    loop.add_signal_handler(signal.SIGINT, _handle_stop)
+    loop.add_signal_handler(signal.SIGHUP, _handle_reload)
+
+    logger.info(f"Starting async CaaS poller in daemon mode (interval={interval}s)...")
+    mattermost = AsyncMattermostClient()
+    mattermost.start_sender()
+    client = None
+    force_login = False
+
+    while True:
+        started = loop.time()
+        try:
+            if client is None:
+                client = AsyncCaaSClient(mattermost=mattermost)
+                logger.info("Attempting to login to CaaS...")
+                if await client.login(force=force_login):
+                    force_login = False
+                else:
+                    logger.info("Failed to login to CaaS, retrying next cycle")
+                    await client.close()
+                    client = None
+
+            # A "wait" policy sleeps between attempts, so keep it off the event loop
+            if client is not None and await loop.run_in_executor(None, take_run_lock, lock):
+                try:
+                    await run_check_async(client)
+                finally:
+                    lock.release()
+        except Exception as e:
+            logger.error(f"Error in poll cycle: {str(e)}")
+            if client is not None:
+                await client.close()
+            client = None
+
+        export_metrics()
+
+        try:
+            await asyncio.wait_for(stop_event.wait(), seconds_until_next_cycle(interval, loop.time() - started))
+        except asyncio.TimeoutError:
+            pass
+        if reload_requested:
+            reload_requested = False
+            stop_event.clear()
+            if client is not None:
+                await client.close()
+            client = None
+            force_login = True
+            continue
+        if stop_event.is_set():
+            break
+
+    if client is not None:
+        await client.close()
+    await mattermost.close()
+
+    logger.info("CaaS poller stopped")
+
+
+def profile_startup(args):
+    """Build the client and its state the way a cron run does, timing imports and init; no requests are sent"""
+    from src.utils.startup_profile import StartupProfile
+
+    profile = StartupProfile().install()
+    try:
+        with profile.phase("config"):
+            apply_config_defaults(args)
+        with profile.phase("client imports"):
+            create_client = client_factory(args.accounts)
+        with profile.phase("client construction"):
+            client = create_client()
+        with profile.phase("state init"):
+            client.mattermost.state
+            client.mattermost.task_history
+    finally:
+        profile.uninstall()
+
+    print(profile.format_report(), end="")
+    total_ms = profile.total() * 1000
+    if args.startup_budget_ms and total_ms > args.startup_budget_ms:
+        print(f"Startup took {total_ms:.1f}ms, over the {args.startup_budget_ms:.0f}ms budget")
+        sys.exit(1)
+
+
+def main(argv=None):
     """Main function to run the CaaS check"""
+    args = parse_args(argv)
+    if args.startup_profile:
+        profile_startup(args)
+        return
+
+    apply_config_defaults(args)
+    if args.accounts and args.use_async:
+        logger.error("--accounts is not supported together with --async")
+        sys.exit(2)
+
+    if args.daemon:
+        start_metrics_server(args.metrics_port)
+        if args.use_async:
+            import asyncio
+
+            asyncio.run(run_async_daemon(max(1.0, args.interval)))
+        else:
+            run_daemon(max(1.0, args.interval), client_factory(args.accounts))
+        return
+
+    # The whole run, including the outbox flush on close, is held under the lock;
+    # a run that finds it busy stops before importing the clients or logging in
+    lock = build_run_lock()
+    if not take_run_lock(lock):
+        export_metrics()
+        return
+
+    client = None
     try:
         logger.info("Starting CaaS automation check...")
         
         # Initialize client
-        client = CaaSClient()
+        client = client_factory(args.accounts)()
         
         # Login
         logger.info("Attempting to login to CaaS...")
         if not client.login():
             logger.info("Failed to login to CaaS")
             return
-        
-        # Get available tasks and send notifications
-        logger.info("Checking for available tasks...")
-        tasks = client.get_available_tasks_and_send_notification()
-        if tasks:
-            logger.info("Successfully checked for tasks and sent notifications")
-        else:
-            logger.info("No tasks available")
-
-        # Check Pakistan time (UTC+5) for daily summary
-        pakistan_now = now_pakistan()
-        current_hour_pakistan = pakistan_now.hour
-        # Send at 6 PM Pakistan time (which is 1 PM UTC)
-        if current_hour_pakistan == 18:
-            logger.info("Attempting to send daily summary at 6 PM Pakistan time...")
-            client.mattermost.send_daily_summary()
-
-        # End-of-day cleanup at 11:59 PM Pakistan time
-        if pakistan_now.hour == 23 and pakistan_now.minute == 59:
-            if client.mattermost.should_cleanup_end_of_day():
-                logger.info("Attempting end-of-day cleanup at 11:59 PM Pakistan time...")
-                client.mattermost.cleanup_json_files_end_of_day()
+
+        run_check(client)
             
     except Exception as e:
         logger.info(f"Error in main: {str(e)}")
         raise
+    finally:
+        # Delivers the notifications queued in this run (and any left over from earlier ones)
+        if client is not None:
+            client.close()
+        export_metrics()
+        lock.release()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main() 
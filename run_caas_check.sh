@@ -9,7 +9,7 @@ if [ -d ".venv" ]; then
 fi
 
 # Run the Python script
-python3 run_caas_check.py
+python3 run_caas_check.py "$@"
 
 # Deactivate virtual environment if it was activated
 if [ -n "$VIRTUAL_ENV" ]; then
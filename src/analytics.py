@@ -0,0 +1,254 @@
+"""
+Task history analytics for tuning the auto-accept windows and keyword lists
+
+Streams the live history store and the columnar archive in batches of columns
+(epoch seconds, dictionary codes) and keeps only running counters, so months of
+history are never held in memory at once:
+
+    python -m src.analytics                      # everything in the history and archive
+    python -m src.analytics --since 2026-01-01 --until 2026-03-31 --top 20
+    python -m src.analytics --json
+
+Hours and weekdays are Pakistan time. Cancellations come from the state store's
+cancellation log, i.e. tasks taken back after being accepted.
+"""
+import argparse
+import json
+import logging
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from itertools import combinations, islice
+
+from .config import ARCHIVE_DIR
+from .clients.state_store import create_state_backends
+from .clients.task_archive import TaskArchive, encode_columns
+from .clients.task_rules import ACCEPT_FAILED, ACCEPT_LOST, ACCEPT_OK
+from .utils.timezone_utils import PAKISTAN_TZ
+
+logger = logging.getLogger()
+
+BATCH_SIZE = 20000
+COLUMNS = ("timestamp", "stack_type", "accept_outcome", "skills")
+PKT_OFFSET_SECONDS = 5 * 3600
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+MANUAL = "manual"
+
+
+class TaskStats:
+    """Running aggregates, updated one batch of columns at a time"""
+
+    def __init__(self, since=None, until=None):
+        self.since = since
+        self.until = until
+        self.total = 0
+        self.first = None
+        self.last = None
+        self.stacks = Counter()
+        self.hours = Counter()
+        self.weekdays = Counter()
+        self.outcomes = Counter()
+        self.stack_outcomes = Counter()
+        self.skills = Counter()
+        self.skill_pairs = Counter()
+        self.cancellations = 0
+
+    def _rows(self, timestamps, until=None):
+        """Indices of the rows inside the time window, or None when all of them are"""
+        low = self.since if self.since is not None else float("-inf")
+        highs = [bound for bound in (self.until, until) if bound is not None]
+        high = min(highs) if highs else float("inf")
+        if not timestamps or (min(timestamps) >= low and max(timestamps) < high):
+            return None
+        return [i for i, ts in enumerate(timestamps) if low <= ts < high]
+
+    def add_batch(self, columns, until=None):
+        """Fold one batch of raw columns (ArchiveBlock.raw() form) into the counters"""
+        timestamps = columns["timestamp"]
+        stack_codes, stack_names = columns["stack_type"]
+        outcome_codes, outcome_names = columns["accept_outcome"]
+        skill_offsets, skill_codes, skill_names = columns["skills"]
+
+        rows = self._rows(timestamps, until)
+        if rows is not None:
+            if not rows:
+                return
+            timestamps = [timestamps[i] for i in rows]
+            stack_codes = [stack_codes[i] for i in rows]
+            outcome_codes = [outcome_codes[i] for i in rows]
+        else:
+            rows = range(len(timestamps))
+
+        self.total += len(timestamps)
+        self.first = min(self.first, min(timestamps)) if self.first is not None else min(timestamps)
+        self.last = max(self.last, max(timestamps)) if self.last is not None else max(timestamps)
+
+        local_days = [(ts + PKT_OFFSET_SECONDS) // 86400 for ts in timestamps]
+        # 1970-01-01 was a Thursday
+        self.weekdays.update(WEEKDAYS[(day + 3) % 7] for day in local_days)
+        self.hours.update((ts + PKT_OFFSET_SECONDS) // 3600 % 24 for ts in timestamps)
+
+        for code, count in Counter(stack_codes).items():
+            self.stacks[stack_names[code]] += count
+        for (stack, outcome), count in Counter(zip(stack_codes, outcome_codes)).items():
+            outcome_name = outcome_names[outcome] or MANUAL
+            self.outcomes[outcome_name] += count
+            self.stack_outcomes[stack_names[stack], outcome_name] += count
+
+        normalized = [str(name).strip().lower() for name in skill_names]
+        for i in rows:
+            row_skills = sorted({normalized[code] for code in skill_codes[skill_offsets[i]:skill_offsets[i + 1]]})
+            self.skills.update(row_skills)
+            self.skill_pairs.update(combinations(row_skills, 2))
+
+    def add_cancellations(self, cancellations):
+        low = self.since if self.since is not None else float("-inf")
+        high = self.until if self.until is not None else float("inf")
+        for cancellation in cancellations:
+            if low <= datetime.fromisoformat(cancellation["timestamp"]).timestamp() < high:
+                self.cancellations += 1
+
+    def report(self, top=10):
+        """Plain dict of the aggregates"""
+        attempted = sum(self.outcomes[outcome] for outcome in (ACCEPT_OK, ACCEPT_FAILED, ACCEPT_LOST))
+
+        def share(count, total):
+            return round(100.0 * count / total, 1) if total else 0.0
+
+        def period(ts):
+            return datetime.fromtimestamp(ts, PAKISTAN_TZ).isoformat() if ts is not None else None
+
+        return {
+            "tasks": self.total,
+            "first_task": period(self.first),
+            "last_task": period(self.last),
+            "per_stack": dict(self.stacks.most_common()),
+            "per_hour_pkt": {f"{hour:02d}": self.hours[hour] for hour in range(24)},
+            "per_weekday_pkt": {day: self.weekdays[day] for day in WEEKDAYS},
+            "accept": {
+                "auto_accepted": self.outcomes[ACCEPT_OK],
+                "auto_accept_failed": self.outcomes[ACCEPT_FAILED],
+                "auto_accept_lost": self.outcomes[ACCEPT_LOST],
+                "manual": self.outcomes[MANUAL],
+                "auto_accepted_pct": share(self.outcomes[ACCEPT_OK], self.total),
+                "manual_pct": share(self.outcomes[MANUAL], self.total),
+                "attempt_success_pct": share(self.outcomes[ACCEPT_OK], attempted),
+                "per_stack": {
+                    stack: {
+                        "auto_accepted_pct": share(self.stack_outcomes[stack, ACCEPT_OK], count),
+                        "manual_pct": share(self.stack_outcomes[stack, MANUAL], count),
+                    }
+                    for stack, count in self.stacks.most_common()
+                },
+            },
+            "cancellations": self.cancellations,
+            "cancelled_pct_of_auto_accepted": share(self.cancellations, self.outcomes[ACCEPT_OK]),
+            "top_skills": self.skills.most_common(top),
+            "top_skill_pairs": [[f"{a} + {b}", count] for (a, b), count in self.skill_pairs.most_common(top)],
+        }
+
+
+def iter_history_batches(history, batch_size=BATCH_SIZE, start=None, end=None):
+    """Encode the live history of the PKT dates from `start` to `end` into column batches of `batch_size` entries"""
+    entries = iter(history.iter_day_range(start, end))
+    while True:
+        batch = list(islice(entries, batch_size))
+        if not batch:
+            return
+        yield encode_columns(batch, COLUMNS)
+
+
+def collect(history=None, archive=None, state=None, since=None, until=None, batch_size=BATCH_SIZE):
+    """Aggregate the live history, then the archive up to where the live history starts"""
+    stats = TaskStats(since, until)
+    # PKT days the window touches: whole day segments and archive blocks outside it are never read
+    start = datetime.fromtimestamp(since, PAKISTAN_TZ).date().isoformat() if since is not None else None
+    end = (datetime.fromtimestamp(until, PAKISTAN_TZ) - timedelta(microseconds=1)).date().isoformat() if until is not None else None
+    live_first = None
+    if history is not None:
+        for columns in iter_history_batches(history, batch_size, start, end):
+            if len(columns["timestamp"]):
+                batch_first = min(columns["timestamp"])
+                live_first = batch_first if live_first is None else min(live_first, batch_first)
+            stats.add_batch(columns)
+
+    if archive is not None:
+        # Entries still in the live history were counted above; skip any archived copy of them
+        for columns in archive.read_columns(COLUMNS, start, end, raw=True):
+            stats.add_batch(columns, until=live_first)
+
+    if state is not None:
+        stats.add_cancellations(state.iter_cancellations())
+    return stats
+
+
+def format_report(report):
+    lines = [f"Tasks: {report['tasks']} ({report['first_task'] or '-'} .. {report['last_task'] or '-'})", ""]
+
+    def table(title, rows, total):
+        lines.append(title)
+        width = max((count for _, count in rows), default=0)
+        for name, count in rows:
+            bar = "#" * (round(30 * count / width) if width else 0)
+            pct = 100.0 * count / total if total else 0.0
+            lines.append(f"  {name:<24} {count:>8} {pct:5.1f}%  {bar}")
+        lines.append("")
+
+    total = report["tasks"]
+    table("Arrivals per stack", list(report["per_stack"].items()), total)
+    table("Arrivals per hour of day (PKT)", list(report["per_hour_pkt"].items()), total)
+    table("Arrivals per weekday (PKT)", list(report["per_weekday_pkt"].items()), total)
+
+    accept = report["accept"]
+    lines.append("Auto-accept")
+    lines.append(f"  auto-accepted {accept['auto_accepted']} ({accept['auto_accepted_pct']}%), manual {accept['manual']} ({accept['manual_pct']}%)")
+    lines.append(f"  failed {accept['auto_accept_failed']}, lost to another worker {accept['auto_accept_lost']}, attempt success {accept['attempt_success_pct']}%")
+    for stack, rates in accept["per_stack"].items():
+        lines.append(f"  {stack:<24} auto {rates['auto_accepted_pct']:5.1f}%  manual {rates['manual_pct']:5.1f}%")
+    lines.append(f"  cancelled after acceptance: {report['cancellations']} ({report['cancelled_pct_of_auto_accepted']}% of auto-accepted)")
+    lines.append("")
+
+    table("Top skills (share of tasks)", report["top_skills"], total)
+    table("Top skill pairs (share of tasks)", report["top_skill_pairs"], total)
+    return "\n".join(lines).rstrip() + "\n"
+
+
+def _parse_day(value):
+    return datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=PAKISTAN_TZ)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Task arrival, auto-accept and skill statistics over the task history")
+    parser.add_argument("--since", type=_parse_day, help="First PKT day to include (YYYY-MM-DD)")
+    parser.add_argument("--until", type=_parse_day, help="Last PKT day to include (YYYY-MM-DD)")
+    parser.add_argument("--top", type=int, default=10, help="Number of skills and skill pairs to list")
+    parser.add_argument("--backend", help="State backend to read (json or sqlite; default STATE_BACKEND)")
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR, help="Columnar archive directory")
+    parser.add_argument("--no-archive", action="store_true", help="Only read the live history")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Entries per aggregation batch")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    state, history = create_state_backends(args.backend)
+    archive = None if args.no_archive else TaskArchive(args.archive_dir)
+
+    started = time.perf_counter()
+    stats = collect(
+        history=history,
+        archive=archive,
+        state=state,
+        since=args.since.timestamp() if args.since else None,
+        until=(args.until + timedelta(days=1)).timestamp() if args.until else None,
+        batch_size=max(1, args.batch_size),
+    )
+    report = stats.report(top=args.top)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(format_report(report), end="")
+        print(f"Scanned in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
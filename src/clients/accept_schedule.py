@@ -0,0 +1,189 @@
+"""
+Weekly auto-accept schedule compiled into a minute bitmap
+
+The configured windows are compiled once into a 7x1440 bytearray, one byte per
+minute of the (Pakistan time) week, so "is auto-accept open now" is a single
+index. Windows are "HH:MM-HH:MM", start inclusive and end exclusive ("24:00"
+ends at midnight); a window whose end is not after its start runs past
+midnight into the next day. Windows come from the AUTO_ACCEPT_* settings and
+can be replaced per weekday, and for single dates, by AUTO_ACCEPT_SCHEDULE_FILE:
+
+    {
+        "weekly": {"saturday": ["10:00-13:00", "15:00-18:00"], "sunday": []},
+        "dates": {"2026-12-25": [], "2026-11-03": ["00:00-24:00"]}
+    }
+
+A date entry replaces that whole day, including any weekly window running into
+it from the day before; an empty list closes the day (holidays). The same rows
+answer when the next window opens, which the daemon uses to poll right at the
+opening.
+"""
+import logging
+import os
+from datetime import date, datetime, time, timedelta
+
+from ..config import AUTO_ACCEPT_CONFIG, AUTO_ACCEPT_SCHEDULE_FILE, WEEKDAY_TO_INDEX
+from ..utils import json_codec
+
+logger = logging.getLogger()
+
+MINUTES_PER_DAY = 1440
+DAYS_PER_WEEK = 7
+
+
+def parse_minute(value):
+    """Minutes since midnight of "HH:MM"; "24:00" is the end of the day"""
+    hour, minute = value.split(":")
+    hour, minute = int(hour), int(minute)
+    if not (0 <= hour <= 23 and 0 <= minute <= 59) and (hour, minute) != (24, 0):
+        raise ValueError(f"Invalid time '{value}'")
+    return hour * 60 + minute
+
+
+def parse_window(value):
+    """(start, end) minutes of an "HH:MM-HH:MM" window"""
+    start, end = value.split("-")
+    return parse_minute(start.strip()), parse_minute(end.strip())
+
+
+def parse_windows(values, source):
+    """Windows from a list of "HH:MM-HH:MM" strings; invalid entries are logged and skipped"""
+    windows = []
+    for value in values:
+        try:
+            windows.append(parse_window(value))
+        except (AttributeError, ValueError):
+            logger.warning(f"Ignoring invalid auto-accept window '{value}' in {source}")
+    return windows
+
+
+class AcceptSchedule:
+    """Minute bitmap of the auto-accept week plus whole-day rows for overridden dates.
+
+    `weekly` maps weekday indexes (Monday = 0) to (start, end) minute windows;
+    `dates` maps dates to the windows that replace that day.
+    """
+
+    def __init__(self, weekly, dates=None):
+        self.minutes = bytearray(DAYS_PER_WEEK * MINUTES_PER_DAY)
+        for weekday, windows in weekly.items():
+            for start, end in windows:
+                self._mark(self.minutes, weekday * MINUTES_PER_DAY, start, end, wrap=True)
+
+        self.dates = {}
+        for day, windows in (dates or {}).items():
+            row = bytearray(MINUTES_PER_DAY)
+            for start, end in windows:
+                end = end or MINUTES_PER_DAY
+                if end <= start:
+                    logger.warning(f"Auto-accept window on {day} crosses midnight, cutting it at 24:00")
+                    end = MINUTES_PER_DAY
+                self._mark(row, 0, start, end)
+            self.dates[day] = row
+        self._last_date = max(self.dates) if self.dates else None
+
+    @staticmethod
+    def _mark(bitmap, base, start, end, wrap=False):
+        if end > start:
+            bitmap[base + start:base + end] = b"\x01" * (end - start)
+            return
+        # Past midnight: the rest of this day, then the start of the next (Sunday wraps to Monday)
+        bitmap[base + start:base + MINUTES_PER_DAY] = b"\x01" * (MINUTES_PER_DAY - start)
+        if wrap and end:
+            base = (base + MINUTES_PER_DAY) % len(bitmap)
+            bitmap[base:base + end] = b"\x01" * end
+
+    def _row(self, day):
+        """(bitmap, offset) holding the 1440 minutes of `day`"""
+        row = self.dates.get(day)
+        if row is not None:
+            return row, 0
+        return self.minutes, day.weekday() * MINUTES_PER_DAY
+
+    def is_open(self, when):
+        """Whether auto-accept is open at `when` (an aware Pakistan-time datetime)"""
+        bitmap, base = self._row(when.date())
+        return bitmap[base + when.hour * 60 + when.minute] == 1
+
+    def is_closed_all_day(self, day):
+        bitmap, base = self._row(day)
+        return bitmap.find(1, base, base + MINUTES_PER_DAY) < 0
+
+    def next_open(self, when):
+        """`when` itself if the schedule is open then, else the start of the next open minute; None if it never opens"""
+        day = when.date()
+        minute = when.hour * 60 + when.minute
+        # Past the last override a week of weekly rows repeats, so looking further finds nothing new
+        last_day = day + timedelta(days=DAYS_PER_WEEK)
+        if self._last_date is not None and self._last_date >= day:
+            last_day = max(last_day, self._last_date + timedelta(days=DAYS_PER_WEEK))
+        first = True
+        while day <= last_day:
+            bitmap, base = self._row(day)
+            found = bitmap.find(1, base + minute, base + MINUTES_PER_DAY)
+            if found >= 0:
+                if first and found == base + minute:
+                    return when
+                return datetime.combine(day, time(), tzinfo=when.tzinfo) + timedelta(minutes=found - base)
+            day += timedelta(days=1)
+            minute = 0
+            first = False
+        return None
+
+    def seconds_until_open(self, when):
+        """0 while open, else seconds until the next window opens; None if none is scheduled"""
+        opens = self.next_open(when)
+        return None if opens is None else (opens - when).total_seconds()
+
+
+def _config_weekly():
+    weekly = {}
+    for weekday in AUTO_ACCEPT_CONFIG["enabled_days"]:
+        key = "extended_windows" if weekday in AUTO_ACCEPT_CONFIG["extended_days"] else "default_windows"
+        weekly[weekday] = parse_windows(AUTO_ACCEPT_CONFIG[key], f"AUTO_ACCEPT_{key.upper()}")
+    return weekly
+
+
+def load_schedule(schedule_file=None):
+    """Compile the AUTO_ACCEPT_* windows and the schedule file, if any, into an AcceptSchedule"""
+    weekly = _config_weekly()
+    dates = {}
+    if schedule_file:
+        try:
+            with open(schedule_file, "rb") as f:
+                data = json_codec.load(f)
+            for name, windows in (data.get("weekly") or {}).items():
+                if name.strip().lower() not in WEEKDAY_TO_INDEX:
+                    logger.warning(f"Ignoring unknown weekday '{name}' in {schedule_file}")
+                    continue
+                weekly[WEEKDAY_TO_INDEX[name.strip().lower()]] = parse_windows(windows, schedule_file)
+            for day, windows in (data.get("dates") or {}).items():
+                try:
+                    dates[date.fromisoformat(day)] = parse_windows(windows, schedule_file)
+                except ValueError:
+                    logger.warning(f"Ignoring invalid date '{day}' in {schedule_file}")
+        except FileNotFoundError:
+            logger.warning(f"Auto-accept schedule file {schedule_file} not found, using the configured windows")
+        except (AttributeError, OSError, ValueError) as e:
+            logger.error(f"Error reading auto-accept schedule file {schedule_file}: {str(e)}")
+    return AcceptSchedule(weekly, dates)
+
+
+_schedule = None
+_schedule_stamp = None
+
+
+def get_schedule():
+    """The compiled schedule, rebuilt only when the schedule file changes"""
+    global _schedule, _schedule_stamp
+    stamp = None
+    if AUTO_ACCEPT_SCHEDULE_FILE:
+        try:
+            stat = os.stat(AUTO_ACCEPT_SCHEDULE_FILE)
+            stamp = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            stamp = None
+    if _schedule is None or stamp != _schedule_stamp:
+        _schedule = load_schedule(AUTO_ACCEPT_SCHEDULE_FILE)
+        _schedule_stamp = stamp
+    return _schedule
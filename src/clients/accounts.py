@@ -0,0 +1,131 @@
+"""
+Multi-account polling: several CaaS identities sharing one task history
+
+Accounts are read from a JSON file (CAAS_ACCOUNTS_FILE or --accounts):
+
+    {"accounts": [
+        {"name": "main", "email": "me@example.com", "password_env": "CAAS_PASSWORD_MAIN"},
+        {"name": "second", "email": "two@example.com", "password": "...", "base_url": "https://...",
+         "refresh_url": "https://..."}
+    ]}
+
+`refresh_url` is optional and defaults to the account's own <base_url>/refresh-token.
+
+Each account gets its own HTTP session and token cache. All of them share one
+MattermostClient, i.e. one state store, task history and claim set, so a work
+item is accepted or announced at most once across accounts.
+"""
+import json
+import logging
+import os
+import re
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from ..config import ACCOUNT_WORKERS
+from . import task_rules
+from .caas_client import CaaSClient
+from .mattermost_client import MattermostClient
+from .token_store import TokenStore
+
+logger = logging.getLogger()
+
+Account = namedtuple("Account", ["name", "email", "password", "base_url", "refresh_url"])
+
+
+def load_accounts(path):
+    """Parse the accounts file; passwords may be given inline or via `password_env`"""
+    with open(path, "r") as f:
+        data = json.load(f)
+
+    entries = data.get("accounts", []) if isinstance(data, dict) else data
+    accounts = []
+    for position, entry in enumerate(entries, start=1):
+        name = str(entry.get("name") or entry.get("email") or "").strip()
+        password = entry.get("password") or (os.getenv(entry["password_env"]) if entry.get("password_env") else None)
+        if not name or not entry.get("email") or not password:
+            raise ValueError(f"Account #{position} in {path} needs an email and a password or password_env")
+        if any(account.name == name for account in accounts):
+            raise ValueError(f"Duplicate account name '{name}' in {path}")
+        accounts.append(Account(name, entry["email"], password, entry.get("base_url"), entry.get("refresh_url")))
+
+    if not accounts:
+        raise ValueError(f"No accounts defined in {path}")
+    return accounts
+
+
+def token_file_for(name):
+    """Per-account token cache path"""
+    return f"src/data/auth_tokens.{re.sub(r'[^A-Za-z0-9_.-]', '_', name)}.json"
+
+
+class AccountPool:
+    """Polls several accounts concurrently on a thread pool.
+
+    Exposes the CaaSClient methods the runner uses (login, the poll call,
+    `mattermost`, close), so the cron and daemon loops work unchanged.
+    """
+
+    def __init__(self, accounts, workers=None, mattermost=None):
+        self._owns_mattermost = mattermost is None
+        self.mattermost = mattermost or MattermostClient()
+        self.clients = {
+            account.name: CaaSClient(
+                base_url=account.base_url,
+                refresh_url=account.refresh_url,
+                mattermost=self.mattermost,
+                credentials={"email": account.email, "password": account.password},
+                token_store=TokenStore(token_file_for(account.name)),
+            )
+            for account in accounts
+        }
+        self.logged_in = set()
+        self._executor = ThreadPoolExecutor(
+            max_workers=min(workers or ACCOUNT_WORKERS, len(self.clients)),
+            thread_name_prefix="caas-account",
+        )
+
+    def _run_all(self, names, fn):
+        """Run fn(client) for each named account concurrently; errors are logged and yield None"""
+        futures = {name: self._executor.submit(fn, self.clients[name]) for name in names}
+        results = {}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                logger.error(f"Account '{name}' failed: {str(e)}")
+                results[name] = None
+        return results
+
+    def login(self, force=False):
+        """Log in every account not yet logged in (all of them with `force`); True if any is usable"""
+        pending = list(self.clients) if force else [name for name in self.clients if name not in self.logged_in]
+        for name, ok in self._run_all(pending, lambda client: client.login(force=force)).items():
+            if ok:
+                self.logged_in.add(name)
+            else:
+                self.logged_in.discard(name)
+                logger.info(f"Failed to login to CaaS as account '{name}'")
+        return bool(self.logged_in)
+
+    def get_available_tasks_and_send_notification(self):
+        """Poll every logged-in account at once; returns {account name: payload} for accounts that saw work.
+
+        When no account saw work and at least one got an unchanged response,
+        returns task_rules.UNCHANGED like a single client.
+        """
+        if len(self.logged_in) < len(self.clients):
+            self.login()
+        results = self._run_all(sorted(self.logged_in), lambda client: client.get_available_tasks_and_send_notification())
+        payloads = {name: data for name, data in results.items() if data and data != task_rules.UNCHANGED}
+        if not payloads and task_rules.UNCHANGED in results.values():
+            return task_rules.UNCHANGED
+        return payloads
+
+    def close(self):
+        """Close every account's HTTP session, then the shared MattermostClient once (if the pool created it)"""
+        self._executor.shutdown(wait=True)
+        for client in self.clients.values():
+            client.close()
+        if self._owns_mattermost:
+            self.mattermost.close()
@@ -0,0 +1,289 @@
+"""
+Asyncio CaaS API client for automation tasks
+"""
+import asyncio
+import logging
+import time
+
+from ..config import (
+    CREDENTIALS,
+    DEFAULT_HEADERS,
+    HTTP_CONFIG,
+    get_api_urls,
+)
+from ..utils.metrics import (
+    ACCEPT_ATTEMPTS,
+    LAST_SUCCESSFUL_POLL,
+    PHASE_SECONDS,
+    POLLS,
+    TASKS_SEEN,
+    TASKS_SKIPPED,
+    timed,
+)
+from ..utils import json_codec
+from ..utils.stage_timer import StageTimer
+from . import task_rules
+from .async_mattermost_client import AsyncMattermostClient, aiohttp, require_aiohttp
+from .token_store import TokenStateMixin
+
+logger = logging.getLogger()
+
+
+def _decode_json(raw):
+    try:
+        return json_codec.loads(raw) if raw else None
+    except ValueError:
+        return None
+
+
+class AsyncCaaSClient(TokenStateMixin):
+    """Coroutine counterpart of CaaSClient with the same decision logic"""
+
+    def __init__(self, session=None, base_url=None, mattermost=None, credentials=None, token_store=None, refresh_url=None):
+        require_aiohttp()
+        self.credentials = credentials or CREDENTIALS
+        self._init_token_state(DEFAULT_HEADERS, token_store, account=self.credentials.get("email"))
+        self._session = session
+        self.timeout = HTTP_CONFIG["timeout"]
+        self.urls = get_api_urls(base_url, refresh_url)
+        # A MattermostClient passed in is shared (daemon); its owner closes it
+        self._owns_mattermost = mattermost is None
+        self.mattermost = mattermost or AsyncMattermostClient()
+        # Poll fingerprints are kept per account in the shared state
+        self.poll_key = self.credentials.get("email") or "default"
+
+    @property
+    def session(self):
+        """Pooled keep-alive aiohttp session, created on first use inside the running loop"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=HTTP_CONFIG["pool_maxsize"],
+                force_close=not HTTP_CONFIG["keep_alive"],
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    async def close(self):
+        """Close our HTTP session, and the MattermostClient too when this client created it"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        if self._owns_mattermost:
+            await self.mattermost.close()
+
+    async def _post_json(self, url, payload, headers):
+        async with self.session.post(url, headers=headers, data=json_codec.dumpb(payload)) as response:
+            response.raise_for_status()
+            return json_codec.loads(await response.read())
+
+    @timed("login")
+    async def login(self, force=False):
+        """Authenticate with CaaS API, reusing or refreshing cached tokens unless `force` is set"""
+        if not force and self._load_cached_tokens():
+            if self._access_token_fresh():
+                logger.info("Reusing cached CaaS access token")
+                return True
+            if await self.refresh_access_token():
+                return True
+
+        try:
+            logger.info("Preparing login request...")
+            data = await self._post_json(self.urls["signin"], self.credentials, self._unauthenticated_headers())
+            if data.get('status') == 'ok':
+                self._apply_auth_data(data['data'])
+                logger.info("Successfully logged in to CaaS")
+                return True
+            logger.error(f"Login failed: {data}")
+            return False
+
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            logger.error(f"Login error: {str(e)}")
+            return False
+
+    async def refresh_access_token(self):
+        """Renew the access token with the refresh token"""
+        if not self._refresh_token_usable():
+            return False
+
+        try:
+            logger.info("Refreshing CaaS access token...")
+            data = await self._post_json(
+                self.urls["refresh"],
+                {"refreshToken": self.refresh_token},
+                self._unauthenticated_headers(),
+            )
+            if data.get('status') == 'ok':
+                self._apply_auth_data(data['data'])
+                logger.info("Successfully refreshed CaaS access token")
+                return True
+            logger.error(f"Token refresh failed: {data}")
+            return False
+
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            logger.error(f"Token refresh error: {str(e)}")
+            return False
+
+    async def ensure_authenticated(self):
+        """Make sure a usable access token is loaded, refreshing or logging in as needed"""
+        if self.access_token and self._access_token_fresh():
+            return True
+        if self.access_token and await self.refresh_access_token():
+            return True
+        return await self.login(force=bool(self.access_token))
+
+    async def _authorized_fetch(self, method, url, payload=None, headers=None):
+        """Send an authenticated request, re-logging in once on 401; returns (status, raw body, response headers)"""
+        await self.ensure_authenticated()
+        data = None if payload is None else json_codec.dumpb(payload)
+        for attempt in range(2):
+            async with self.session.request(method, url, headers={**self.headers, **(headers or {})}, data=data) as response:
+                if response.status == 401 and attempt == 0:
+                    logger.info("Access token rejected (401), logging in again...")
+                    self.token_store.clear()
+                    if await self.login(force=True):
+                        continue
+                return response.status, await response.read(), response.headers
+
+    async def _authorized_request(self, method, url, payload=None):
+        """Send an authenticated request, re-logging in once on 401; returns (status, decoded JSON or None)"""
+        status, raw, _ = await self._authorized_fetch(method, url, payload)
+        return status, _decode_json(raw)
+
+    async def accept_task(self, task_id):
+        """Accept a task by its ID"""
+        return await self.start_work(task_id) == task_rules.ACCEPT_OK
+
+    @timed("accept")
+    async def start_work(self, task_id):
+        """Accept a task by its ID and report the outcome (accepted, failed or lost to another worker)"""
+        if not self.access_token:
+            logger.error("Not authenticated. Please login first")
+            return task_rules.ACCEPT_FAILED
+
+        try:
+            logger.info(f"Attempting to accept task {task_id}...")
+
+            payload = {
+                "workId": task_id,
+                "startTimeEpochMs": int(time.time() * 1000),
+                "tzName": "Asia/Karachi"
+            }
+
+            status, data = await self._authorized_request("POST", self.urls["start"], payload)
+            outcome = task_rules.classify_accept_response(status, data)
+            if outcome == task_rules.ACCEPT_OK:
+                logger.info(f"Successfully accepted task {task_id}")
+                work_token = data.get('data', {}).get('workToken')
+                if work_token:
+                    logger.info("Received work token for task")
+            elif outcome == task_rules.ACCEPT_LOST:
+                logger.error(f"Task {task_id} could not be accepted, most likely taken by another worker: {data}")
+            else:
+                logger.error(f"Failed to accept task (HTTP {status}): {data}")
+            return outcome
+
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Error accepting task: {str(e)}")
+            return task_rules.ACCEPT_FAILED
+
+    def should_auto_accept(self, work):
+        """Check if a task should be auto-accepted based on time, day of week, and skills only"""
+        return task_rules.should_auto_accept(work)
+
+    async def _handle_new_task(self, task_id, work, data, timer):
+        """Decide, accept and notify for a task this poller has claimed"""
+        will_auto_accept = self.should_auto_accept(work)
+        timer.mark("decided")
+
+        if will_auto_accept:
+            # Accept first: the Mattermost round trip must not widen the race window
+            logger.info(f"Task {task_id} qualifies for auto-acceptance - accepting before notifying")
+            timer.mark("accept_sent")
+            outcome = await self.start_work(task_id)
+            timer.mark("accept_done")
+            ACCEPT_ATTEMPTS.inc(outcome=outcome)
+
+            await self.mattermost.send_task_accepted_notification(data, outcome, timer)
+            logger.info(f"Task {task_id} auto-accept outcome={outcome} timings: {timer.summary()}")
+        else:
+            logger.info(f"Sending notification for task {task_id} - manual acceptance required")
+            await self.mattermost.send_task_notification(data)
+
+    async def _handle_available(self, data, timer):
+        """Act on a /work/available payload; returns (result, settled) as in CaaSClient"""
+        if data.get('status') == 'ok':
+            LAST_SUCCESSFUL_POLL.set_to_current_time()
+            logger.info("Successfully retrieved available tasks")
+
+            work = data.get("data", {}).get("work")
+            POLLS.inc(result="task" if work else "empty")
+            if not work:
+                return data, True
+
+            TASKS_SEEN.inc()
+            task_id = work.get('id')
+
+            task_state = task_rules.check_task_state(task_id, self.mattermost)
+            if task_state == task_rules.MARK_CANCELLED:
+                self.mattermost.mark_task_as_cancelled(task_id)
+                return data, False
+            if task_state != task_rules.PROCEED:
+                return data, task_state in task_rules.SETTLED_STATES
+
+            if not self.mattermost.claim_task(task_id):
+                logger.info(f"Task {task_id} is being handled by another account, skipping")
+                TASKS_SKIPPED.inc(reason="claimed_by_other_account")
+                return data, False
+            try:
+                await self._handle_new_task(task_id, work, data, timer)
+            finally:
+                self.mattermost.release_task(task_id)
+            return data, False
+        elif data.get('status') == 'error':
+            LAST_SUCCESSFUL_POLL.set_to_current_time()
+            POLLS.inc(result="empty")
+            await self.mattermost.send_task_notification("")
+            logger.info("[X] No tasks available at the moment")
+            return None, True
+        else:
+            logger.info(f"Error while fetching tasks: {data}")
+            POLLS.inc(result="error")
+            return None, False
+
+    async def get_available_tasks_and_send_notification(self):
+        """Get available tasks from CaaS and send notification, short-circuiting unchanged responses like CaaSClient"""
+        if not self.access_token:
+            logger.error("Not authenticated. Please login first")
+            return None
+
+        try:
+            logger.info("Fetching available tasks...")
+            timer = StageTimer()
+            timer.mark("poll_started")
+            previous = self.mattermost.get_poll_fingerprint(self.poll_key)
+            with PHASE_SECONDS.time(phase="fetch_available"):
+                status, raw, headers = await self._authorized_fetch(
+                    "GET", self.urls["available"], headers=task_rules.conditional_headers(previous)
+                )
+                current = task_rules.poll_fingerprint(raw, headers.get("ETag"))
+                unchanged = task_rules.is_unchanged(previous, status, current)
+                data = None if unchanged else _decode_json(raw)
+            if not unchanged and data is None:
+                raise ValueError("Non-JSON response from available tasks endpoint")
+            timer.mark("fetched")
+            if unchanged:
+                LAST_SUCCESSFUL_POLL.set_to_current_time()
+                POLLS.inc(result="unchanged")
+                logger.info("Available tasks unchanged since the last poll, nothing new")
+                return task_rules.UNCHANGED
+
+            result, settled = await self._handle_available(data, timer)
+            self.mattermost.save_poll_fingerprint(self.poll_key, current if settled else None)
+            return result
+
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            logger.error(f"Error getting tasks: {str(e)}")
+            POLLS.inc(result="error")
+            return None
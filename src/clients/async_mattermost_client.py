@@ -0,0 +1,141 @@
+"""
+Asyncio Mattermost client for sending notifications
+"""
+
+import asyncio
+import logging
+
+try:
+    import aiohttp
+except ImportError:  # optional dependency: pip install "caas-automation[async]"
+    aiohttp = None
+
+from ..utils import json_codec
+from ..utils.metrics import NOTIFICATIONS_FAILED, timed
+from .mattermost_client import MattermostClient
+from .notification_formatter import format_task_message
+from .task_rules import ACCEPT_OK
+
+logger = logging.getLogger()
+
+
+def require_aiohttp():
+    if aiohttp is None:
+        raise ImportError("The async clients need aiohttp: pip install 'caas-automation[async]'")
+
+
+class AsyncMattermostClient(MattermostClient):
+    """MattermostClient whose webhook calls are coroutines.
+
+    State and history access is inherited unchanged; those are small local file
+    operations and stay synchronous.
+    """
+
+    def __init__(self, session=None, state=None, task_history=None, webhook_url=None, outbox=None):
+        require_aiohttp()
+        super().__init__(state=state, task_history=task_history, webhook_url=webhook_url, outbox=outbox)
+        self._aio_session = session
+
+    @property
+    def aio_session(self):
+        """aiohttp session for webhook posts, created on first use inside the running loop"""
+        if self._aio_session is None or self._aio_session.closed:
+            self._aio_session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self._aio_session
+
+    async def close(self):
+        # The outbox sender is a thread using the blocking session; flush it off the event loop
+        await asyncio.get_running_loop().run_in_executor(None, MattermostClient.close, self)
+        if self._aio_session is not None and not self._aio_session.closed:
+            await self._aio_session.close()
+
+    async def send_message(self, message, attachments=None, coalesce=False):
+        """Queue the message in the outbox, or post it with aiohttp when there is none"""
+        if self.outbox is not None:
+            return MattermostClient.send_message(self, message, attachments, coalesce=coalesce)
+        return await self._post_message(message, attachments)
+
+    @timed("notify")
+    async def _post_message(self, message, attachments=None):
+        if not self.webhook_url:
+            logger.error("Mattermost webhook URL not configured")
+            NOTIFICATIONS_FAILED.inc()
+            return False
+
+        if self.rate_limiter is not None:
+            delay = self.rate_limiter.reserve()
+            if delay > 0:
+                logger.info(f"Mattermost rate limit reached, waiting {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+        try:
+            logger.info("Preparing Mattermost message...")
+            payload = self._build_payload(message, attachments)
+
+            async with self.aio_session.post(
+                self.webhook_url,
+                data=json_codec.dumpb(payload),
+                headers={"Content-Type": "application/json"},
+            ) as response:
+                response.raise_for_status()
+
+            logger.info("Successfully sent message to Mattermost")
+            return True
+
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Failed to send message to Mattermost: {str(e)}")
+            NOTIFICATIONS_FAILED.inc()
+            return False
+
+    async def send_task_notification(self, tasks):
+        """Send a formatted notification about available tasks"""
+        work = self._unnotified_work(tasks)
+        if not work:
+            return
+
+        task_id = work.get("id")
+        if await self.send_message(format_task_message(work, task_id), coalesce=True):
+            self.save_last_task_id(task_id, accepted=False)
+            self.log_task_to_history(work)
+            logger.info(f"Task {task_id} notification sent")
+
+    async def send_task_accepted_notification(self, tasks, accept_outcome=ACCEPT_OK, timer=None):
+        """Send a notification about an auto-accept attempt that has already completed"""
+        work = self._unnotified_work(tasks, "skipping accepted notification")
+        if not work:
+            return
+
+        task_id = work.get("id")
+        # Record the outcome before the webhook call so cancellation tracking never depends on it
+        self.save_last_task_id(task_id, accepted=accept_outcome == ACCEPT_OK)
+        sent = await self.send_message(
+            format_task_message(work, task_id, is_accepted=True, accept_outcome=accept_outcome),
+            coalesce=True,
+        )
+        if timer:
+            timer.mark("notified")
+        self.log_task_to_history(work, accept_outcome=accept_outcome, timings=timer.as_dict() if timer else None)
+        if sent:
+            logger.info(f"Task {task_id} auto-accept outcome '{accept_outcome}' notification sent")
+        else:
+            logger.error(f"Task {task_id} auto-accept outcome '{accept_outcome}' recorded but notification failed")
+
+    async def send_daily_summary(self):
+        """Send daily summary of tasks from last 24 hours"""
+        if not self.should_send_daily_summary():
+            logger.info("Daily summary already sent today")
+            return False
+
+        try:
+            message = self._build_daily_summary_message()
+            if not message:
+                return False
+
+            if await self.send_message(message):
+                self.mark_daily_summary_sent()
+                logger.info("Daily summary sent successfully")
+                return True
+            return False
+        except Exception as e:
+            logger.error(f"Error sending daily summary: {str(e)}")
+            return False
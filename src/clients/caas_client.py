@@ -1,67 +1,145 @@
 """
 CaaS API Client for automation tasks
 """
-import json
 import logging
 import requests
 import time
-from datetime import datetime
 
 from ..config import (
-    AUTO_ACCEPT_CONFIG,
-    AUTO_ACCEPT_ENABLED,
-    AVAILABLE_TASKS_URL,
     CREDENTIALS,
     DEFAULT_HEADERS,
-    SIGNIN_URL,
-    START_WORK_URL,
-    get_auto_accept_window,
+    HTTP_CONFIG,
+    get_api_urls,
 )
-from ..utils.timezone_utils import now_pakistan
+from ..utils.metrics import (
+    ACCEPT_ATTEMPTS,
+    LAST_SUCCESSFUL_POLL,
+    PHASE_SECONDS,
+    POLLS,
+    TASKS_SEEN,
+    TASKS_SKIPPED,
+    timed,
+)
+from ..utils import json_codec
+from ..utils.stage_timer import StageTimer
+from . import task_rules
+from .http_session import build_session
 from .mattermost_client import MattermostClient
-from .task_keywords import ANDROID_KEYWORDS, BACKEND_KEYWORDS, FRONTEND_KEYWORDS
+from .token_store import TokenStateMixin
 
 logger = logging.getLogger()
 
-class CaaSClient:
-    def __init__(self):
-        self.access_token = None
-        self.refresh_token = None
-        self.user_id = None
-        self.headers = DEFAULT_HEADERS.copy()
-        self.mattermost = MattermostClient()
+class CaaSClient(TokenStateMixin):
+    def __init__(self, session=None, base_url=None, mattermost=None, credentials=None, token_store=None, refresh_url=None):
+        self.credentials = credentials or CREDENTIALS
+        self._init_token_state(DEFAULT_HEADERS, token_store, account=self.credentials.get("email"))
+        self.session = session or build_session()
+        self.timeout = HTTP_CONFIG["timeout"]
+        self.urls = get_api_urls(base_url, refresh_url)
+        # A MattermostClient passed in is shared (accounts, daemon); its owner closes it
+        self._owns_mattermost = mattermost is None
+        self.mattermost = mattermost or MattermostClient(session=self.session)
+        # Poll fingerprints are kept per account in the shared state
+        self.poll_key = self.credentials.get("email") or "default"
+
+    def close(self):
+        """Flush the notification outbox of our own MattermostClient, then release pooled connections held by the HTTP session"""
+        if self._owns_mattermost:
+            self.mattermost.close()
+        self.session.close()
+
+    @timed("login")
+    def login(self, force=False):
+        """Authenticate with CaaS API, reusing or refreshing cached tokens unless `force` is set"""
+        if not force and self._restore_cached_tokens():
+            return True
 
-    def login(self):
-        """Authenticate with CaaS API"""
         try:
             logger.info("Preparing login request...")
-            payload = json.dumps(CREDENTIALS)
-            response = requests.post(SIGNIN_URL, headers=self.headers, data=payload)
+            payload = json_codec.dumpb(self.credentials)
+            response = self.session.post(self.urls["signin"], headers=self._unauthenticated_headers(), data=payload, timeout=self.timeout)
             response.raise_for_status()
             
-            data = response.json()
+            data = json_codec.loads(response.content)
             if data.get('status') == 'ok':
-                auth_data = data['data']
-                self.access_token = auth_data['accessToken']
-                self.refresh_token = auth_data['refreshToken']
-                self.user_id = auth_data['userId']
-                
-                self.headers['authorization'] = f'Bearer {self.access_token}'
+                self._apply_auth_data(data['data'])
                 logger.info("Successfully logged in to CaaS")
                 return True
             else:
                 logger.error(f"Login failed: {data}")
                 return False
                 
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, ValueError) as e:
             logger.error(f"Login error: {str(e)}")
             return False
 
+    def refresh_access_token(self):
+        """Renew the access token with the refresh token"""
+        if not self._refresh_token_usable():
+            return False
+
+        try:
+            logger.info("Refreshing CaaS access token...")
+            response = self.session.post(
+                self.urls["refresh"],
+                headers=self._unauthenticated_headers(),
+                data=json_codec.dumpb({"refreshToken": self.refresh_token}),
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+
+            data = json_codec.loads(response.content)
+            if data.get('status') == 'ok':
+                self._apply_auth_data(data['data'])
+                logger.info("Successfully refreshed CaaS access token")
+                return True
+            logger.error(f"Token refresh failed: {data}")
+            return False
+
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.error(f"Token refresh error: {str(e)}")
+            return False
+
+    def ensure_authenticated(self):
+        """Make sure a usable access token is loaded, refreshing or logging in as needed"""
+        if self.access_token and self._access_token_fresh():
+            return True
+        if self.access_token and self.refresh_access_token():
+            return True
+        return self.login(force=bool(self.access_token))
+
+    def _restore_cached_tokens(self):
+        if not self._load_cached_tokens():
+            return False
+        if self._access_token_fresh():
+            logger.info("Reusing cached CaaS access token")
+            return True
+        return self.refresh_access_token()
+
+    def _authorized_request(self, method, url, headers=None, **kwargs):
+        """Send an authenticated request, logging in again once if the token is rejected with 401.
+
+        `headers` are sent on top of the authentication headers.
+        """
+        self.ensure_authenticated()
+        response = self.session.request(method, url, headers={**self.headers, **(headers or {})}, timeout=self.timeout, **kwargs)
+        if response.status_code == 401:
+            logger.info("Access token rejected (401), logging in again...")
+            self.token_store.clear()
+            if self.login(force=True):
+                response = self.session.request(method, url, headers={**self.headers, **(headers or {})}, timeout=self.timeout, **kwargs)
+        return response
+
     def accept_task(self, task_id):
         """Accept a task by its ID"""
+        return self.start_work(task_id) == task_rules.ACCEPT_OK
+
+    @timed("accept")
+    def start_work(self, task_id):
+        """Accept a task by its ID and report the outcome (accepted, failed or lost to another worker)"""
         if not self.access_token:
             logger.error("Not authenticated. Please login first")
-            return False
+            return task_rules.ACCEPT_FAILED
 
         try:
             logger.info(f"Attempting to accept task {task_id}...")
@@ -72,135 +150,135 @@ class CaaSClient:
                 "tzName": "Asia/Karachi"
             }
             
-            response = requests.post(
-                START_WORK_URL,
-                headers=self.headers,
-                data=json.dumps(payload)
-            )
-            response.raise_for_status()
-            
-            data = response.json()
-            if data.get('status') == 'ok':
+            response = self._authorized_request("POST", self.urls["start"], data=json_codec.dumpb(payload))
+            try:
+                data = json_codec.loads(response.content)
+            except ValueError:
+                data = None
+
+            outcome = task_rules.classify_accept_response(response.status_code, data)
+            if outcome == task_rules.ACCEPT_OK:
                 logger.info(f"Successfully accepted task {task_id}")
                 work_token = data.get('data', {}).get('workToken')
                 if work_token:
                     logger.info("Received work token for task")
-                return True
+            elif outcome == task_rules.ACCEPT_LOST:
+                logger.error(f"Task {task_id} could not be accepted, most likely taken by another worker: {data}")
             else:
-                logger.error(f"Failed to accept task: {data}")
-                return False
+                logger.error(f"Failed to accept task (HTTP {response.status_code}): {data}")
+            return outcome
                 
         except requests.exceptions.RequestException as e:
             logger.error(f"Error accepting task: {str(e)}")
-            return False
+            return task_rules.ACCEPT_FAILED
 
     def is_react_native_or_mobile_task(self, work):
         """Check if task is related to React Native, Android, or mobile development based on skills only"""
-        skills = [skill.lower() for skill in work.get('skills', [])]
-
-        return any(keyword.lower() in skills for keyword in ANDROID_KEYWORDS)
+        return task_rules.is_react_native_or_mobile_task(work)
 
     def should_auto_accept(self, work):
         """Check if a task should be auto-accepted based on time, day of week, and skills only"""
-        if not AUTO_ACCEPT_ENABLED:
-            logger.info("Auto-accept disabled by configuration (AUTO_ACCEPT_ENABLED=false)")
-            return False
+        return task_rules.should_auto_accept(work)
 
-        current_datetime = now_pakistan()
-        current_weekday = current_datetime.weekday()
-        if current_weekday not in AUTO_ACCEPT_CONFIG["enabled_days"]:
-            logger.info(f"Auto-accept disabled for weekday={current_weekday} via configuration")
-            return False
+    def _handle_new_task(self, task_id, work, data, timer):
+        """Decide, accept and notify for a task this poller has claimed"""
+        will_auto_accept = self.should_auto_accept(work)
+        timer.mark("decided")
 
-        current_time = current_datetime.time()
-        start_time, end_time = get_auto_accept_window(current_weekday)
+        if will_auto_accept:
+            # Accept first: the Mattermost round trip must not widen the race window
+            logger.info(f"Task {task_id} qualifies for auto-acceptance - accepting before notifying")
+            timer.mark("accept_sent")
+            outcome = self.start_work(task_id)
+            timer.mark("accept_done")
+            ACCEPT_ATTEMPTS.inc(outcome=outcome)
 
-        if not (start_time <= current_time <= end_time):
-            logger.info(
-                "Outside auto-accept time window. Current time: %s, window: %s-%s",
-                current_time,
-                start_time,
-                end_time,
-            )
-            return False
+            self.mattermost.send_task_accepted_notification(data, outcome, timer)
+            logger.info(f"Task {task_id} auto-accept outcome={outcome} timings: {timer.summary()}")
+        else:
+            logger.info(f"Sending notification for task {task_id} - manual acceptance required")
+            self.mattermost.send_task_notification(data)
 
-        if self.is_react_native_or_mobile_task(work):
-            logger.info("Task rejected: Contains React Native or mobile development keywords in skills")
-            return False
+    def _handle_available(self, data, timer):
+        """Act on a /work/available payload; returns (result, settled).
 
-        skills = [skill.lower() for skill in work.get('skills', [])]
+        `settled` means the cycle needed no action, so an identical response next
+        time can be skipped without running the checks again.
+        """
+        if data.get('status') == 'ok':
+            LAST_SUCCESSFUL_POLL.set_to_current_time()
+            logger.info("Successfully retrieved available tasks")
 
-        has_frontend = any(keyword.lower() in skills for keyword in FRONTEND_KEYWORDS)
-        has_backend = any(keyword.lower() in skills for keyword in BACKEND_KEYWORDS)
+            work = data.get("data", {}).get("work")
+            POLLS.inc(result="task" if work else "empty")
+            if not work:
+                return data, True
 
-        if has_frontend or has_backend:
-            logger.info("Task matches auto-accept criteria (frontend or backend keywords found in skills)")
-            return True
+            TASKS_SEEN.inc()
+            task_id = work.get('id')
 
-        logger.info("Task does not match auto-accept criteria")
-        return False
+            task_state = task_rules.check_task_state(task_id, self.mattermost)
+            if task_state == task_rules.MARK_CANCELLED:
+                self.mattermost.mark_task_as_cancelled(task_id)
+                return data, False
+            if task_state != task_rules.PROCEED:
+                return data, task_state in task_rules.SETTLED_STATES
+
+            if not self.mattermost.claim_task(task_id):
+                logger.info(f"Task {task_id} is being handled by another account, skipping")
+                TASKS_SKIPPED.inc(reason="claimed_by_other_account")
+                return data, False
+            try:
+                self._handle_new_task(task_id, work, data, timer)
+            finally:
+                self.mattermost.release_task(task_id)
+            return data, False
+        elif data.get('status') == 'error':
+            LAST_SUCCESSFUL_POLL.set_to_current_time()
+            POLLS.inc(result="empty")
+            self.mattermost.send_task_notification("")
+            logger.info(f"[X] No tasks available at the moment")
+            return None, True
+        else:
+            logger.info(f"Error while fetching tasks: {data}")
+            POLLS.inc(result="error")
+            return None, False
 
     def get_available_tasks_and_send_notification(self):
-        """Get available tasks from CaaS and send notification"""
+        """Get available tasks from CaaS and send notification.
+
+        A response identical to the last settled one (304 on its ETag, or the
+        same body hash) ends the cycle right after the request and returns
+        task_rules.UNCHANGED.
+        """
         if not self.access_token:
             logger.error("Not authenticated. Please login first")
             return None
 
         try:
             logger.info("Fetching available tasks...")
-            response = requests.get(AVAILABLE_TASKS_URL, headers=self.headers)
-            
-            data = response.json()
-            if data.get('status') == 'ok':
-                logger.info("Successfully retrieved available tasks")
-                
-                work = data.get("data", {}).get("work")
-                if work:
-                    task_id = work.get('id')
-                    
-                    last_task_id = self.mattermost.get_last_task_id()
-                    is_already_accepted = self.mattermost.get_accepted_task_status()
-                    was_cancelled = self.mattermost.get_cancelled_task_status()
-
-                    if last_task_id == task_id and is_already_accepted:
-                        logger.info(f"Task {task_id} was previously accepted but now available again - marking as cancelled")
-                        self.mattermost.mark_task_as_cancelled(task_id)
-                        return data
-
-                    if last_task_id == task_id and was_cancelled:
-                        logger.info(f"Task {task_id} was manually cancelled, will not auto-accept again")
-                        return data
-
-                    if self.mattermost.has_task_been_notified(task_id):
-                        logger.info(f"Task {task_id} already notified, skipping")
-                        return data
-
-                    # Check if task qualifies for auto-accept BEFORE sending notification
-                    will_auto_accept = self.should_auto_accept(work)
-                    
-                    if will_auto_accept:
-                        logger.info(f"Task {task_id} qualifies for auto-acceptance - sending accepted notification")
-                        self.mattermost.send_task_accepted_notification(data)
-                        
-                        if self.accept_task(task_id):
-                            logger.info(f"Successfully accepted task {task_id}")
-                        else:
-                            logger.error("Failed to auto-accept task")
-                    else:
-                        logger.info(f"Sending notification for task {task_id} - manual acceptance required")
-                        self.mattermost.send_task_notification(data)
-                    
-                    return data
-                
-                return data
-            elif data.get('status') == 'error':
-                self.mattermost.send_task_notification("")
-                logger.info(f"[X] No tasks available at the moment")
-                return None
-            else:
-                logger.info(f"Error while fetching tasks: {data}")
-                return None
-                
-        except requests.exceptions.RequestException as e:
+            timer = StageTimer()
+            timer.mark("poll_started")
+            previous = self.mattermost.get_poll_fingerprint(self.poll_key)
+            with PHASE_SECONDS.time(phase="fetch_available"):
+                response = self._authorized_request(
+                    "GET", self.urls["available"], headers=task_rules.conditional_headers(previous)
+                )
+                current = task_rules.poll_fingerprint(response.content, response.headers.get("ETag"))
+                unchanged = task_rules.is_unchanged(previous, response.status_code, current)
+                data = None if unchanged else json_codec.loads(response.content)
+            timer.mark("fetched")
+            if unchanged:
+                LAST_SUCCESSFUL_POLL.set_to_current_time()
+                POLLS.inc(result="unchanged")
+                logger.info("Available tasks unchanged since the last poll, nothing new")
+                return task_rules.UNCHANGED
+
+            result, settled = self._handle_available(data, timer)
+            self.mattermost.save_poll_fingerprint(self.poll_key, current if settled else None)
+            return result
+
+        except (requests.exceptions.RequestException, ValueError) as e:
             logger.error(f"Error getting tasks: {str(e)}")
+            POLLS.inc(result="error")
             return None 
\ No newline at end of file
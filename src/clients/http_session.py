@@ -0,0 +1,39 @@
+"""
+Pooled keep-alive HTTP sessions shared by the CaaS and Mattermost clients
+"""
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from ..config import HTTP_CONFIG
+
+
+def build_session(config=None):
+    """Create a requests.Session with a sized connection pool and a retrying adapter.
+
+    Retries cover connection errors for every method, but read/status retries only
+    apply to idempotent methods so a POST such as /work/start is never sent twice.
+    """
+    config = {**HTTP_CONFIG, **(config or {})}
+
+    retries = Retry(
+        total=config["max_retries"],
+        connect=config["max_retries"],
+        read=config["max_retries"],
+        status=config["max_retries"],
+        backoff_factor=config["backoff_factor"],
+        status_forcelist=(502, 503, 504),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=config["pool_connections"],
+        pool_maxsize=config["pool_maxsize"],
+        max_retries=retries,
+    )
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if not config["keep_alive"]:
+        session.headers["Connection"] = "close"
+    return session
@@ -0,0 +1,192 @@
+"""Keyword lists from task_keywords compiled once into lookup structures.
+
+Skills are matched exactly (case-insensitive) through a single dict that maps
+each keyword to a bitmask of the stacks it belongs to, so one pass over a
+task's skills yields every stack hit. Free-text matching uses one compiled
+alternation per stack, which answers "does any keyword occur as a substring"
+in a single scan instead of one `in` check per keyword.
+
+Feature vectors are memoized in a bounded LRU keyed by task id plus a hash of
+the task's skills/title/description; recompiling the keywords clears it.
+"""
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict, namedtuple
+
+from ..config import CLASSIFICATION_CACHE_SIZE
+from .task_keywords import ANDROID_KEYWORDS, BACKEND_KEYWORDS, FRONTEND_KEYWORDS, QA_KEYWORDS
+
+FRONTEND = 1
+BACKEND = 2
+ANDROID = 4
+QA = 8
+
+STACK_KEYWORDS = {
+    FRONTEND: FRONTEND_KEYWORDS,
+    BACKEND: BACKEND_KEYWORDS,
+    ANDROID: ANDROID_KEYWORDS,
+    QA: QA_KEYWORDS,
+}
+
+# Skill hits for each stack, plus the free-text fallback used for pure QA tasks
+TaskFeatures = namedtuple(
+    "TaskFeatures",
+    ["frontend", "backend", "android", "qa", "text_frontend", "text_backend"],
+)
+
+
+def _compile_skill_masks(stack_keywords):
+    masks = {}
+    for stack, keywords in stack_keywords.items():
+        for keyword in keywords:
+            key = keyword.lower()
+            masks[key] = masks.get(key, 0) | stack
+    return masks
+
+
+def _compile_text_pattern(keywords):
+    # Longest first so the alternation settles on the most specific keyword
+    alternatives = sorted({kw.lower() for kw in keywords}, key=len, reverse=True)
+    return re.compile("|".join(re.escape(kw) for kw in alternatives))
+
+
+def _keyword_fingerprint(stack_keywords):
+    digest = hashlib.sha1()
+    for stack in sorted(stack_keywords):
+        digest.update(f"{stack}:{'|'.join(kw.lower() for kw in stack_keywords[stack])}\n".encode())
+    return digest.hexdigest()
+
+
+class FeatureCache:
+    """Bounded, thread-safe LRU of TaskFeatures with hit/miss counters"""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            features = self._entries.get(key)
+            if features is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return features
+
+    def put(self, key, features):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = features
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries), "maxsize": self.maxsize}
+
+
+feature_cache = FeatureCache(CLASSIFICATION_CACHE_SIZE)
+
+
+KEYWORD_FINGERPRINT = None
+
+
+def compile_keywords():
+    """(Re)build the lookup structures from the keyword lists.
+
+    Call this after changing the lists in task_keywords at runtime; memoized
+    results are dropped only when the keyword fingerprint actually changed.
+    """
+    global SKILL_MASKS, TEXT_PATTERNS, KEYWORD_FINGERPRINT
+    fingerprint = _keyword_fingerprint(STACK_KEYWORDS)
+    if fingerprint == KEYWORD_FINGERPRINT:
+        return
+    SKILL_MASKS = _compile_skill_masks(STACK_KEYWORDS)
+    TEXT_PATTERNS = {
+        FRONTEND: _compile_text_pattern(STACK_KEYWORDS[FRONTEND]),
+        BACKEND: _compile_text_pattern(STACK_KEYWORDS[BACKEND]),
+    }
+    KEYWORD_FINGERPRINT = fingerprint
+    feature_cache.clear()
+
+
+compile_keywords()
+
+
+def skills_mask(skills):
+    """OR together the stack bits of every skill that is a known keyword"""
+    mask = 0
+    for skill in skills:
+        mask |= SKILL_MASKS.get(skill.lower(), 0)
+    return mask
+
+
+def full_task_text(work):
+    """Searchable text from the entire task (title, description, skills), lowercased"""
+    return f"{work.get('title', '')} {work.get('description', '')} {' '.join(work.get('skills', []))}".lower()
+
+
+def text_has_keywords(text, stack):
+    return TEXT_PATTERNS[stack].search(text) is not None
+
+
+def extract_features(work):
+    """Compute the stack feature vector for a task in one pass over its skills.
+
+    The title/description scan only runs for pure QA tasks, the one case where
+    the classifier and tagger fall back to free text.
+    """
+    mask = skills_mask(work.get('skills', []))
+    has_frontend = bool(mask & FRONTEND)
+    has_backend = bool(mask & BACKEND)
+    has_qa = bool(mask & QA)
+
+    text_frontend = text_backend = False
+    if has_qa and not has_frontend and not has_backend:
+        text = full_task_text(work)
+        text_frontend = text_has_keywords(text, FRONTEND)
+        text_backend = text_has_keywords(text, BACKEND)
+
+    return TaskFeatures(
+        frontend=has_frontend,
+        backend=has_backend,
+        android=bool(mask & ANDROID),
+        qa=has_qa,
+        text_frontend=text_frontend,
+        text_backend=text_backend,
+    )
+
+
+def _content_key(work):
+    """Cache key: task id plus a hash of the fields classification looks at"""
+    digest = hashlib.sha1()
+    for skill in work.get('skills', []):
+        digest.update(skill.lower().encode())
+        digest.update(b"\x1f")
+    digest.update(b"\x1e")
+    digest.update(str(work.get('title', '')).lower().encode())
+    digest.update(b"\x1e")
+    digest.update(str(work.get('description', '')).lower().encode())
+    task_id = work.get('id', work.get('task_id'))
+    return task_id, digest.hexdigest()
+
+
+def cached_features(work):
+    """extract_features() memoized on the task's normalized content"""
+    key = _content_key(work)
+    features = feature_cache.get(key)
+    if features is None:
+        features = extract_features(work)
+        feature_cache.put(key, features)
+    return features
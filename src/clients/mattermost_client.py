@@ -2,184 +2,351 @@
 Mattermost client for sending notifications
 """
 
-import json
 import logging
+import threading
+from datetime import datetime, timedelta, timezone
 import requests
-import os
-from ..config import MATTERMOST_CONFIG
+from ..config import (
+    HISTORY_RETENTION_DAYS,
+    HTTP_CONFIG,
+    MATTERMOST_CONFIG,
+    MATTERMOST_DELIVERY_CONFIG,
+    NOTIFICATION_OUTBOX_ENABLED,
+    OUTBOX_CONFIG,
+)
+from ..utils import json_codec
+from ..utils.metrics import NOTIFICATIONS_FAILED, timed
+from ..utils.rate_limit import TokenBucket
 from ..utils.timezone_utils import pakistan_date_iso
-from .task_history import TaskHistory
-from .notification_formatter import format_task_message, format_daily_summary
+from .http_session import build_session
+from .outbox import DELIVERED, REJECTED, RETRY, NotificationOutbox, OutboxSender
+from .state_store import DEFAULT_LAST_TASK, create_state_backends
+from .task_rollups import stack_totals
+from .task_rules import ACCEPT_OK
+from .notification_formatter import format_daily_summary, format_grouped_message, format_task_message
 
 logger = logging.getLogger()
 
 
 class MattermostClient:
-    def __init__(self):
-        self.webhook_url = MATTERMOST_CONFIG["webhook_url"]
-        self.last_task_file = "src/data/last_task.json"
-        self.daily_summary_file = "src/data/last_summary_date.json"
-        self.daily_cleanup_file = "src/data/last_cleanup_date.json"
-        self.task_history = TaskHistory()
-        self._initialize_json_files()
+    def __init__(self, session=None, state=None, task_history=None, webhook_url=None, outbox=None):
+        self.webhook_url = webhook_url or MATTERMOST_CONFIG["webhook_url"]
+        self._session = session
+        self.timeout = HTTP_CONFIG["timeout"]
+        # Built and initialized on first use: a poll that finds no task never touches them
+        self._state = state
+        self._task_history = task_history
+        self._state_ready = False
+        self._poll_fingerprints = None
+        self._dedup_since = None
+        self._dedup_day = None
+        # Serializes state/history access and task claims when several pollers share this client
+        self._lock = threading.RLock()
+        self._claimed = set()
+        # outbox=False posts synchronously; None uses the configured on-disk outbox
+        if outbox is None and NOTIFICATION_OUTBOX_ENABLED:
+            outbox = NotificationOutbox(OUTBOX_CONFIG["directory"])
+        self.outbox = None if outbox is False else outbox
+        self.sender = None
+        if self.outbox is not None:
+            self.sender = OutboxSender(
+                self.outbox,
+                self._deliver,
+                base_delay=OUTBOX_CONFIG["base_delay"],
+                max_delay=OUTBOX_CONFIG["max_delay"],
+                batch_size=OUTBOX_CONFIG["batch_size"],
+                coalesce_window=MATTERMOST_DELIVERY_CONFIG["coalesce_seconds"],
+                coalesce_max=MATTERMOST_DELIVERY_CONFIG["coalesce_max"],
+                merge=self._merge_payloads,
+            )
+        rate = MATTERMOST_DELIVERY_CONFIG["rate_per_second"]
+        self.rate_limiter = TokenBucket(rate, MATTERMOST_DELIVERY_CONFIG["burst"]) if rate > 0 else None
     
+    @property
+    def session(self):
+        """HTTP session for webhook posts, created on first use"""
+        if self._session is None:
+            self._session = build_session()
+        return self._session
+
+    @property
+    def state(self):
+        """State store, created and initialized on first use"""
+        if not self._state_ready:
+            self._prepare_state()
+        return self._state
+
+    @property
+    def task_history(self):
+        """Task history, created and initialized on first use"""
+        if not self._state_ready:
+            self._prepare_state()
+        return self._task_history
+
+    def _prepare_state(self):
+        with self._lock:
+            if self._state_ready:
+                return
+            if self._state is None or self._task_history is None:
+                default_state, default_history = create_state_backends()
+                self._state = self._state or default_state
+                self._task_history = self._task_history or default_history
+            self._initialize_json_files()
+            self._state_ready = True
+
     def _initialize_json_files(self):
-        """Create JSON files with default values if they don't exist"""
+        """Create state files (or tables) with default values if they don't exist"""
         try:
-            os.makedirs("src/data", exist_ok=True)
-            files = {
-                self.last_task_file: {"last_task_id": None, "accepted": False, "cancelled": False},
-                self.task_history.history_file: [],
-                self.daily_summary_file: {"last_summary_date": None},
-                self.daily_cleanup_file: {"last_cleanup_date": None}
-            }
-            for path, default_data in files.items():
-                if not os.path.exists(path):
-                    with open(path, "w") as f:
-                        json.dump(default_data, f)
-                    logger.info(f"Created {path}")
+            self._state.initialize()
+            self._task_history.initialize()
         except Exception as e:
             logger.error(f"Error initializing JSON files: {str(e)}")
 
-    def send_message(self, message, attachments=None):
+    def start_sender(self):
+        """Deliver queued notifications from a background thread (long-running mode)"""
+        if self.sender is not None:
+            self.sender.start()
+
+    def close(self):
+        """Stop the background sender and flush whatever is still queued"""
+        if self.sender is not None:
+            self.sender.stop(OUTBOX_CONFIG["flush_timeout"])
+
+    def _build_payload(self, message, attachments=None):
+        payload = {
+            "text": f"{message}",
+        }
+
+        if attachments:
+            payload["attachments"] = attachments
+        return payload
+
+    def _merge_payloads(self, payloads):
+        """Combine coalesced payloads into one post"""
+        merged = {"text": format_grouped_message([payload.get("text", "") for payload in payloads])}
+        attachments = [attachment for payload in payloads for attachment in payload.get("attachments", [])]
+        if attachments:
+            merged["attachments"] = attachments
+        return merged
+
+    @timed("notify")
+    def send_message(self, message, attachments=None, coalesce=False):
+        """Queue a message in the outbox (or post it directly without one); True when it is safely on its way.
+
+        `coalesce` lets the outbox merge it with other notifications queued around the same time.
+        """
         if not self.webhook_url:
             logger.error("Mattermost webhook URL not configured")
+            NOTIFICATIONS_FAILED.inc()
             return False
 
-        try:
-            logger.info("Preparing Mattermost message...")
-            payload = {
-                "text": f"{message}",
-            }
+        payload = self._build_payload(message, attachments)
+        if self.outbox is not None:
+            try:
+                self.outbox.enqueue(payload, coalesce=coalesce)
+                self.sender.notify()
+                return True
+            except Exception as e:
+                logger.error(f"Could not queue Mattermost message, posting directly: {str(e)}")
 
-            if attachments:
-                payload["attachments"] = attachments
+        return self._deliver(payload) == DELIVERED
 
-            response = requests.post(
+    @timed("notify_delivery")
+    def _deliver(self, payload):
+        """POST a payload to the webhook and classify the result as DELIVERED, RETRY or REJECTED"""
+        if self.rate_limiter is not None:
+            waited = self.rate_limiter.acquire()
+            if waited:
+                logger.info(f"Mattermost rate limit reached, waited {waited:.2f}s")
+
+        try:
+            logger.info("Sending Mattermost message...")
+            response = self.session.post(
                 self.webhook_url,
-                data=json.dumps(payload),
+                data=json_codec.dumpb(payload),
                 headers={"Content-Type": "application/json"},
+                timeout=self.timeout,
             )
+            if 400 <= response.status_code < 500 and response.status_code not in (408, 429):
+                logger.error(f"Mattermost rejected the message (HTTP {response.status_code}): {response.text[:200]}")
+                NOTIFICATIONS_FAILED.inc()
+                return REJECTED
             response.raise_for_status()
 
             logger.info("Successfully sent message to Mattermost")
-            return True
+            return DELIVERED
 
         except requests.exceptions.RequestException as e:
             logger.error(f"Failed to send message to Mattermost: {str(e)}")
-            return False
+            NOTIFICATIONS_FAILED.inc()
+            return RETRY
 
-    def get_last_task_id(self):
-        """Get the last task ID from the storage file"""
+    def get_last_task_state(self):
+        """Return the whole last-task state (id, accepted, cancelled) in one read"""
         try:
-            if not os.path.exists(self.last_task_file) or os.path.getsize(self.last_task_file) == 0:
-                return None
-            with open(self.last_task_file, "r") as f:
-                content = f.read().strip()
-                if not content:
-                    return None
-                data = json.loads(content)
-                return data.get("last_task_id")
-        except (json.JSONDecodeError, ValueError):
-            return None
+            with self._lock:
+                return self.state.load_last_task()
         except Exception as e:
-            logger.error(f"Error reading last task ID: {str(e)}")
-            return None
+            logger.error(f"Error reading last task state: {str(e)}")
+            return dict(DEFAULT_LAST_TASK)
+
+    def get_last_task_id(self):
+        """Get the last task ID from the state store"""
+        return self.get_last_task_state().get("last_task_id")
 
     def save_last_task_id(self, task_id, accepted=False, cancelled=False):
-        """Save the last task ID to the storage file"""
+        """Save the last task ID to the state store"""
         try:
-            os.makedirs(os.path.dirname(self.last_task_file), exist_ok=True)
-            temp_file = self.last_task_file + ".tmp"
-            with open(temp_file, "w") as f:
-                json.dump({"last_task_id": task_id, "accepted": accepted, "cancelled": cancelled}, f)
-            if os.path.exists(self.last_task_file):
-                os.remove(self.last_task_file)
-            os.rename(temp_file, self.last_task_file)
+            with self._lock:
+                self.state.save_last_task(task_id, accepted=accepted, cancelled=cancelled)
         except Exception as e:
             logger.error(f"Error saving last task ID: {str(e)}")
     
     def get_accepted_task_status(self):
         """Get the accepted status of the last task"""
-        try:
-            if not os.path.exists(self.last_task_file) or os.path.getsize(self.last_task_file) == 0:
-                return False
-            with open(self.last_task_file, "r") as f:
-                content = f.read().strip()
-                if not content:
-                    return False
-                data = json.loads(content)
-                return data.get("accepted", False)
-        except (json.JSONDecodeError, ValueError):
-            return False
-        except Exception as e:
-            logger.error(f"Error reading accepted status: {str(e)}")
-            return False
+        return self.get_last_task_state().get("accepted", False)
     
     def get_cancelled_task_status(self):
         """Check if the last task was manually cancelled"""
-        try:
-            if not os.path.exists(self.last_task_file) or os.path.getsize(self.last_task_file) == 0:
-                return False
-            with open(self.last_task_file, "r") as f:
-                content = f.read().strip()
-                if not content:
-                    return False
-                data = json.loads(content)
-                return data.get("cancelled", False)
-        except (json.JSONDecodeError, ValueError):
-            return False
-        except Exception as e:
-            logger.error(f"Error reading cancelled status: {str(e)}")
-            return False
+        return self.get_last_task_state().get("cancelled", False)
     
     def mark_task_as_cancelled(self, task_id):
         """Mark a task as manually cancelled to prevent re-acceptance"""
         try:
             self.save_last_task_id(task_id, accepted=False, cancelled=True)
+            with self._lock:
+                self.state.record_cancellation(task_id)
             logger.info(f"Task {task_id} marked as cancelled")
         except Exception as e:
             logger.error(f"Error marking task as cancelled: {str(e)}")
 
-    def log_task_to_history(self, work):
+    def _load_poll_fingerprints(self):
+        # Read once per process: daemon cycles compare in memory, a cron run reads the state store
+        if self._poll_fingerprints is None:
+            self._poll_fingerprints = self.state.get_marker("poll_fingerprint") or {}
+        return self._poll_fingerprints
+
+    def get_poll_fingerprint(self, key):
+        """Fingerprint of the last settled /work/available response seen by poller `key`, or None"""
+        try:
+            with self._lock:
+                return self._load_poll_fingerprints().get(key)
+        except Exception as e:
+            logger.error(f"Error reading poll fingerprint: {str(e)}")
+            return None
+
+    def save_poll_fingerprint(self, key, fingerprint):
+        """Remember the fingerprint for poller `key` (None forgets it); the state store is only written on change"""
+        try:
+            with self._lock:
+                fingerprints = self._load_poll_fingerprints()
+                if fingerprints.get(key) == fingerprint:
+                    return
+                if fingerprint is None:
+                    fingerprints.pop(key, None)
+                else:
+                    fingerprints[key] = fingerprint
+                self.state.set_marker("poll_fingerprint", fingerprints)
+        except Exception as e:
+            logger.error(f"Error saving poll fingerprint: {str(e)}")
+
+    @timed("history_write")
+    def log_task_to_history(self, work, accept_outcome=None, timings=None):
         """Log a task to the history file"""
-        self.task_history.log_task(work)
+        with self._lock:
+            self.task_history.log_task(
+                work, accept_outcome=accept_outcome, timings=timings, since=self._dedup_window_start()
+            )
+
+    def _dedup_window_start(self):
+        """When the last end-of-day reset ran (ISO UTC): tasks logged before it may be notified again"""
+        # Re-read once per Pakistan date; a reset by this client updates it directly
+        today = pakistan_date_iso()
+        if self._dedup_day != today:
+            self._dedup_since = self.state.get_marker("dedup_reset_at")
+            self._dedup_day = today
+        return self._dedup_since
 
     def has_task_been_notified(self, task_id):
-        """Check if a task notification has already been sent"""
-        return self.task_history.has_task(task_id)
+        """Check if a task notification has already been sent since the last end-of-day reset"""
+        with self._lock:
+            return self.task_history.has_task(task_id, self._dedup_window_start())
+
+    def claim_task(self, task_id):
+        """Reserve a task for one poller; False if another poller holds it or it was already notified"""
+        with self._lock:
+            if task_id in self._claimed or self.task_history.has_task(task_id, self._dedup_window_start()):
+                return False
+            self._claimed.add(task_id)
+            return True
 
-    def send_task_notification(self, tasks):
-        """Send a formatted notification about available tasks"""
+    def release_task(self, task_id):
+        """Drop a claim once the task has been accepted/notified (or given up on)"""
+        with self._lock:
+            self._claimed.discard(task_id)
+
+    def _unnotified_work(self, tasks, skip_note="skipping"):
+        """Return the work item from an /work/available payload unless it was already notified"""
         if not tasks or not tasks.get("data", {}).get("work"):
-            return
+            return None
 
         work = tasks["data"]["work"]
         task_id = work.get("id")
         if self.has_task_been_notified(task_id):
-            logger.info(f"Task {task_id} already notified, skipping")
+            logger.info(f"Task {task_id} already notified, {skip_note}")
+            return None
+        return work
+
+    def send_task_notification(self, tasks):
+        """Send a formatted notification about available tasks"""
+        work = self._unnotified_work(tasks)
+        if not work:
             return
 
-        if self.send_message(format_task_message(work, task_id)):
+        task_id = work.get("id")
+        if self.send_message(format_task_message(work, task_id), coalesce=True):
             self.save_last_task_id(task_id, accepted=False)
             self.log_task_to_history(work)
             logger.info(f"Task {task_id} notification sent")
 
-    def send_task_accepted_notification(self, tasks):
-        """Send a notification that a task has been auto-accepted"""
-        if not tasks or not tasks.get("data", {}).get("work"):
+    def send_task_accepted_notification(self, tasks, accept_outcome=ACCEPT_OK, timer=None):
+        """Send a notification about an auto-accept attempt that has already completed"""
+        work = self._unnotified_work(tasks, "skipping accepted notification")
+        if not work:
             return
 
-        work = tasks["data"]["work"]
         task_id = work.get("id")
-        if self.has_task_been_notified(task_id):
-            logger.info(f"Task {task_id} already notified, skipping accepted notification")
-            return
-
-        if self.send_message(format_task_message(work, task_id, is_accepted=True)):
-            self.save_last_task_id(task_id, accepted=True)
-            self.log_task_to_history(work)
-            logger.info(f"Task {task_id} marked as accepted and notification sent")
+        # Record the outcome before the webhook call so cancellation tracking never depends on it
+        self.save_last_task_id(task_id, accepted=accept_outcome == ACCEPT_OK)
+        sent = self.send_message(
+            format_task_message(work, task_id, is_accepted=True, accept_outcome=accept_outcome),
+            coalesce=True,
+        )
+        if timer:
+            timer.mark("notified")
+        self.log_task_to_history(work, accept_outcome=accept_outcome, timings=timer.as_dict() if timer else None)
+        if sent:
+            logger.info(f"Task {task_id} auto-accept outcome '{accept_outcome}' notification sent")
+        else:
+            logger.error(f"Task {task_id} auto-accept outcome '{accept_outcome}' recorded but notification failed")
+
+    def _build_daily_summary_message(self):
+        """Build the daily summary text, or None when there is no task history.
+
+        The totals come from the hourly rollups, so the window starts at the top
+        of the hour 24 hours ago; only a day with tasks reads their entries.
+        """
+        since = (datetime.now(timezone.utc) - timedelta(hours=24)).replace(minute=0, second=0, microsecond=0)
+        with self._lock:
+            counts = stack_totals(self.task_history.get_hourly_rollups(since=since))
+        if not counts:
+            return "📊 **Daily Task Summary (Last 24 Hours)**\n\n✅ No tasks were received in the last 24 hours.\n\n_All clear!_"
+
+        summary = self.task_history.get_last_24_hours_summary(since=since)
+        if not summary:
+            logger.info("No task history available")
+            return None
+        return format_daily_summary(summary, counts)
 
     def send_daily_summary(self):
         """Send daily summary of tasks from last 24 hours"""
@@ -188,21 +355,11 @@ class MattermostClient:
             return False
         
         try:
-            summary = self.task_history.get_last_24_hours_summary()
-            if not summary:
-                logger.info("No task history available")
+            message = self._build_daily_summary_message()
+            if not message:
                 return False
-            
-            total_tasks = sum(len(tasks) for tasks in summary.values())
-            if total_tasks == 0:
-                message = "📊 **Daily Task Summary (Last 24 Hours)**\n\n✅ No tasks were received in the last 24 hours.\n\n_All clear!_"
-                if self.send_message(message):
-                    self.mark_daily_summary_sent()
-                    logger.info("Daily summary sent: No tasks in last 24 hours")
-                    return True
-                return False
-            
-            if self.send_message(format_daily_summary(summary)):
+
+            if self.send_message(message):
                 self.mark_daily_summary_sent()
                 logger.info("Daily summary sent successfully")
                 return True
@@ -214,11 +371,7 @@ class MattermostClient:
     def should_send_daily_summary(self):
         """Check if daily summary should be sent (once per day) using Pakistan time"""
         try:
-            today = pakistan_date_iso()
-            if os.path.exists(self.daily_summary_file):
-                with open(self.daily_summary_file, "r") as f:
-                    return json.load(f).get('last_summary_date') != today
-            return True
+            return self.state.get_marker("last_summary_date") != pakistan_date_iso()
         except Exception as e:
             logger.error(f"Error checking daily summary status: {str(e)}")
             return False
@@ -226,26 +379,14 @@ class MattermostClient:
     def mark_daily_summary_sent(self):
         """Mark that daily summary has been sent today using Pakistan date"""
         try:
-            os.makedirs(os.path.dirname(self.daily_summary_file), exist_ok=True)
-            with open(self.daily_summary_file, "w") as f:
-                json.dump({"last_summary_date": pakistan_date_iso()}, f)
+            self.state.set_marker("last_summary_date", pakistan_date_iso())
         except Exception as e:
             logger.error(f"Error marking daily summary as sent: {str(e)}")
 
     def should_cleanup_end_of_day(self):
         """Check if end-of-day cleanup should be performed (once per day) using Pakistan time"""
         try:
-            today = pakistan_date_iso()
-            if os.path.exists(self.daily_cleanup_file):
-                with open(self.daily_cleanup_file, "r") as f:
-                    content = f.read().strip()
-                    if not content:
-                        return True
-                    return json.loads(content).get('last_cleanup_date') != today
-            return True
-        except (json.JSONDecodeError, ValueError):
-            logger.warning("Cleanup tracking file corrupted or empty, allowing cleanup")
-            return True
+            return self.state.get_marker("last_cleanup_date") != pakistan_date_iso()
         except Exception as e:
             logger.error(f"Error checking cleanup status: {str(e)}")
             return False
@@ -253,28 +394,39 @@ class MattermostClient:
     def mark_daily_cleanup_done(self):
         """Mark that end-of-day cleanup has been performed today using Pakistan date"""
         try:
-            os.makedirs(os.path.dirname(self.daily_cleanup_file), exist_ok=True)
-            with open(self.daily_cleanup_file, "w") as f:
-                json.dump({"last_cleanup_date": pakistan_date_iso()}, f)
+            self.state.set_marker("last_cleanup_date", pakistan_date_iso())
         except Exception as e:
             logger.error(f"Error marking cleanup as done: {str(e)}")
 
     def cleanup_json_files_end_of_day(self):
-        """Cleanup all JSON files at end of day (11:59 PM Pakistan time)"""
+        """Reset the dedup state at end of day (11:59 PM Pakistan time) and apply history retention.
+
+        The history itself is kept for HISTORY_RETENTION_DAYS: the reset time
+        recorded in the state store ends the dedup window, so tasks notified
+        today are announced again if they reappear tomorrow.
+        """
         try:
-            os.makedirs("src/data", exist_ok=True)
             logger.info("Starting JSON files cleanup at end of day...")
 
-            self.task_history.clear_history()
-            logger.info("Cleared task_history.json - now empty []")
+            with self._lock:
+                self._dedup_since = datetime.now(timezone.utc).isoformat()
+                self._dedup_day = pakistan_date_iso()
+                self.state.set_marker("dedup_reset_at", self._dedup_since)
+            logger.info("Reset task dedup window")
 
-            with open(self.last_task_file, "w") as f:
-                json.dump({"last_task_id": None, "accepted": False, "cancelled": False}, f)
-            logger.info("Reset last_task.json to defaults")
+            self.task_history.cleanup_old_tasks(days=HISTORY_RETENTION_DAYS)
 
-            with open(self.daily_summary_file, "w") as f:
-                json.dump({"last_summary_date": pakistan_date_iso()}, f)
-            logger.info("Updated last_summary_date.json to today's Pakistan date")
+            self.state.save_last_task(None, accepted=False, cancelled=False)
+            logger.info("Reset last task state to defaults")
+
+            # With the history gone, the next response must go through the full checks again
+            with self._lock:
+                self._poll_fingerprints = {}
+                self.state.set_marker("poll_fingerprint", {})
+            logger.info("Cleared poll fingerprints")
+
+            self.state.set_marker("last_summary_date", pakistan_date_iso())
+            logger.info("Updated last summary date to today's Pakistan date")
 
             self.mark_daily_cleanup_done()
             logger.info("Recorded end-of-day cleanup completion")
@@ -282,4 +434,3 @@ class MattermostClient:
             logger.info("All JSON files cleaned up successfully - ready for new tasks!")
         except Exception as e:
             logger.error(f"Error cleaning JSON files at end of day: {str(e)}")
-
@@ -2,11 +2,26 @@ from datetime import datetime, timezone
 
 from ..utils.timezone_utils import convert_utc_to_pakistan_time
 from .task_classifier import get_tags_for_task
+from .task_rules import ACCEPT_FAILED, ACCEPT_LOST
 
-def format_task_message(work, task_id, is_accepted=False):
+# Title and footer for auto-accept attempts that did not succeed
+ACCEPT_OUTCOME_TEXT = {
+    ACCEPT_FAILED: (
+        "⚠️ **Auto-Accept Failed - Manual Acceptance Required!**",
+        "\n\n🤖 Auto-accept was attempted during configured auto-accept hours but the request failed",
+    ),
+    ACCEPT_LOST: (
+        "⏱️ **Task Taken Before Auto-Accept**",
+        "\n\n🤖 Auto-accept was attempted but the task was no longer available (likely taken by another worker)",
+    ),
+}
+
+def format_task_message(work, task_id, is_accepted=False, accept_outcome=None):
     tags = get_tags_for_task(work)
     title = "✅ **Task Auto-Accepted!**" if is_accepted else "🎯 **New Task Available!**"
     time_note = "\n\n🤖 This task was automatically accepted during configured auto-accept hours" if is_accepted else ""
+    if accept_outcome in ACCEPT_OUTCOME_TEXT:
+        title, time_note = ACCEPT_OUTCOME_TEXT[accept_outcome]
     
     return (
         f"{tags}\n\n{title}\n\n"
@@ -20,15 +35,21 @@ def format_task_message(work, task_id, is_accepted=False):
     )
 
 
-def format_daily_summary(summary):
-
-    total_tasks = sum(len(tasks) for tasks in summary.values())
+def format_daily_summary(summary, counts=None):
+    """Summary post listing `summary`'s tasks; `counts` ({stack: count}, e.g. from the rollups) gives the totals"""
+    if counts is None:
+        counts = {stack_type: len(tasks) for stack_type, tasks in summary.items()}
+    total_tasks = sum(counts.values())
     
     message = f"📊 **Daily Task Summary (Last 24 Hours)**\n\n**Total Tasks:** {total_tasks}\n\n"
     
-    for stack_type in ['frontend', 'backend', 'android', 'qa']:
+    # Stacks outside the four listed ones (e.g. "other" in old entries) only show their count
+    stack_types = ['frontend', 'backend', 'android', 'qa']
+    stack_types += sorted(stack_type for stack_type in counts if stack_type not in stack_types)
+    for stack_type in stack_types:
         tasks = summary.get(stack_type, [])
-        if tasks:
+        count = counts.get(stack_type, 0)
+        if count or tasks:
             stack_emoji = {
                 'frontend': '🎨',
                 'backend': '⚙️',
@@ -36,7 +57,7 @@ def format_daily_summary(summary):
                 'qa': '🧪'
             }.get(stack_type, '📌')
             
-            message += f"{stack_emoji} **{stack_type.upper()} ({len(tasks)} tasks)**\n"
+            message += f"{stack_emoji} **{stack_type.upper()} ({count} tasks)**\n"
             for task in tasks:
                 # Convert UTC timestamp to Pakistan time (UTC+5)
                 utc_time = datetime.fromisoformat(task['timestamp'])
@@ -52,3 +73,11 @@ def format_daily_summary(summary):
     message += f"_Generated on {now_pakistan.strftime('%Y-%m-%d at %I:%M %p')} PKT_"
     
     return message
+
+
+def format_grouped_message(messages):
+    """Merge several notification texts into one post, separated by horizontal rules"""
+    if len(messages) == 1:
+        return messages[0]
+    header = f"📬 **{len(messages)} task notifications**"
+    return header + "\n\n---\n\n" + "\n\n---\n\n".join(messages)
@@ -0,0 +1,350 @@
+"""
+Durable outbox for Mattermost webhook posts
+
+Every message is one small JSON file in the outbox directory, written with an
+atomic rename, so queueing a notification costs a local write and survives a
+crash. OutboxSender delivers the files oldest first from a background thread.
+While the webhook keeps failing it backs off exponentially. Once the webhook
+recovers it drains the whole backlog in one go. Consecutive messages queued
+with `coalesce=True` within a short window are merged into a single post.
+
+Several processes may send from the same directory (the daemon's sender and a
+cron run's flush): a message is claimed by renaming it into `inflight/` before
+it is posted, so only one of them posts it. A claim left behind by a process
+that died mid-post is returned to the queue after `claim_timeout` seconds.
+"""
+import itertools
+import logging
+import os
+import threading
+import time
+
+from ..utils.metrics import OUTBOX_DEAD_LETTERS, OUTBOX_PENDING
+from ..utils import json_codec
+
+logger = logging.getLogger()
+
+# Results of a delivery attempt
+DELIVERED = "delivered"
+RETRY = "retry"
+REJECTED = "rejected"
+
+
+class NotificationOutbox:
+    """Spool directory of pending webhook payloads; rejected ones are moved to `failed/`"""
+
+    def __init__(self, directory="src/data/outbox"):
+        self.directory = directory
+        self.failed_directory = os.path.join(directory, "failed")
+        self.inflight_directory = os.path.join(directory, "inflight")
+        self._sequence = itertools.count()
+
+    def _path(self, message_id):
+        return os.path.join(self.directory, message_id + ".json")
+
+    def _inflight_path(self, message_id):
+        return os.path.join(self.inflight_directory, message_id + ".json")
+
+    def _write(self, message):
+        path = self._path(message["id"])
+        temp_file = path + ".tmp"
+        with open(temp_file, "wb") as f:
+            f.write(json_codec.dumpb(message))
+        os.replace(temp_file, path)
+
+    def enqueue(self, payload, coalesce=False):
+        """Store a webhook payload for delivery and return its message id.
+
+        `coalesce` marks messages that may be merged with their neighbours into one post.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        # Zero-padded nanosecond prefix: sorting the file names gives enqueue order
+        message_id = f"{time.time_ns():020d}-{os.getpid()}-{next(self._sequence):06d}"
+        message = {"id": message_id, "payload": payload, "attempts": 0, "enqueued_at": time.time()}
+        if coalesce:
+            message["coalesce"] = True
+        self._write(message)
+        return message_id
+
+    def pending(self, limit=None):
+        """Ids of messages waiting for delivery, oldest first"""
+        try:
+            names = sorted(name for name in os.listdir(self.directory) if name.endswith(".json"))
+        except FileNotFoundError:
+            return []
+        ids = [name[:-len(".json")] for name in names]
+        return ids[:limit] if limit else ids
+
+    def __len__(self):
+        return len(self.pending())
+
+    def load(self, message_id):
+        """Read a queued message; a corrupted file is set aside and reads as None"""
+        try:
+            with open(self._path(message_id), "rb") as f:
+                return json_codec.load(f)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            logger.warning(f"Outbox message {message_id} is corrupted, moving it to {self.failed_directory}")
+            self.dead_letter(message_id)
+            return None
+
+    def claim(self, message_id):
+        """Take a queued message for posting; False when another sender claimed (or delivered) it first"""
+        os.makedirs(self.inflight_directory, exist_ok=True)
+        try:
+            os.replace(self._path(message_id), self._inflight_path(message_id))
+        except FileNotFoundError:
+            return False
+        # The claim's age is its mtime, which a rename keeps
+        os.utime(self._inflight_path(message_id))
+        return True
+
+    def release(self, message_id):
+        """Put a claimed message back in the queue"""
+        try:
+            os.replace(self._inflight_path(message_id), self._path(message_id))
+        except FileNotFoundError:
+            pass
+
+    def recover(self, claim_timeout):
+        """Return claims older than `claim_timeout` seconds, left by a sender that died mid-post, to the queue"""
+        try:
+            names = [name for name in os.listdir(self.inflight_directory) if name.endswith(".json")]
+        except FileNotFoundError:
+            return 0
+        cutoff = time.time() - claim_timeout
+        recovered = 0
+        for name in names:
+            try:
+                if os.path.getmtime(os.path.join(self.inflight_directory, name)) < cutoff:
+                    self.release(name[:-len(".json")])
+                    recovered += 1
+            except FileNotFoundError:
+                continue
+        if recovered:
+            logger.warning(f"Returned {recovered} stale outbox claim(s) to the queue")
+        return recovered
+
+    def ack(self, message_id):
+        """Remove a delivered message"""
+        try:
+            os.remove(self._inflight_path(message_id))
+        except FileNotFoundError:
+            pass
+
+    def record_failure(self, message):
+        """Count a failed attempt and put the claimed message back in the queue"""
+        message["attempts"] = message.get("attempts", 0) + 1
+        message["last_attempt_at"] = time.time()
+        self._write(message)
+        try:
+            os.remove(self._inflight_path(message["id"]))
+        except FileNotFoundError:
+            pass
+
+    def dead_letter(self, message_id):
+        """Move a message the webhook will never accept (claimed or still queued) out of the queue"""
+        os.makedirs(self.failed_directory, exist_ok=True)
+        target = os.path.join(self.failed_directory, message_id + ".json")
+        for path in (self._inflight_path(message_id), self._path(message_id)):
+            try:
+                os.replace(path, target)
+                OUTBOX_DEAD_LETTERS.inc()
+                return
+            except FileNotFoundError:
+                continue
+
+
+class OutboxSender:
+    """Delivers outbox messages through `deliver(payload)`, from a background thread or on demand.
+
+    `deliver` returns DELIVERED, RETRY (transient failure: back off and keep the
+    message) or REJECTED (the webhook refused it: dead-letter it and move on).
+    With a `coalesce_window`, `merge(payloads)` combines up to `coalesce_max`
+    coalescible messages queued within the window into one payload.
+    """
+
+    def __init__(
+        self,
+        outbox,
+        deliver,
+        base_delay=2.0,
+        max_delay=300.0,
+        batch_size=100,
+        idle_interval=30.0,
+        coalesce_window=0.0,
+        coalesce_max=10,
+        merge=None,
+        max_chars=12000,
+        claim_timeout=300.0,
+    ):
+        self.outbox = outbox
+        self.deliver = deliver
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.batch_size = batch_size
+        self.idle_interval = idle_interval
+        self.coalesce_window = coalesce_window if merge else 0.0
+        self.coalesce_max = coalesce_max
+        self.merge = merge
+        self.max_chars = max_chars
+        self.claim_timeout = claim_timeout
+        self.failures = 0
+        self.next_attempt_at = 0.0
+        self._delivered = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._drain_lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="mattermost-outbox", daemon=True)
+            self._thread.start()
+        return self
+
+    def notify(self):
+        """Wake the sender after a new message was queued"""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            delay = max(self.next_attempt_at - time.time(), self._coalesce_wait())
+            if delay > 0:
+                self._stop.wait(delay)
+                continue
+            self._wake.clear()
+            try:
+                self.drain()
+            except Exception as e:
+                logger.error(f"Error delivering Mattermost outbox: {str(e)}")
+                self._back_off()
+            # stop() may have set _wake before the clear() above
+            if self._stop.is_set():
+                break
+            # Retry when the backoff ends, and also wake up periodically to pick up
+            # messages queued by other processes
+            wait = self.idle_interval
+            if self.next_attempt_at > time.time():
+                wait = min(wait, self.next_attempt_at - time.time())
+            self._wake.wait(max(0.0, wait))
+
+    def _coalesce_wait(self):
+        """Seconds to hold the oldest message so the rest of its burst can join it"""
+        if not self.coalesce_window:
+            return 0.0
+        oldest = self.outbox.pending(1)
+        message = self.outbox.load(oldest[0]) if oldest else None
+        if not message or not message.get("coalesce"):
+            return 0.0
+        return message["enqueued_at"] + self.coalesce_window - time.time()
+
+    def _back_off(self):
+        self.failures += 1
+        delay = min(self.max_delay, self.base_delay * 2 ** (self.failures - 1))
+        self.next_attempt_at = time.time() + delay
+        logger.warning(f"Mattermost delivery failed, retrying in {delay:.1f}s ({len(self.outbox)} queued)")
+
+    def _can_join(self, group, message):
+        first = group[0]
+        return (
+            self.coalesce_window > 0
+            and first.get("coalesce")
+            and message.get("coalesce")
+            and len(group) < self.coalesce_max
+            and message["enqueued_at"] - first["enqueued_at"] <= self.coalesce_window
+            and sum(len(m["payload"].get("text", "")) for m in group + [message]) <= self.max_chars
+        )
+
+    def _groups(self, message_ids):
+        """Load messages in order and split them into posts"""
+        group = []
+        for message_id in message_ids:
+            message = self.outbox.load(message_id)
+            if message is None:
+                continue
+            if group and self._can_join(group, message):
+                group.append(message)
+                continue
+            if group:
+                yield group
+            group = [message]
+        if group:
+            yield group
+
+    def _deliver_group(self, group):
+        """Claim and post one group of messages; returns False when delivery has to be retried later"""
+        group = [message for message in group if self.outbox.claim(message["id"])]
+        if not group:
+            return True  # taken by another sender
+        return self._post_group(group)
+
+    def _post_group(self, group):
+        payload = group[0]["payload"] if len(group) == 1 else self.merge([m["payload"] for m in group])
+        result = self.deliver(payload)
+        if result == DELIVERED:
+            for message in group:
+                self.outbox.ack(message["id"])
+            self.failures = 0
+            self.next_attempt_at = 0.0
+            self._delivered += len(group)
+            return True
+
+        if result == REJECTED:
+            if len(group) > 1:
+                # The merged post was refused; fall back to one post per message, all still claimed
+                for position, message in enumerate(group):
+                    if not self._post_group([message]):
+                        for rest in group[position + 1:]:
+                            self.outbox.release(rest["id"])
+                        return False
+                return True
+            logger.error(f"Mattermost rejected outbox message {group[0]['id']}, moved to {self.outbox.failed_directory}")
+            self.outbox.dead_letter(group[0]["id"])
+            return True
+
+        self.outbox.record_failure(group[0])
+        for message in group[1:]:
+            self.outbox.release(message["id"])
+        self._back_off()
+        return False
+
+    def drain(self, deadline=None):
+        """Deliver queued messages oldest first until the outbox is empty, a delivery fails or `deadline` passes.
+
+        Returns the number of messages delivered.
+        """
+        with self._drain_lock:
+            self._delivered = 0
+            self.outbox.recover(self.claim_timeout)
+            try:
+                while True:
+                    batch = self.outbox.pending(self.batch_size)
+                    if not batch:
+                        return self._delivered
+                    for group in self._groups(batch):
+                        if deadline is not None and time.time() >= deadline:
+                            return self._delivered
+                        if not self._deliver_group(group):
+                            return self._delivered
+            finally:
+                OUTBOX_PENDING.set(len(self.outbox))
+                if self._delivered:
+                    logger.info(f"Delivered {self._delivered} queued Mattermost message(s)")
+
+    def flush(self, timeout=30.0):
+        """Deliver what is queued right now, ignoring backoff and the coalescing window, for at most `timeout` seconds"""
+        return self.drain(deadline=time.time() + timeout)
+
+    def stop(self, timeout=30.0):
+        """Stop the background thread, then make one last attempt to flush the outbox, within `timeout` seconds overall"""
+        deadline = time.time() + timeout
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        return self.drain(deadline=deadline)
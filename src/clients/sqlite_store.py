@@ -0,0 +1,428 @@
+"""
+SQLite backend for task history and poller state
+
+Enable with STATE_BACKEND=sqlite. Existing JSON state can be imported once with:
+
+    python -m src.clients.sqlite_store --data-dir src/data --db src/data/state.db
+"""
+import argparse
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+
+from .state_store import DEFAULT_LAST_TASK, JsonStateStore, MARKER_FILES
+from ..config import ROLLUP_RETENTION_DAYS
+from ..utils import json_codec
+from ..utils.timezone_utils import PAKISTAN_TZ
+from .task_classifier import get_task_stack_type
+from .task_rollups import rollup_key
+
+logger = logging.getLogger()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS task_history (
+    task_id PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    stack_type TEXT,
+    entry TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_task_history_timestamp ON task_history (timestamp);
+CREATE TABLE IF NOT EXISTS task_rollups (
+    hour TEXT NOT NULL,
+    stack_type TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (hour, stack_type, outcome)
+);
+CREATE TABLE IF NOT EXISTS cancellations (
+    task_id,
+    timestamp TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+# Stored in PRAGMA user_version once SCHEMA has been applied; bump it whenever SCHEMA changes
+SCHEMA_VERSION = 1
+
+
+class _SQLiteDatabase:
+    """One WAL-mode connection per store, safe to share between threads"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._conn = None
+        self._lock = threading.RLock()
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=5.0, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            # WAL mode and the schema persist in the file; only a new or older database needs them
+            if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(SCHEMA)
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self._conn = conn
+        return self._conn
+
+    def execute(self, sql, params=()):
+        with self._lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def execute_write(self, sql, params=()):
+        """Run a write statement and return the number of affected rows"""
+        with self._lock:
+            return self.conn.execute(sql, params).rowcount
+
+    def executemany(self, sql, rows):
+        with self._lock:
+            with self.conn:
+                self.conn.execute("BEGIN")
+                self.conn.executemany(sql, rows)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class SQLiteStateStore:
+    """SQLite implementation of the JsonStateStore interface.
+
+    The last-task state is cached and re-read only when `PRAGMA data_version`
+    reports a commit from another connection.
+    """
+
+    def __init__(self, db_path="src/data/state.db"):
+        self.db = _SQLiteDatabase(db_path)
+        self._last_task_cache = None
+        self._last_task_version = None
+
+    def initialize(self):
+        self.db.conn
+
+    def _get(self, key):
+        rows = self.db.execute("SELECT value FROM state WHERE key = ?", (key,))
+        return json_codec.loads(rows[0][0]) if rows else None
+
+    def _set(self, key, value):
+        self.db.execute(
+            "INSERT INTO state (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, json_codec.dumps(value)),
+        )
+
+    def _data_version(self):
+        return self.db.execute("PRAGMA data_version")[0][0]
+
+    def load_last_task(self):
+        version = self._data_version()
+        if self._last_task_cache is None or version != self._last_task_version:
+            self._last_task_cache = {**DEFAULT_LAST_TASK, **(self._get("last_task") or {})}
+            self._last_task_version = version
+        return dict(self._last_task_cache)
+
+    def save_last_task(self, task_id, accepted=False, cancelled=False):
+        data = {"last_task_id": task_id, "accepted": accepted, "cancelled": cancelled}
+        self._set("last_task", data)
+        self._last_task_cache = data
+        self._last_task_version = self._data_version()
+
+    def get_marker(self, name):
+        return self._get(name)
+
+    def set_marker(self, name, value):
+        self._set(name, value)
+
+    def record_cancellation(self, task_id):
+        """Append to the cancellation log, which outlives the end-of-day reset"""
+        self.db.execute(
+            "INSERT INTO cancellations (task_id, timestamp) VALUES (?, ?)",
+            (task_id, datetime.now(timezone.utc).isoformat()),
+        )
+
+    def iter_cancellations(self):
+        """Yield logged cancellations ({task_id, timestamp}) oldest first"""
+        for task_id, timestamp in self.db.execute("SELECT task_id, timestamp FROM cancellations ORDER BY timestamp"):
+            yield {"task_id": task_id, "timestamp": timestamp}
+
+    def import_cancellations(self, cancellations):
+        """Copy logged cancellations with their original timestamps, skipping ones already stored; returns the count inserted"""
+        known = set(self.db.execute("SELECT task_id, timestamp FROM cancellations"))
+        rows = []
+        for cancellation in cancellations:
+            row = (cancellation.get("task_id"), cancellation.get("timestamp"))
+            if row[1] and row not in known:
+                known.add(row)
+                rows.append(row)
+        self.db.executemany("INSERT INTO cancellations (task_id, timestamp) VALUES (?, ?)", rows)
+        return len(rows)
+
+
+class SQLiteTaskHistory:
+    """SQLite implementation of the TaskHistory interface"""
+
+    def __init__(self, db_path="src/data/state.db", archive=None):
+        self.db = _SQLiteDatabase(db_path)
+        self.archive = archive
+
+    def initialize(self):
+        self.db.conn
+        self._ensure_rollups()
+
+    def _ensure_rollups(self):
+        """Fill the rollup table from the history once, e.g. for databases created before it existed"""
+        if self.db.execute("SELECT 1 FROM task_rollups LIMIT 1") or not self.db.execute("SELECT 1 FROM task_history LIMIT 1"):
+            return
+        self._add_rollups(self.iter_entries())
+        logger.info("Rebuilt task rollups")
+
+    def _add_rollups(self, entries):
+        counts = {}
+        for entry in entries:
+            key = rollup_key(entry)
+            counts[key] = counts.get(key, 0) + 1
+        self.db.executemany(
+            "INSERT INTO task_rollups (hour, stack_type, outcome, count) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (hour, stack_type, outcome) DO UPDATE SET count = count + excluded.count",
+            [key + (count,) for key, count in counts.items()],
+        )
+
+    def _remove_rollups(self, entries):
+        """Uncount entries replaced by a later entry of the same task"""
+        for entry in entries:
+            key = rollup_key(entry)
+            self.db.execute_write(
+                "UPDATE task_rollups SET count = count - 1 WHERE hour = ? AND stack_type = ? AND outcome = ?", key
+            )
+        self.db.execute_write("DELETE FROM task_rollups WHERE count <= 0")
+
+    def _insert_sql(self):
+        return "INSERT OR IGNORE INTO task_history (task_id, timestamp, stack_type, entry) VALUES (?, ?, ?, ?)"
+
+    def _replace_entry(self, task_data):
+        """Store a task seen again after a dedup reset in place of its older entry, archiving and uncounting that one first"""
+        rows = self.db.execute("SELECT entry FROM task_history WHERE task_id = ?", (task_data["task_id"],))
+        if rows:
+            previous = json_codec.loads(rows[0][0])
+            if self.archive:
+                self.archive.archive([previous])
+            self._remove_rollups([previous])
+        return self.db.execute_write(
+            "INSERT INTO task_history (task_id, timestamp, stack_type, entry) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (task_id) DO UPDATE SET timestamp = excluded.timestamp, "
+            "stack_type = excluded.stack_type, entry = excluded.entry",
+            self._row(task_data),
+        )
+
+    def _row(self, entry):
+        return (entry.get("task_id"), entry["timestamp"], entry.get("stack_type"), json_codec.dumps(entry))
+
+    def log_task(self, work, accept_outcome=None, timings=None, since=None):
+        try:
+            task_id = work.get('id')
+            if self.has_task(task_id, since):
+                logger.info(f"Task {task_id} already in history")
+                return
+
+            stack_type = get_task_stack_type(work)
+
+            task_data = {
+                "task_id": task_id,
+                "title": work.get('title', 'N/A'),
+                "stack_type": stack_type,
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "priority": work.get('priority', 'N/A'),
+                "skills": work.get('skills', [])
+            }
+            if accept_outcome:
+                task_data["accept_outcome"] = accept_outcome
+            if timings:
+                task_data["timings"] = timings
+
+            # The id can only be stored already when `since` hides the older entry
+            written = self._replace_entry(task_data) if since else self.db.execute_write(self._insert_sql(), self._row(task_data))
+            if written:
+                self._add_rollups([task_data])
+            logger.info(f"Task {task_id} logged as {stack_type} stack")
+        except Exception as e:
+            logger.error(f"Error logging task: {str(e)}")
+
+    def import_entries(self, entries):
+        """Bulk-insert existing history entries, keeping the latest entry of each task id; returns the count written.
+
+        The JSONL history can hold several entries of a task logged again after
+        a dedup reset, where this table keeps only the latest one.
+        """
+        latest = {}
+        for entry in entries:
+            if not entry.get("timestamp"):
+                continue
+            previous = latest.get(entry.get("task_id"))
+            if previous is None or entry["timestamp"] >= previous["timestamp"]:
+                latest[entry.get("task_id")] = entry
+        stored = dict(self.db.execute("SELECT task_id, timestamp FROM task_history")) if latest else {}
+        new_entries = [entry for task_id, entry in latest.items() if task_id not in stored]
+        newer_entries = [
+            entry for task_id, entry in latest.items() if task_id in stored and entry["timestamp"] > stored[task_id]
+        ]
+        self.db.executemany(self._insert_sql(), [self._row(entry) for entry in new_entries])
+        for entry in newer_entries:
+            self._replace_entry(entry)
+        self._add_rollups(new_entries + newer_entries)
+        return len(new_entries) + len(newer_entries)
+
+    def has_task(self, task_id, since=None):
+        """Check if a task ID already exists in history, optionally only in entries logged at or after `since` (ISO UTC)"""
+        try:
+            return bool(self.db.execute(
+                "SELECT 1 FROM task_history WHERE task_id = ? AND timestamp >= ? LIMIT 1", (task_id, since or "")
+            ))
+        except Exception as e:
+            logger.error(f"Error checking task history: {str(e)}")
+            return False
+
+    def iter_entries(self, since=None, until=None):
+        """Yield history entries in timestamp order, optionally only those in [`since`, `until`)"""
+        if since is None and until is None:
+            rows = self.db.execute("SELECT entry FROM task_history ORDER BY timestamp")
+        elif until is None:
+            rows = self.db.execute(
+                "SELECT entry FROM task_history WHERE timestamp >= ? ORDER BY timestamp",
+                (since.isoformat(),),
+            )
+        else:
+            rows = self.db.execute(
+                "SELECT entry FROM task_history WHERE timestamp >= ? AND timestamp < ? ORDER BY timestamp",
+                (since.isoformat() if since else "", until.isoformat()),
+            )
+        for (entry,) in rows:
+            yield json_codec.loads(entry)
+
+    def iter_day_range(self, start=None, end=None):
+        """Yield the entries of the PKT dates from `start` to `end` (ISO strings, inclusive) through the timestamp index"""
+        since = datetime.fromisoformat(start).replace(tzinfo=PAKISTAN_TZ) if start else None
+        until = datetime.fromisoformat(end).replace(tzinfo=PAKISTAN_TZ) + timedelta(days=1) if end else None
+        # Stored timestamps are UTC, so the bounds must be too for the text comparison
+        yield from self.iter_entries(
+            since=since.astimezone(timezone.utc) if since else None,
+            until=until.astimezone(timezone.utc) if until else None,
+        )
+
+    def get_last_24_hours_summary(self, since=None):
+        """Tasks per stack logged in the last 24 hours, or since `since`"""
+        try:
+            cutoff_time = since or datetime.now(timezone.utc) - timedelta(hours=24)
+
+            summary = {"frontend": [], "backend": [], "android": [], "qa": []}
+            for task in self.iter_entries(since=cutoff_time):
+                stack_type = task.get('stack_type', 'frontend')
+
+                if stack_type in ['other']:
+                    stack_type = get_task_stack_type(task)
+
+                if stack_type in summary:
+                    summary[stack_type].append(task)
+
+            return summary
+        except Exception as e:
+            logger.error(f"Error getting 24-hour summary: {str(e)}")
+            return None
+
+    def get_hourly_rollups(self, since=None):
+        """(hour, stack, {outcome: count}) rows from the rollup table, oldest first"""
+        start = since.astimezone(timezone.utc).strftime("%Y-%m-%dT%H") if since else ""
+        rows = self.db.execute(
+            "SELECT hour, stack_type, outcome, count FROM task_rollups WHERE hour >= ? ORDER BY hour, stack_type",
+            (start,),
+        )
+        result = []
+        for hour, stack_type, outcome, count in rows:
+            if result and result[-1][:2] == (hour, stack_type):
+                result[-1][2][outcome] = count
+            else:
+                result.append((hour, stack_type, {outcome: count}))
+        return result
+
+    def cleanup_old_tasks(self, days=7):
+        """Delete tasks older than the given number of days from history"""
+        try:
+            now = datetime.now(timezone.utc)
+            cutoff_time = now - timedelta(days=days)
+            if self.archive:
+                self.archive.archive(self.iter_entries(until=cutoff_time))
+            deleted_count = self.db.execute_write(
+                "DELETE FROM task_history WHERE timestamp < ?",
+                (cutoff_time.isoformat(),),
+            )
+            self.db.execute_write(
+                "DELETE FROM task_rollups WHERE hour < ?",
+                ((now - timedelta(days=ROLLUP_RETENTION_DAYS)).strftime("%Y-%m-%dT%H"),),
+            )
+
+            logger.info(
+                f"Cleaned up {deleted_count} tasks older than {days} days"
+                if deleted_count > 0
+                else f"No tasks older than {days} days to clean up"
+            )
+        except Exception as e:
+            logger.error(f"Error cleaning up old tasks: {str(e)}")
+
+    def clear_history(self):
+        """Clear all task history, archiving it first when an archive is configured"""
+        try:
+            if self.archive:
+                self.archive.archive(self.iter_entries())
+            self.db.execute("DELETE FROM task_history")
+            logger.info("Task history cleared")
+        except Exception as e:
+            logger.error(f"Error clearing task history: {str(e)}")
+
+
+def migrate_json_to_sqlite(data_dir="src/data", db_path="src/data/state.db"):
+    """Import the JSON state files and task history into a SQLite database"""
+    from .task_history import TaskHistory
+
+    json_state = JsonStateStore(data_dir)
+    state = SQLiteStateStore(db_path)
+    history = SQLiteTaskHistory(db_path)
+
+    last_task = json_state.load_last_task()
+    state.save_last_task(last_task["last_task_id"], accepted=last_task["accepted"], cancelled=last_task["cancelled"])
+    for name in MARKER_FILES:
+        state.set_marker(name, json_state.get_marker(name))
+    cancellations = state.import_cancellations(json_state.iter_cancellations())
+
+    json_history = TaskHistory(
+        os.path.join(data_dir, "task_history"),
+        legacy_files=(os.path.join(data_dir, "task_history.jsonl"), os.path.join(data_dir, "task_history.json")),
+    )
+    json_history.initialize()
+    imported = history.import_entries(json_history.iter_entries())
+
+    logger.info(
+        f"Migrated state, {cancellations} cancellations and {imported} history entries from {data_dir} to {db_path}"
+    )
+    return imported
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migrate JSON state files into the SQLite state store")
+    parser.add_argument("--data-dir", default="src/data", help="Directory holding the JSON state files")
+    parser.add_argument("--db", default="src/data/state.db", help="SQLite database to create or update")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    migrate_json_to_sqlite(args.data_dir, args.db)
+
+
+if __name__ == "__main__":
+    main()
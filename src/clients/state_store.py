@@ -0,0 +1,134 @@
+"""
+State stores for the last-task status and the once-per-day markers
+"""
+import logging
+import os
+from datetime import datetime, timezone
+
+from ..config import ARCHIVE_ENABLED, STATE_BACKEND, STATE_DB_PATH
+from ..utils import json_codec
+
+logger = logging.getLogger()
+
+DEFAULT_LAST_TASK = {"last_task_id": None, "accepted": False, "cancelled": False}
+
+# Marker name -> file name used by the JSON backend
+MARKER_FILES = {
+    "last_summary_date": "last_summary_date.json",
+    "last_cleanup_date": "last_cleanup_date.json",
+    "poll_fingerprint": "poll_fingerprint.json",
+    "dedup_reset_at": "dedup_reset_at.json",
+}
+
+
+class JsonStateStore:
+    """State kept in small JSON files under the data directory.
+
+    The last-task state is cached in memory, written through on save and
+    re-read only when the file's mtime/size/inode shows another writer.
+    """
+
+    def __init__(self, data_dir="src/data"):
+        self.data_dir = data_dir
+        self.last_task_file = os.path.join(data_dir, "last_task.json")
+        self.marker_files = {name: os.path.join(data_dir, file_name) for name, file_name in MARKER_FILES.items()}
+        self.cancellations_file = os.path.join(data_dir, "cancellations.jsonl")
+        self._last_task_cache = None
+        self._last_task_stamp = None
+
+    def initialize(self):
+        """Create state files with default values if they don't exist"""
+        # Warm state: an earlier run created them all, and a missing marker file reads as unset anyway
+        if os.path.exists(self.last_task_file):
+            return
+        os.makedirs(self.data_dir, exist_ok=True)
+        files = {self.last_task_file: DEFAULT_LAST_TASK}
+        files.update({path: {name: None} for name, path in self.marker_files.items()})
+        for path, default_data in files.items():
+            if not os.path.exists(path):
+                self._write(path, default_data)
+                logger.info(f"Created {path}")
+
+    def _read(self, path):
+        """Read a JSON object from `path`; missing, empty or corrupted files read as {}"""
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return {}
+        with open(path, "rb") as f:
+            content = f.read().strip()
+        if not content:
+            return {}
+        try:
+            return json_codec.loads(content)
+        except ValueError:
+            logger.warning(f"State file {path} corrupted, using defaults")
+            return {}
+
+    def _write(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_file = path + ".tmp"
+        with open(temp_file, "wb") as f:
+            f.write(json_codec.dumpb(data))
+        # Stamp the temp file: rename keeps its inode and mtime, and no other writer can touch it
+        stamp = self._file_stamp(temp_file)
+        os.replace(temp_file, path)
+        return stamp
+
+    def _file_stamp(self, path):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def load_last_task(self):
+        stamp = self._file_stamp(self.last_task_file)
+        if self._last_task_cache is None or stamp != self._last_task_stamp:
+            self._last_task_cache = {**DEFAULT_LAST_TASK, **self._read(self.last_task_file)}
+            self._last_task_stamp = stamp
+        return dict(self._last_task_cache)
+
+    def save_last_task(self, task_id, accepted=False, cancelled=False):
+        data = {"last_task_id": task_id, "accepted": accepted, "cancelled": cancelled}
+        self._last_task_stamp = self._write(self.last_task_file, data)
+        self._last_task_cache = data
+
+    def get_marker(self, name):
+        return self._read(self.marker_files[name]).get(name)
+
+    def set_marker(self, name, value):
+        self._write(self.marker_files[name], {name: value})
+
+    def record_cancellation(self, task_id):
+        """Append to the cancellation log, which outlives the end-of-day reset"""
+        os.makedirs(self.data_dir, exist_ok=True)
+        with open(self.cancellations_file, "ab") as f:
+            f.write(json_codec.dumpb({"task_id": task_id, "timestamp": datetime.now(timezone.utc).isoformat()}) + b"\n")
+
+    def iter_cancellations(self):
+        """Yield logged cancellations ({task_id, timestamp}) oldest first"""
+        if not os.path.exists(self.cancellations_file):
+            return
+        with open(self.cancellations_file, "rb") as f:
+            for line in f:
+                try:
+                    yield json_codec.loads(line)
+                except ValueError:
+                    continue
+
+
+def create_state_backends(backend=None):
+    """Build the (state store, task history) pair for the configured STATE_BACKEND"""
+    backend = (backend or STATE_BACKEND).lower()
+    archive = None
+    if ARCHIVE_ENABLED:
+        from .task_archive import TaskArchive
+
+        archive = TaskArchive()
+    if backend == "sqlite":
+        from .sqlite_store import SQLiteStateStore, SQLiteTaskHistory
+
+        return SQLiteStateStore(STATE_DB_PATH), SQLiteTaskHistory(STATE_DB_PATH, archive=archive)
+
+    from .task_history import TaskHistory
+
+    return JsonStateStore(), TaskHistory(archive=archive)
@@ -0,0 +1,388 @@
+"""
+Compact columnar archive of task history for long-term retention
+
+History entries removed by cleanup_old_tasks or the end-of-day clear are
+archived first, one block file per Pakistan date (`ARCHIVE_DIR/YYYY-MM-DD.cta`).
+A block stores each field as its own compressed column:
+
+  - timestamp: epoch microseconds, delta-encoded int64 array (version 1
+    blocks hold whole seconds);
+  - stack_type, priority, accept_outcome: dictionary codes (uint16 array) plus
+    the dictionary;
+  - skills: per-row offsets plus a flat array of dictionary codes;
+  - task_id, title, extra (any other keys, e.g. timings): JSON lists.
+
+Columns are compressed with zstd when `zstandard` is installed (the optional
+`archive` extra) and gzip otherwise. A small JSON header at the start of the
+file lists where each column lives, so readers only read and decompress the
+columns they ask for. Import the current history once with:
+
+    python -m src.clients.task_archive --import-history src/data/task_history
+"""
+import argparse
+import gzip
+import logging
+import os
+import struct
+import sys
+from array import array
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from itertools import accumulate, chain
+
+try:
+    import zstandard
+except ImportError:  # optional dependency: pip install "caas-automation[archive]"
+    zstandard = None
+
+from ..config import ARCHIVE_CODEC, ARCHIVE_DIR, ARCHIVE_RETENTION_DAYS
+from ..utils import json_codec
+from ..utils.timezone_utils import PAKISTAN_TZ, pakistan_date_of
+
+logger = logging.getLogger()
+
+MAGIC = b"CTA1"
+BLOCK_VERSION = 2
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+BLOCK_SUFFIX = ".cta"
+DICTIONARY_COLUMNS = ("stack_type", "priority", "accept_outcome")
+JSON_COLUMNS = ("task_id", "title", "extra")
+COLUMNS = ("timestamp",) + DICTIONARY_COLUMNS + ("skills",) + JSON_COLUMNS
+KNOWN_KEYS = frozenset(COLUMNS) - {"extra"}
+
+
+def resolve_codec(codec):
+    """'auto' picks zstd when zstandard is installed, else gzip"""
+    codec = (codec or "auto").lower()
+    if codec == "auto":
+        return "zstd" if zstandard is not None else "gzip"
+    if codec not in ("gzip", "zstd"):
+        raise ValueError(f"Unknown archive codec '{codec}', expected auto, gzip or zstd")
+    if codec == "zstd" and zstandard is None:
+        raise ImportError("zstd archives need zstandard: pip install 'caas-automation[archive]'")
+    return codec
+
+
+def _compress(data, codec):
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+
+def _decompress(data, codec):
+    if codec == "zstd":
+        if zstandard is None:
+            raise ImportError("This archive block is zstd-compressed: pip install 'caas-automation[archive]'")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+def _to_bytes(values):
+    """Array contents in little-endian byte order"""
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_bytes(typecode, data):
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+
+def _code_typecode(size):
+    return "H" if size <= 0xFFFF else "I"
+
+
+def _epoch_us(timestamp):
+    """Exact epoch microseconds of an ISO timestamp (naive ones are taken as UTC)"""
+    moment = datetime.fromisoformat(timestamp)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return (moment - EPOCH) // timedelta(microseconds=1)
+
+
+def _to_seconds(timestamps_us):
+    return array("q", (value // 1_000_000 for value in timestamps_us))
+
+
+class _Encoder:
+    """Collects one day's entries column by column"""
+
+    def __init__(self):
+        self.timestamps = array("q")
+        self.codes = {name: array("I") for name in DICTIONARY_COLUMNS}
+        self.dictionaries = {name: {} for name in DICTIONARY_COLUMNS + ("skills",)}
+        self.skill_offsets = array("I", [0])
+        self.skill_codes = array("I")
+        self.json_values = {name: [] for name in JSON_COLUMNS}
+
+    def _code(self, name, value):
+        dictionary = self.dictionaries[name]
+        code = dictionary.get(value)
+        if code is None:
+            code = dictionary[value] = len(dictionary)
+        return code
+
+    def add(self, entry):
+        self.timestamps.append(_epoch_us(entry["timestamp"]))
+        for name in DICTIONARY_COLUMNS:
+            self.codes[name].append(self._code(name, entry.get(name)))
+        for skill in entry.get("skills") or []:
+            self.skill_codes.append(self._code("skills", skill))
+        self.skill_offsets.append(len(self.skill_codes))
+        self.json_values["task_id"].append(entry.get("task_id"))
+        self.json_values["title"].append(entry.get("title"))
+        extra = {key: value for key, value in entry.items() if key not in KNOWN_KEYS}
+        self.json_values["extra"].append(extra or None)
+
+    def raw(self, name):
+        """Column in the form ArchiveBlock.raw() returns it"""
+        if name == "timestamp":
+            return _to_seconds(self.timestamps)
+        if name in DICTIONARY_COLUMNS:
+            return self.codes[name], list(self.dictionaries[name])
+        if name == "skills":
+            return self.skill_offsets, self.skill_codes, list(self.dictionaries["skills"])
+        return self.json_values[name]
+
+    def parts(self):
+        """(column name, header fields, [(typecode or None, raw bytes)]) for every column"""
+        deltas = array("q", (current - previous for previous, current in zip(chain([0], self.timestamps), self.timestamps)))
+        yield "timestamp", {"encoding": "delta_us"}, [("q", _to_bytes(deltas))]
+        for name in DICTIONARY_COLUMNS:
+            dictionary = list(self.dictionaries[name])
+            typecode = _code_typecode(len(dictionary))
+            yield name, {"encoding": "dictionary", "dictionary": dictionary}, [(typecode, _to_bytes(array(typecode, self.codes[name])))]
+        dictionary = list(self.dictionaries["skills"])
+        typecode = _code_typecode(len(dictionary))
+        yield "skills", {"encoding": "dictionary_list", "dictionary": dictionary}, [
+            ("I", _to_bytes(self.skill_offsets)),
+            (typecode, _to_bytes(array(typecode, self.skill_codes))),
+        ]
+        for name in JSON_COLUMNS:
+            yield name, {"encoding": "json"}, [(None, json_codec.dumpb(self.json_values[name]))]
+
+
+def encode_columns(entries, columns=COLUMNS):
+    """Encode in-memory history entries into {column: values} in the form ArchiveBlock.raw() returns"""
+    encoder = _Encoder()
+    for entry in entries:
+        if entry.get("timestamp"):
+            encoder.add(entry)
+    return {name: encoder.raw(name) for name in columns}
+
+
+class ArchiveBlock:
+    """One day's block; the header is read on open, columns on demand"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            magic, header_length = struct.unpack("<4sI", f.read(8))
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a task archive block")
+            self.header = json_codec.loads(f.read(header_length))
+        self.data_start = 8 + header_length
+        self.rows = self.header["rows"]
+        self.codec = self.header["codec"]
+        self.date = self.header["date"]
+
+    def _parts(self, name):
+        column = self.header["columns"][name]
+        with open(self.path, "rb") as f:
+            for part in column["parts"]:
+                f.seek(self.data_start + part["offset"])
+                data = _decompress(f.read(part["length"]), self.codec)
+                yield _from_bytes(part["typecode"], data) if part["typecode"] else data
+
+    def timestamps_us(self):
+        """int64 array of the rows' epoch microseconds"""
+        values = array("q", accumulate(next(self._parts("timestamp"))))
+        if self.header["columns"]["timestamp"]["encoding"] == "delta":
+            return array("q", (value * 1_000_000 for value in values))
+        return values
+
+    def raw(self, name):
+        """Column in its stored form.
+
+        timestamp -> int64 array of epoch seconds;
+        dictionary columns -> (codes array, dictionary);
+        skills -> (offsets array, codes array, dictionary);
+        JSON columns -> list.
+        """
+        column = self.header["columns"][name]
+        encoding = column["encoding"]
+        if encoding == "delta_us":
+            return _to_seconds(self.timestamps_us())
+        parts = list(self._parts(name))
+        if encoding == "delta":
+            return array("q", accumulate(parts[0]))
+        if encoding == "dictionary":
+            return parts[0], column["dictionary"]
+        if encoding == "dictionary_list":
+            return parts[0], parts[1], column["dictionary"]
+        return json_codec.loads(parts[0])
+
+    def column(self, name):
+        """Column decoded to one Python value per row"""
+        values = self.raw(name)
+        encoding = self.header["columns"][name]["encoding"]
+        if encoding == "dictionary":
+            codes, dictionary = values
+            return [dictionary[code] for code in codes]
+        if encoding == "dictionary_list":
+            offsets, codes, dictionary = values
+            return [[dictionary[code] for code in codes[offsets[i]:offsets[i + 1]]] for i in range(self.rows)]
+        return values
+
+    def entries(self):
+        """Rebuild history entries; timestamps come back as UTC ISO strings"""
+        columns = {name: self.column(name) for name in COLUMNS if name != "timestamp"}
+        timestamps = self.timestamps_us()
+        for i in range(self.rows):
+            entry = {
+                "task_id": columns["task_id"][i],
+                "title": columns["title"][i],
+                "stack_type": columns["stack_type"][i],
+                "timestamp": (EPOCH + timedelta(microseconds=timestamps[i])).isoformat(),
+                "priority": columns["priority"][i],
+                "skills": columns["skills"][i],
+            }
+            if columns["accept_outcome"][i] is not None:
+                entry["accept_outcome"] = columns["accept_outcome"][i]
+            entry.update(columns["extra"][i] or {})
+            yield entry
+
+
+class TaskArchive:
+    """Directory of per-day columnar blocks"""
+
+    def __init__(self, directory=ARCHIVE_DIR, codec=ARCHIVE_CODEC, retention_days=ARCHIVE_RETENTION_DAYS):
+        self.directory = directory
+        self.codec = resolve_codec(codec)
+        self.retention_days = retention_days
+
+    def day_path(self, day):
+        return os.path.join(self.directory, day + BLOCK_SUFFIX)
+
+    def days(self, start=None, end=None):
+        """Archived dates (ISO strings) between `start` and `end` inclusive, oldest first"""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        days = sorted(name[:-len(BLOCK_SUFFIX)] for name in names if name.endswith(BLOCK_SUFFIX))
+        start = start.isoformat() if isinstance(start, date) else start
+        end = end.isoformat() if isinstance(end, date) else end
+        return [day for day in days if (not start or day >= start) and (not end or day <= end)]
+
+    def blocks(self, start=None, end=None):
+        for day in self.days(start, end):
+            yield ArchiveBlock(self.day_path(day))
+
+    def read_columns(self, columns, start=None, end=None, raw=False):
+        """Yield {column: values} per archived day, reading only the requested columns"""
+        for block in self.blocks(start, end):
+            yield {name: block.raw(name) if raw else block.column(name) for name in columns}
+
+    def iter_entries(self, start=None, end=None):
+        for block in self.blocks(start, end):
+            yield from block.entries()
+
+    def _write_block(self, day, entries):
+        encoder = _Encoder()
+        for entry in entries:
+            encoder.add(entry)
+
+        header = {"version": BLOCK_VERSION, "date": day, "rows": len(encoder.timestamps), "codec": self.codec, "columns": {}}
+        payload = []
+        offset = 0
+        for name, column, parts in encoder.parts():
+            column["parts"] = []
+            for typecode, data in parts:
+                data = _compress(data, self.codec)
+                column["parts"].append({"typecode": typecode, "offset": offset, "length": len(data)})
+                payload.append(data)
+                offset += len(data)
+            header["columns"][name] = column
+
+        header_bytes = json_codec.dumpb(header)
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.day_path(day)
+        temp_file = path + ".tmp"
+        with open(temp_file, "wb") as f:
+            f.write(struct.pack("<4sI", MAGIC, len(header_bytes)))
+            f.write(header_bytes)
+            for data in payload:
+                f.write(data)
+        os.replace(temp_file, path)
+
+    def archive(self, entries):
+        """Add history entries to their day blocks, merging with what is already archived; returns the count added"""
+        by_day = defaultdict(list)
+        for entry in entries:
+            if entry.get("timestamp"):
+                by_day[pakistan_date_of(entry["timestamp"])].append(entry)
+
+        added = 0
+        for day, day_entries in sorted(by_day.items()):
+            existing = []
+            if os.path.exists(self.day_path(day)):
+                existing = list(ArchiveBlock(self.day_path(day)).entries())
+                known = {entry.get("task_id") for entry in existing}
+                day_entries = [entry for entry in day_entries if entry.get("task_id") not in known]
+            if not day_entries:
+                continue
+            added += len(day_entries)
+            rows = sorted(existing + day_entries, key=lambda entry: datetime.fromisoformat(entry["timestamp"]))
+            self._write_block(day, rows)
+
+        if added:
+            logger.info(f"Archived {added} tasks into {len(by_day)} day block(s) under {self.directory}")
+        self.prune()
+        return added
+
+    def prune(self):
+        """Delete day blocks older than the retention period"""
+        if not self.retention_days:
+            return
+        cutoff = (datetime.now(PAKISTAN_TZ).date() - timedelta(days=self.retention_days)).isoformat()
+        for day in self.days():
+            if day < cutoff:
+                os.remove(self.day_path(day))
+                logger.info(f"Removed archive block {day} (older than {self.retention_days} days)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Columnar task history archive")
+    parser.add_argument("--dir", default=ARCHIVE_DIR, help="Archive directory")
+    parser.add_argument("--codec", default=ARCHIVE_CODEC, help="auto, gzip or zstd (for new blocks)")
+    parser.add_argument("--import-history", metavar="JSONL", help="Archive every entry of a task history directory or JSONL file")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    archive = TaskArchive(args.dir, codec=args.codec)
+    if args.import_history:
+        from .task_history import TaskHistory, read_jsonl
+
+        if os.path.isdir(args.import_history):
+            entries = TaskHistory(args.import_history, legacy_files=()).iter_entries()
+        else:
+            entries = read_jsonl(args.import_history)
+        archive.archive(entries)
+
+    total_rows = total_bytes = 0
+    for block in archive.blocks():
+        size = os.path.getsize(block.path)
+        total_rows += block.rows
+        total_bytes += size
+        print(f"{block.date}  {block.rows:>7} tasks  {size:>9} bytes  {block.codec}")
+    print(f"{len(archive.days())} day(s), {total_rows} tasks, {total_bytes} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,254 @@
-import json
+
 import logging
 import os
+import re
+import time
 from datetime import datetime, timedelta, timezone
+from ..utils import json_codec
+from ..utils.timezone_utils import now_pakistan, pakistan_date_iso, pakistan_date_of
 from .task_classifier import get_task_stack_type
+from .task_rollups import TaskRollups
 
 logger = logging.getLogger()
 
+SEGMENT_NAME = re.compile(r"^(\d{4}-\d{2}-\d{2})\.jsonl$")
+
+
+def read_jsonl(path):
+    """Stream entries from a JSONL file, skipping corrupted lines"""
+    with open(path, "rb") as f:
+        for raw_line in f:
+            raw_line = raw_line.strip()
+            if not raw_line:
+                continue
+            try:
+                yield json_codec.loads(raw_line)
+            except ValueError:
+                logger.warning(f"Skipping corrupted line in {path}")
+
 
 class TaskHistory:
-    def __init__(self, history_file="src/data/task_history.json"):
-        self.history_file = history_file
-    
-    def log_task(self, work):
+    """Task log split into one append-only JSONL segment per Pakistan date.
+
+    Writes only append to today's segment (`history_dir/YYYY-MM-DD.jsonl`),
+    retention deletes whole segments and the 24-hour summary reads at most the
+    last two. The task-id index covers every segment; it is built once per
+    process and then kept current by reading only the bytes appended since the
+    last look, so `has_task` is a set lookup and `log_task` writes a single line.
+    Hourly rollups are kept current the same way.
+    """
+
+    def __init__(
+        self,
+        history_dir="src/data/task_history",
+        legacy_files=("src/data/task_history.jsonl", "src/data/task_history.json"),
+        archive=None,
+    ):
+        self.history_dir = history_dir
+        self.legacy_files = tuple(legacy_files or ())
+        self.archive = archive
+        self.rollups = TaskRollups(os.path.join(history_dir, "rollups.json"))
+        self._task_ids = {}  # task id -> timestamp of its latest entry
+        self._segment_offsets = {}
+        self._live = []
+        self._live_until = 0.0
+
+    def initialize(self):
+        """Create the history directory, migrating single-file histories (JSONL or JSON array) into segments"""
+        try:
+            os.makedirs(self.history_dir, exist_ok=True)
+            migrated = False
+            for legacy_file in self.legacy_files:
+                if os.path.exists(legacy_file):
+                    self._migrate_legacy_file(legacy_file)
+                    migrated = True
+            # Warm state needs no full pass: logging catches up on the live segments and
+            # get_hourly_rollups on all of them
+            if migrated or not self.rollups.exists():
+                self._refresh_rollups()
+        except Exception as e:
+            logger.error(f"Error initializing task history: {str(e)}")
+
+    def _migrate_legacy_file(self, legacy_file):
+        if legacy_file.endswith(".jsonl"):
+            history = read_jsonl(legacy_file)
+        else:
+            history = []
+            try:
+                with open(legacy_file, "r") as f:
+                    content = f.read().strip()
+                    if content:
+                        history = json_codec.loads(content)
+            except ValueError:
+                logger.warning("Legacy task history file corrupted, starting fresh")
+
+        count = self._append_entries(history)
+        os.remove(legacy_file)
+        self._reset_index()
+        logger.info(f"Migrated {count} tasks from {legacy_file} to {self.history_dir}")
+
+    def segment_path(self, day):
+        return os.path.join(self.history_dir, day + ".jsonl")
+
+    def segments(self):
+        """Dates (ISO strings) of the existing segments, oldest first"""
+        try:
+            names = os.listdir(self.history_dir)
+        except FileNotFoundError:
+            return []
+        return sorted(match.group(1) for match in map(SEGMENT_NAME.match, names) if match)
+
+    def _append_entries(self, entries):
+        """Append entries to the segments of their dates; returns the count written"""
+        count = 0
+        day = None
+        f = None
+        try:
+            for entry in entries:
+                entry_day = pakistan_date_of(entry["timestamp"]) if entry.get("timestamp") else pakistan_date_iso()
+                if entry_day != day:
+                    if f is not None:
+                        f.close()
+                    day = entry_day
+                    f = open(self.segment_path(day), "ab")
+                f.write(json_codec.dumpb(entry) + b"\n")
+                count += 1
+        finally:
+            if f is not None:
+                f.close()
+        return count
+
+    def _reset_index(self):
+        self._task_ids = {}
+        self._segment_offsets = {}
+
+    def _live_days(self):
+        """Yesterday's and today's (PKT) segments, the only ones that still receive appends"""
+        if time.time() >= self._live_until:
+            now = now_pakistan()
+            today = now.date()
+            self._live = [(today - timedelta(days=1)).isoformat(), today.isoformat()]
+            midnight = datetime.combine(today + timedelta(days=1), datetime.min.time(), tzinfo=now.tzinfo)
+            self._live_until = midnight.timestamp()
+        return self._live
+
+    def _refresh_index(self):
+        """Bring the task-id index up to date with the segments, reading only appended lines.
+
+        The first call reads every segment; later calls only stat the live ones,
+        so segments dropped by another process are noticed once one of those goes.
+        """
+        days = self._live_days() if self._segment_offsets else self.segments()
+        for day in days:
+            path = self.segment_path(day)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                if day in self._segment_offsets:
+                    # Deleted by a cleanup in another process: rebuild from scratch
+                    self._reset_index()
+                    return self._refresh_index()
+                continue
+            inode, offset = self._segment_offsets.get(day, (stat.st_ino, 0))
+            if stat.st_ino != inode or stat.st_size < offset:
+                self._reset_index()
+                return self._refresh_index()
+            if stat.st_size == offset:
+                continue
+
+            with open(path, "rb") as f:
+                f.seek(offset)
+                for raw_line in f:
+                    if not raw_line.endswith(b"\n"):
+                        break  # partial line from a concurrent writer, pick it up next time
+                    offset += len(raw_line)
+                    entry = self._parse_line(raw_line)
+                    if entry is not None:
+                        self._task_ids[entry.get("task_id")] = entry.get("timestamp") or ""
+            self._segment_offsets[day] = (stat.st_ino, offset)
+
+    def _refresh_rollups(self, days=None):
+        """Count the lines appended since the rollups were last brought up to date.
+
+        Without `days` every segment is checked and deleted ones are forgotten;
+        otherwise only the given segments are.
+        """
+        data = self.rollups.load()
+        counted = data["segments"]
+        removed = ()
+        if days is None:
+            days = self.segments()
+            removed = set(counted) - set(days)
+            for day in removed:
+                del counted[day]  # deleted by retention; its counts stay
+            # Only the last two segments still receive appends; older ones are counted once
+            recent = set(days[-2:])
+            days = [day for day in days if day not in counted or day in recent]
+
+        added = 0
+        for day in days:
+            offset = counted.get(day, 0)
+            try:
+                size = os.path.getsize(self.segment_path(day))
+            except FileNotFoundError:
+                continue
+            if size < offset:
+                offset = 0  # segment deleted and started again (end-of-day clear)
+            if size == offset:
+                continue
+            for entry, offset in self._read_lines(self.segment_path(day), offset):
+                if entry is not None and entry.get("timestamp"):
+                    self.rollups.add(entry)
+                    added += 1
+            counted[day] = offset
+        if removed:
+            self.rollups.save()
+        self.rollups.advance(added)
+        return data
+
+    def _read_lines(self, path, offset):
+        """Yield (entry or None, end offset) for each complete line from byte `offset` on"""
+        with open(path, "rb") as f:
+            f.seek(offset)
+            for raw_line in f:
+                if not raw_line.endswith(b"\n"):
+                    break
+                offset += len(raw_line)
+                yield self._parse_line(raw_line), offset
+
+    def _parse_line(self, raw_line):
+        raw_line = raw_line.strip()
+        if not raw_line:
+            return None
+        try:
+            return json_codec.loads(raw_line)
+        except ValueError:
+            logger.warning("Skipping corrupted task history line")
+            return None
+
+    def iter_entries(self, days=None):
+        """Stream history entries from disk one line at a time, optionally only from the given segment dates"""
+        for day in self.segments() if days is None else sorted(days):
+            path = self.segment_path(day)
+            if os.path.exists(path):
+                yield from read_jsonl(path)
+
+    def iter_day_range(self, start=None, end=None):
+        """Stream the entries of the PKT dates from `start` to `end` (ISO strings, inclusive), reading only their segments"""
+        yield from self.iter_entries(
+            days=[day for day in self.segments() if (not start or day >= start) and (not end or day <= end)]
+        )
+
+    def log_task(self, work, accept_outcome=None, timings=None, since=None):
 
         try:
             task_id = work.get('id')
+            if self.has_task(task_id, since):
+                logger.info(f"Task {task_id} already in history")
+                return
+
             stack_type = get_task_stack_type(work)
-            
+
             task_data = {
                 "task_id": task_id,
                 "title": work.get('title', 'N/A'),
@@ -25,119 +257,100 @@ class TaskHistory:
                 "priority": work.get('priority', 'N/A'),
                 "skills": work.get('skills', [])
             }
-            
-            history = []
-            if os.path.exists(self.history_file):
-                try:
-                    with open(self.history_file, "r") as f:
-                        content = f.read().strip()
-                        if content:
-                            history = json.loads(content)
-                except (json.JSONDecodeError, ValueError):
-                    logger.warning("Task history file corrupted, starting fresh")
-                    history = []
-            
-            if not any(t.get('task_id') == task_id for t in history):
-                history.append(task_data)
-                os.makedirs(os.path.dirname(self.history_file), exist_ok=True)
-                temp_file = self.history_file + ".tmp"
-                with open(temp_file, "w") as f:
-                    json.dump(history, f, indent=2)
-                if os.path.exists(self.history_file):
-                    os.remove(self.history_file)
-                os.rename(temp_file, self.history_file)
-                logger.info(f"Task {task_id} logged as {stack_type} stack")
-            else:
-                logger.info(f"Task {task_id} already in history")
+            if accept_outcome:
+                task_data["accept_outcome"] = accept_outcome
+            if timings:
+                task_data["timings"] = timings
+
+            os.makedirs(self.history_dir, exist_ok=True)
+            with open(self.segment_path(pakistan_date_of(task_data["timestamp"])), "ab") as f:
+                f.write(json_codec.dumpb(task_data) + b"\n")
+            self._refresh_index()
+            self._refresh_rollups(self._live_days())
+            logger.info(f"Task {task_id} logged as {stack_type} stack")
         except Exception as e:
             logger.error(f"Error logging task: {str(e)}")
 
-    def has_task(self, task_id):
-        """Check if a task ID already exists in history"""
+    def has_task(self, task_id, since=None):
+        """Check if a task ID already exists in history, optionally only in entries logged at or after `since` (ISO UTC)"""
         try:
-            if not os.path.exists(self.history_file):
-                return False
-
-            with open(self.history_file, "r") as f:
-                content = f.read().strip()
-                if not content:
-                    return False
-                history = json.loads(content)
-
-            return any(t.get('task_id') == task_id for t in history)
-        except (json.JSONDecodeError, ValueError):
-            logger.warning("Task history file corrupted while checking task, treating as empty")
-            return False
+            self._refresh_index()
+            timestamp = self._task_ids.get(task_id)
+            return timestamp is not None and (since is None or timestamp >= since)
         except Exception as e:
             logger.error(f"Error checking task history: {str(e)}")
             return False
-    
-    def get_last_24_hours_summary(self):
+
+    def get_last_24_hours_summary(self, since=None):
+        """Tasks per stack logged in the last 24 hours, or since `since` (at most 24 hours back)"""
         try:
-            if not os.path.exists(self.history_file):
+            if not os.path.isdir(self.history_dir):
                 return None
-            
-            with open(self.history_file, "r") as f:
-                content = f.read().strip()
-                if not content:
-                    return None
-                history = json.loads(content)
-            
-            cutoff_time = datetime.now(timezone.utc) - timedelta(hours=24)
-            recent_tasks = [t for t in history if datetime.fromisoformat(t['timestamp']) >= cutoff_time]
-            
+
+            cutoff_time = since or datetime.now(timezone.utc) - timedelta(hours=24)
+
+            # 24 hours span at most two Pakistan dates; a task logged again after
+            # the dedup reset is listed once, under its latest entry
+            latest = {}
+            for task in self.iter_entries(days={pakistan_date_of(cutoff_time), pakistan_date_iso()}):
+                if datetime.fromisoformat(task['timestamp']) >= cutoff_time:
+                    latest.pop(task.get('task_id'), None)
+                    latest[task.get('task_id')] = task
+
             summary = {"frontend": [], "backend": [], "android": [], "qa": []}
-            for task in recent_tasks:
+            for task in latest.values():
                 stack_type = task.get('stack_type', 'frontend')
-                
+
                 if stack_type in ['other']:
                     stack_type = self._reclassify_task_by_skills(task)
-                
+
                 if stack_type in summary:
                     summary[stack_type].append(task)
-            
+
             return summary
         except Exception as e:
             logger.error(f"Error getting 24-hour summary: {str(e)}")
             return None
-    
+
+    def get_hourly_rollups(self, since=None):
+        """(hour, stack, {outcome: count}) rows, oldest first, optionally from the hour of `since` on"""
+        self._refresh_rollups()
+        return list(self.rollups.hourly_counts(since))
+
     def _reclassify_task_by_skills(self, task):
         """Re-classify a task into frontend, backend, android, or qa stacks"""
         return get_task_stack_type(task)
-    
+
+    def _drop_segments(self, days):
+        """Archive (when configured) and delete whole segments; the rollup counts are kept"""
+        self._refresh_rollups()
+        for day in days:
+            if self.archive:
+                self.archive.archive(read_jsonl(self.segment_path(day)))
+            os.remove(self.segment_path(day))
+        self._reset_index()
+        self._refresh_rollups()
+
     def cleanup_old_tasks(self, days=7):
-        """Delete tasks older than the given number of days from history"""
+        """Delete the segments of Pakistan dates more than `days` days before today"""
         try:
-            if not os.path.exists(self.history_file):
-                return
-            
-            with open(self.history_file, "r") as f:
-                content = f.read().strip()
-                if not content:
-                    return
-                history = json.loads(content)
-            
-            cutoff_time = datetime.now(timezone.utc) - timedelta(days=days)
-            recent_tasks = [t for t in history if datetime.fromisoformat(t['timestamp']) >= cutoff_time]
-            deleted_count = len(history) - len(recent_tasks)
-            
-            with open(self.history_file, "w") as f:
-                json.dump(recent_tasks, f, indent=2)
-            
+            cutoff_day = (now_pakistan().date() - timedelta(days=days)).isoformat()
+            old_days = [day for day in self.segments() if day < cutoff_day]
+            if old_days:
+                self._drop_segments(old_days)
+
             logger.info(
-                f"Cleaned up {deleted_count} tasks older than {days} days"
-                if deleted_count > 0
+                f"Cleaned up {len(old_days)} day segment(s) older than {days} days"
+                if old_days
                 else f"No tasks older than {days} days to clean up"
             )
         except Exception as e:
             logger.error(f"Error cleaning up old tasks: {str(e)}")
 
     def clear_history(self):
-        """Clear all task history"""
+        """Clear all task history, archiving it first when an archive is configured"""
         try:
-            os.makedirs(os.path.dirname(self.history_file), exist_ok=True)
-            with open(self.history_file, "w") as f:
-                json.dump([], f, indent=2)
+            self._drop_segments(self.segments())
             logger.info("Task history cleared")
         except Exception as e:
             logger.error(f"Error clearing task history: {str(e)}")
@@ -0,0 +1,160 @@
+"""
+Hourly per-stack task counts over the day-segmented task history
+
+The snapshot file holds:
+  - `hours`: UTC hour ("YYYY-MM-DDTHH") -> stack -> accept outcome -> count,
+    kept for ROLLUP_RETENTION_DAYS, independently of history retention;
+  - `segments`: how many bytes of each history segment have been counted;
+  - `tasks`: task id -> the [hour, stack, outcome] it is counted under.
+
+A task logged again after the end-of-day dedup reset moves to the bucket of
+its latest entry instead of being counted twice, as the SQLite backend keeps
+only the latest row per task id.
+
+Bringing the rollups up to date only reads the lines appended to a segment
+since its recorded offset, like the task-id index in TaskHistory. The snapshot
+is written every `save_every` new lines rather than on every task; a process
+that exits before then leaves the remainder for the next one to count.
+"""
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+
+from ..config import ROLLUP_RETENTION_DAYS
+from ..utils import json_codec
+from .task_classifier import get_task_stack_type
+
+logger = logging.getLogger()
+
+SAVE_EVERY = 200
+MANUAL = "manual"
+
+
+def stack_totals(rows):
+    """Sum (hour, stack, {outcome: count}) rows into {stack: task count}"""
+    totals = {}
+    for _, stack, counts in rows:
+        totals[stack] = totals.get(stack, 0) + sum(counts.values())
+    return totals
+
+
+def hour_key(timestamp):
+    """UTC hour bucket of an ISO timestamp or datetime"""
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    return timestamp.astimezone(timezone.utc).strftime("%Y-%m-%dT%H")
+
+
+def rollup_key(entry):
+    """(hour, stack, outcome) bucket of a history entry; `other` is reclassified by skills, as in the daily summary"""
+    stack = entry.get("stack_type", "frontend")
+    if stack == "other":
+        stack = get_task_stack_type(entry)
+    return hour_key(entry["timestamp"]), stack, entry.get("accept_outcome") or MANUAL
+
+
+class TaskRollups:
+    """JSON snapshot of the hourly counts, cached in memory and re-read only when another process saved it"""
+
+    def __init__(self, rollup_file="src/data/task_history/rollups.json", retention_days=ROLLUP_RETENTION_DAYS, save_every=SAVE_EVERY):
+        self.rollup_file = rollup_file
+        self.retention_days = retention_days
+        self.save_every = save_every
+        self._data = None
+        self._stamp = None
+        self._unsaved = 0
+
+    @staticmethod
+    def _empty():
+        return {"segments": {}, "hours": {}, "tasks": {}}
+
+    def exists(self):
+        return os.path.exists(self.rollup_file)
+
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.rollup_file)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def load(self):
+        stamp = self._file_stamp()
+        if self._data is not None and (stamp is None or stamp == self._stamp):
+            return self._data
+
+        # Saved by another process: its counts and offsets agree with each other,
+        # anything we had not saved yet is counted again from its offsets
+        data = self._empty()
+        if stamp is not None:
+            try:
+                with open(self.rollup_file, "rb") as f:
+                    data.update(json_codec.load(f))
+            except ValueError:
+                logger.warning(f"Rollup file {self.rollup_file} corrupted, recounting the history")
+        self._data = data
+        self._unsaved = 0
+        self._stamp = stamp
+        return self._data
+
+    def save(self):
+        if self._data is None:
+            return
+        self._prune(self._data)
+        directory = os.path.dirname(self.rollup_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_file = self.rollup_file + ".tmp"
+        with open(temp_file, "wb") as f:
+            f.write(json_codec.dumpb(self._data))
+        os.replace(temp_file, self.rollup_file)
+        self._stamp = self._file_stamp()
+        self._unsaved = 0
+
+    def _prune(self, data):
+        oldest_hour = hour_key(datetime.now(timezone.utc) - timedelta(days=self.retention_days))
+        for key in [key for key in data["hours"] if key < oldest_hour]:
+            del data["hours"][key]
+        tasks = data["tasks"]
+        for task_id in [task_id for task_id, key in tasks.items() if key[0] < oldest_hour]:
+            del tasks[task_id]
+
+    def add(self, entry):
+        """Count one history entry, uncounting an earlier entry of the same task"""
+        hour, stack, outcome = rollup_key(entry)
+        if entry.get("task_id") is not None:
+            task_id = str(entry["task_id"])
+            previous = self._data["tasks"].get(task_id)
+            if previous:
+                self._uncount(*previous)
+            self._data["tasks"][task_id] = [hour, stack, outcome]
+        counts = self._data["hours"].setdefault(hour, {}).setdefault(stack, {})
+        counts[outcome] = counts.get(outcome, 0) + 1
+
+    def _uncount(self, hour, stack, outcome):
+        stacks = self._data["hours"].get(hour, {})
+        counts = stacks.get(stack, {})
+        if outcome not in counts:
+            return  # pruned with its hour
+        counts[outcome] -= 1
+        if counts[outcome] <= 0:
+            del counts[outcome]
+            if not counts:
+                del stacks[stack]
+                if not stacks:
+                    del self._data["hours"][hour]
+
+    def advance(self, added):
+        """Note `added` newly counted entries (segment offsets already updated), saving every `save_every`"""
+        self._unsaved += added
+        if self._unsaved >= self.save_every or (added and not self.exists()):
+            self.save()
+
+    def hourly_counts(self, since=None):
+        """Yield (hour, stack, {outcome: count}) in hour order, optionally from the hour of `since` on"""
+        start = hour_key(since) if since else ""
+        hours = self._data["hours"]
+        for key in sorted(hours):
+            if key >= start:
+                for stack, counts in sorted(hours[key].items()):
+                    yield key, stack, dict(counts)
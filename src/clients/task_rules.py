@@ -0,0 +1,136 @@
+"""
+Task decision rules shared by the sync and async CaaS clients
+"""
+import hashlib
+import logging
+
+from ..config import AUTO_ACCEPT_ENABLED
+from ..utils.metrics import TASKS_REJECTED, TASKS_SKIPPED, timed
+from ..utils.timezone_utils import now_pakistan
+from .accept_schedule import get_schedule
+from .keyword_matcher import cached_features
+
+logger = logging.getLogger()
+
+# Outcomes of the dedup checks for a task returned by /work/available
+MARK_CANCELLED = "mark_cancelled"
+SKIP_CANCELLED = "skip_cancelled"
+SKIP_NOTIFIED = "skip_notified"
+PROCEED = "proceed"
+# Outcomes after which an identical response needs no further work
+SETTLED_STATES = (SKIP_CANCELLED, SKIP_NOTIFIED)
+# Poll result when /work/available repeated the last settled response
+UNCHANGED = "unchanged"
+
+# Outcomes of an auto-accept attempt on /work/start
+ACCEPT_OK = "accepted"
+ACCEPT_FAILED = "failed"
+ACCEPT_LOST = "lost"
+# /work/start statuses meaning the task was already taken (Conflict, Gone)
+TAKEN_STATUS_CODES = (409, 410)
+
+
+def is_react_native_or_mobile_task(work):
+    """Check if task is related to React Native, Android, or mobile development based on skills only"""
+    return cached_features(work).android
+
+
+@timed("auto_accept_rule")
+def should_auto_accept(work):
+    """Check if a task should be auto-accepted based on time, day of week, and skills only"""
+    if not AUTO_ACCEPT_ENABLED:
+        logger.info("Auto-accept disabled by configuration (AUTO_ACCEPT_ENABLED=false)")
+        TASKS_REJECTED.inc(rule="disabled")
+        return False
+
+    current_datetime = now_pakistan()
+    schedule = get_schedule()
+    if not schedule.is_open(current_datetime):
+        if schedule.is_closed_all_day(current_datetime.date()):
+            logger.info(f"Auto-accept disabled for {current_datetime.date()} (weekday={current_datetime.weekday()}) via configuration")
+            TASKS_REJECTED.inc(rule="weekday")
+        else:
+            logger.info(f"Outside auto-accept time window. Current time: {current_datetime.time()}, next window opens {schedule.next_open(current_datetime)}")
+            TASKS_REJECTED.inc(rule="time_window")
+        return False
+
+    features = cached_features(work)
+    if features.android:
+        logger.info("Task rejected: Contains React Native or mobile development keywords in skills")
+        TASKS_REJECTED.inc(rule="mobile")
+        return False
+
+    if features.frontend or features.backend:
+        logger.info("Task matches auto-accept criteria (frontend or backend keywords found in skills)")
+        return True
+
+    logger.info("Task does not match auto-accept criteria")
+    TASKS_REJECTED.inc(rule="skills")
+    return False
+
+
+@timed("state_check")
+def check_task_state(task_id, mattermost):
+    """Run the dedup checks against the stored last-task state and history"""
+    last_task = mattermost.get_last_task_state()
+    last_task_id = last_task.get("last_task_id")
+    is_already_accepted = last_task.get("accepted", False)
+    was_cancelled = last_task.get("cancelled", False)
+
+    if last_task_id == task_id and is_already_accepted:
+        logger.info(f"Task {task_id} was previously accepted but now available again - marking as cancelled")
+        TASKS_SKIPPED.inc(reason="reappeared_after_accept")
+        return MARK_CANCELLED
+
+    if last_task_id == task_id and was_cancelled:
+        logger.info(f"Task {task_id} was manually cancelled, will not auto-accept again")
+        TASKS_SKIPPED.inc(reason="cancelled")
+        return SKIP_CANCELLED
+
+    if mattermost.has_task_been_notified(task_id):
+        logger.info(f"Task {task_id} already notified, skipping")
+        TASKS_SKIPPED.inc(reason="already_notified")
+        return SKIP_NOTIFIED
+
+    return PROCEED
+
+
+def classify_accept_response(status_code, data):
+    """Map a /work/start response to an accept outcome.
+
+    Only the server's explicit "taken" signals mean another worker won the
+    race: 409/410, or an `error` status in an otherwise successful response.
+    Any other client error (a rejected payload, 403, ...) and anything else
+    that is not `ok` is a plain failure.
+    """
+    if data and data.get('status') == 'ok':
+        return ACCEPT_OK
+    if status_code in TAKEN_STATUS_CODES:
+        return ACCEPT_LOST
+    if 200 <= status_code < 300 and data and data.get('status') == 'error':
+        return ACCEPT_LOST
+    return ACCEPT_FAILED
+
+
+def poll_fingerprint(body, etag=None):
+    """Fingerprint of a raw /work/available body, with the server's ETag when it sent one"""
+    return {"hash": hashlib.blake2b(body, digest_size=16).hexdigest(), "etag": etag}
+
+
+def conditional_headers(previous):
+    """If-None-Match for the previous settled response, when the server gave it an ETag"""
+    if previous and previous.get("etag"):
+        return {"If-None-Match": previous["etag"]}
+    return {}
+
+
+def is_unchanged(previous, status_code, current):
+    """True when a response repeats the previous settled one: a 304, or the same body hash.
+
+    Only responses whose cycle needed no action (no task, or a task already
+    notified or cancelled) are recorded as settled, so a repeat after a
+    notification, an accept or a cancellation still goes through the checks.
+    """
+    if not previous:
+        return False
+    return status_code == 304 or current["hash"] == previous.get("hash")
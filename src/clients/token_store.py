@@ -0,0 +1,147 @@
+"""
+Persistent cache for CaaS access/refresh tokens
+"""
+import base64
+import logging
+import os
+import time
+
+from ..config import TOKEN_REFRESH_MARGIN_SECONDS
+from ..utils import json_codec
+
+logger = logging.getLogger()
+
+
+def decode_jwt_expiry(token):
+    """Return the `exp` claim of a JWT as epoch seconds, or None if it cannot be read"""
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        exp = json_codec.loads(base64.urlsafe_b64decode(payload)).get("exp")
+        return float(exp) if exp is not None else None
+    except (AttributeError, IndexError, TypeError, ValueError):
+        return None
+
+
+def is_token_fresh(expires_at, margin_seconds=0):
+    """Check whether a token expiry (epoch seconds or None for unknown) is still ahead of now"""
+    if expires_at is None:
+        return True
+    return expires_at - margin_seconds > time.time()
+
+
+class TokenStore:
+    """Token cache file; with an `account` (the login email) it only returns tokens saved for that account"""
+
+    def __init__(self, token_file="src/data/auth_tokens.json", account=None):
+        self.token_file = token_file
+        self.account = account
+
+    def load(self):
+        """Load cached tokens, or None when there is no usable cache"""
+        try:
+            if not os.path.exists(self.token_file) or os.path.getsize(self.token_file) == 0:
+                return None
+            with open(self.token_file, "rb") as f:
+                data = json_codec.load(f)
+            if not data.get("access_token"):
+                return None
+            if self.account is not None and data.get("account") != self.account:
+                logger.info("Token cache belongs to another account, ignoring it")
+                return None
+            return data
+        except ValueError:
+            logger.warning("Token cache corrupted, ignoring it")
+            return None
+        except Exception as e:
+            logger.error(f"Error reading token cache: {str(e)}")
+            return None
+
+    def save(self, access_token, refresh_token, user_id):
+        """Persist tokens together with the expiries decoded from the JWTs"""
+        try:
+            os.makedirs(os.path.dirname(self.token_file), exist_ok=True)
+            data = {
+                "account": self.account,
+                "access_token": access_token,
+                "refresh_token": refresh_token,
+                "user_id": user_id,
+                "access_expires_at": decode_jwt_expiry(access_token),
+                "refresh_expires_at": decode_jwt_expiry(refresh_token),
+            }
+            temp_file = self.token_file + ".tmp"
+            with open(temp_file, "wb") as f:
+                f.write(json_codec.dumpb(data))
+            os.chmod(temp_file, 0o600)
+            os.replace(temp_file, self.token_file)
+            return data
+        except Exception as e:
+            logger.error(f"Error saving token cache: {str(e)}")
+            return None
+
+    def clear(self):
+        """Forget cached tokens"""
+        try:
+            if os.path.exists(self.token_file):
+                os.remove(self.token_file)
+        except Exception as e:
+            logger.error(f"Error clearing token cache: {str(e)}")
+
+
+class TokenStateMixin:
+    """Token bookkeeping shared by the sync and async CaaS clients"""
+
+    def _init_token_state(self, headers, token_store=None, account=None):
+        self.access_token = None
+        self.refresh_token = None
+        self.user_id = None
+        self.access_expires_at = None
+        self.refresh_expires_at = None
+        self.headers = headers.copy()
+        self.token_store = token_store or TokenStore()
+        if self.token_store.account is None:
+            self.token_store.account = account
+
+    def _access_token_fresh(self):
+        return is_token_fresh(self.access_expires_at, TOKEN_REFRESH_MARGIN_SECONDS)
+
+    def _refresh_token_usable(self):
+        return bool(self.refresh_token) and is_token_fresh(self.refresh_expires_at)
+
+    def _load_cached_tokens(self):
+        """Load tokens from the cache into the client; returns False when nothing is cached"""
+        cached = self.token_store.load()
+        if not cached:
+            return False
+
+        self._set_tokens(
+            cached["access_token"],
+            cached.get("refresh_token"),
+            cached.get("user_id"),
+            cached.get("access_expires_at"),
+            cached.get("refresh_expires_at"),
+        )
+        return True
+
+    def _apply_auth_data(self, auth_data):
+        refresh_token = auth_data.get('refreshToken') or self.refresh_token
+        user_id = auth_data.get('userId', self.user_id)
+        saved = self.token_store.save(auth_data['accessToken'], refresh_token, user_id) or {}
+        self._set_tokens(
+            auth_data['accessToken'],
+            refresh_token,
+            user_id,
+            saved.get("access_expires_at"),
+            saved.get("refresh_expires_at"),
+        )
+
+    def _set_tokens(self, access_token, refresh_token, user_id, access_expires_at=None, refresh_expires_at=None):
+        self.access_token = access_token
+        self.refresh_token = refresh_token
+        self.user_id = user_id
+        self.access_expires_at = access_expires_at
+        self.refresh_expires_at = refresh_expires_at
+        self.headers['authorization'] = f'Bearer {self.access_token}'
+
+    def _unauthenticated_headers(self):
+        return {k: v for k, v in self.headers.items() if k != 'authorization'}
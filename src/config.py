@@ -2,7 +2,7 @@
 Configuration settings for CaaS automation
 """
 import os
-from datetime import datetime
+from datetime import time
 
 from dotenv import load_dotenv
 
@@ -14,6 +14,29 @@ BASE_URL = os.getenv('CAAS_BASE_URL', "https://prod.bh.caas.ai/backend/api/v1")
 SIGNIN_URL = f"{BASE_URL}/signin"
 AVAILABLE_TASKS_URL = f"{BASE_URL}/work/available"
 START_WORK_URL = f"{BASE_URL}/work/start"
+REFRESH_TOKEN_URL = os.getenv('CAAS_REFRESH_TOKEN_URL', f"{BASE_URL}/refresh-token")
+
+
+def get_api_urls(base_url=None, refresh_url=None):
+    """Endpoint URLs for `base_url`, defaulting to the configured CAAS_BASE_URL.
+
+    CAAS_REFRESH_TOKEN_URL belongs to the default base URL only; another base
+    URL refreshes at its own /refresh-token unless `refresh_url` is given.
+    """
+    if not base_url:
+        return {
+            "signin": SIGNIN_URL,
+            "available": AVAILABLE_TASKS_URL,
+            "start": START_WORK_URL,
+            "refresh": refresh_url or REFRESH_TOKEN_URL,
+        }
+    base_url = base_url.rstrip("/")
+    return {
+        "signin": f"{base_url}/signin",
+        "available": f"{base_url}/work/available",
+        "start": f"{base_url}/work/start",
+        "refresh": refresh_url or f"{base_url}/refresh-token",
+    }
 
 # User credentials
 CREDENTIALS = {
@@ -48,10 +71,13 @@ WEEKDAY_TO_INDEX = {
 
 
 def _parse_time(value, fallback):
+    # "HH:MM" by hand: datetime.strptime would import _strptime (and locale, calendar) on every start
     try:
-        return datetime.strptime(value, "%H:%M").time()
-    except (TypeError, ValueError):
-        return datetime.strptime(fallback, "%H:%M").time()
+        hour, minute = value.split(":")
+        return time(int(hour), int(minute))
+    except (AttributeError, TypeError, ValueError):
+        hour, minute = fallback.split(":")
+        return time(int(hour), int(minute))
 
 
 def _parse_days(value, fallback):
@@ -65,6 +91,19 @@ def _parse_days(value, fallback):
     return {WEEKDAY_TO_INDEX[day.strip().lower()] for day in fallback.split(",") if day.strip().lower() in WEEKDAY_TO_INDEX}
 
 
+def _parse_windows(value, start, end):
+    """Comma-separated "HH:MM-HH:MM" windows, or the single `start`-`end` window when unset"""
+    windows = [window.strip() for window in (value or "").split(",") if window.strip()]
+    return windows or [f"{start:%H:%M}-{end:%H:%M}"]
+
+
+def _parse_float(value, fallback):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return fallback
+
+
 def _parse_bool(value, fallback=True):
     """Parse env value to bool: true/1/yes (case-insensitive) -> True; false/0/no -> False; else fallback."""
     if value is None or (isinstance(value, str) and not value.strip()):
@@ -75,6 +114,94 @@ def _parse_bool(value, fallback=True):
 # Master switch: when False, tasks are never auto-accepted; all other behavior unchanged
 AUTO_ACCEPT_ENABLED = _parse_bool(os.getenv("AUTO_ACCEPT_ENABLED"), True)
 
+def _parse_int(value, fallback):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return fallback
+
+
+# Daemon mode: seconds between polls of the available tasks endpoint
+POLL_INTERVAL_SECONDS = max(1.0, _parse_float(os.getenv("POLL_INTERVAL_SECONDS"), 15.0))
+
+# State backend: "json" (files under src/data) or "sqlite" (single WAL-mode database)
+STATE_BACKEND = os.getenv("STATE_BACKEND", "json").strip().lower()
+STATE_DB_PATH = os.getenv("STATE_DB_PATH", "src/data/state.db")
+
+# Days of task history kept by the end-of-day cleanup; older day segments are archived and deleted
+HISTORY_RETENTION_DAYS = max(1, _parse_int(os.getenv("HISTORY_RETENTION_DAYS"), 7))
+
+# Days of hourly per-stack task counts kept in the history rollups
+ROLLUP_RETENTION_DAYS = max(1, _parse_int(os.getenv("ROLLUP_RETENTION_DAYS"), 90))
+
+# Columnar archive of history entries removed by cleanup (src.clients.task_archive)
+ARCHIVE_ENABLED = _parse_bool(os.getenv("ARCHIVE_ENABLED"), True)
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "src/data/archive")
+# auto (zstd when the zstandard package is installed, else gzip), gzip or zstd
+ARCHIVE_CODEC = os.getenv("ARCHIVE_CODEC", "auto").strip().lower()
+# Day blocks older than this are deleted; 0 keeps them forever
+ARCHIVE_RETENTION_DAYS = max(0, _parse_int(os.getenv("ARCHIVE_RETENTION_DAYS"), 400))
+
+# JSON codec for HTTP bodies and state files (src.utils.json_codec):
+# auto (orjson, then msgspec, when installed, else the stdlib), orjson, msgspec or json
+JSON_CODEC = os.getenv("JSON_CODEC", "auto").strip().lower()
+
+# Max number of memoized task classification results
+CLASSIFICATION_CACHE_SIZE = _parse_int(os.getenv("CLASSIFICATION_CACHE_SIZE"), 1024)
+
+# Renew the cached access token this many seconds before it expires
+TOKEN_REFRESH_MARGIN_SECONDS = _parse_float(os.getenv("TOKEN_REFRESH_MARGIN_SECONDS"), 120.0)
+
+# Mattermost outbox: notifications are queued on disk and delivered by a background sender
+NOTIFICATION_OUTBOX_ENABLED = _parse_bool(os.getenv("NOTIFICATION_OUTBOX_ENABLED"), True)
+OUTBOX_CONFIG = {
+    "directory": os.getenv("OUTBOX_DIR", "src/data/outbox"),
+    "base_delay": _parse_float(os.getenv("OUTBOX_RETRY_BASE_SECONDS"), 2.0),
+    "max_delay": _parse_float(os.getenv("OUTBOX_RETRY_MAX_SECONDS"), 300.0),
+    "batch_size": max(1, _parse_int(os.getenv("OUTBOX_BATCH_SIZE"), 100)),
+    "flush_timeout": _parse_float(os.getenv("OUTBOX_FLUSH_TIMEOUT_SECONDS"), 30.0),
+}
+
+# Webhook traffic shaping: task notifications queued within `coalesce_seconds` of each other go out
+# as one post (outbox only), and posts are limited to `rate_per_second` with bursts of `burst`
+MATTERMOST_DELIVERY_CONFIG = {
+    "coalesce_seconds": max(0.0, _parse_float(os.getenv("MATTERMOST_COALESCE_SECONDS"), 2.0)),
+    "coalesce_max": max(1, _parse_int(os.getenv("MATTERMOST_COALESCE_MAX"), 10)),
+    "rate_per_second": _parse_float(os.getenv("MATTERMOST_RATE_LIMIT_PER_SECOND"), 1.0),
+    "burst": _parse_float(os.getenv("MATTERMOST_RATE_LIMIT_BURST"), 5.0),
+}
+
+# Multi-account mode: JSON file listing the CaaS accounts to poll, and the size of the poller pool
+ACCOUNTS_FILE = os.getenv("CAAS_ACCOUNTS_FILE", "")
+ACCOUNT_WORKERS = max(1, _parse_int(os.getenv("ACCOUNT_WORKERS"), 4))
+
+# Metrics export: /metrics port for daemon mode (0 = off) and/or a node_exporter textfile path
+METRICS_PORT = _parse_int(os.getenv("METRICS_PORT"), 0)
+METRICS_ADDR = os.getenv("METRICS_ADDR", "127.0.0.1")
+METRICS_TEXTFILE = os.getenv("METRICS_TEXTFILE", "")
+
+# Single-instance lock around each poll run: with policy "skip" a run gives up at once while another
+# one holds it, with "wait" it retries for up to RUN_LOCK_WAIT_MS first
+RUN_LOCK_ENABLED = _parse_bool(os.getenv("RUN_LOCK_ENABLED"), True)
+RUN_LOCK_CONFIG = {
+    "path": os.getenv("RUN_LOCK_FILE", "src/data/poll.lock"),
+    "policy": os.getenv("RUN_LOCK_POLICY", "skip").strip().lower(),
+    "wait_ms": max(0, _parse_int(os.getenv("RUN_LOCK_WAIT_MS"), 5000)),
+}
+
+# Startup-time budget for `run_caas_check.py --startup-profile`, in milliseconds (0 = report only)
+STARTUP_BUDGET_MS = max(0.0, _parse_float(os.getenv("STARTUP_BUDGET_MS"), 0.0))
+
+# Shared HTTP session settings (connection pool, keep-alive and retries)
+HTTP_CONFIG = {
+    "pool_connections": _parse_int(os.getenv("HTTP_POOL_CONNECTIONS"), 4),
+    "pool_maxsize": _parse_int(os.getenv("HTTP_POOL_MAXSIZE"), 10),
+    "max_retries": _parse_int(os.getenv("HTTP_MAX_RETRIES"), 2),
+    "backoff_factor": _parse_float(os.getenv("HTTP_BACKOFF_FACTOR"), 0.3),
+    "keep_alive": _parse_bool(os.getenv("HTTP_KEEP_ALIVE"), True),
+    "timeout": _parse_float(os.getenv("HTTP_TIMEOUT_SECONDS"), 15.0),
+}
+
 
 AUTO_ACCEPT_CONFIG = {
     "enabled_days": _parse_days(
@@ -90,9 +217,16 @@ AUTO_ACCEPT_CONFIG = {
     "extended_start": _parse_time(os.getenv("AUTO_ACCEPT_EXTENDED_START", "06:00"), "06:00"),
     "extended_end": _parse_time(os.getenv("AUTO_ACCEPT_EXTENDED_END", "22:00"), "22:00"),
 }
-
-
-def get_auto_accept_window(weekday):
-    if weekday in AUTO_ACCEPT_CONFIG["extended_days"]:
-        return AUTO_ACCEPT_CONFIG["extended_start"], AUTO_ACCEPT_CONFIG["extended_end"]
-    return AUTO_ACCEPT_CONFIG["default_start"], AUTO_ACCEPT_CONFIG["default_end"]
\ No newline at end of file
+# Several "HH:MM-HH:MM" windows per day; when unset the START/END pair is the only window
+AUTO_ACCEPT_CONFIG["default_windows"] = _parse_windows(
+    os.getenv("AUTO_ACCEPT_DEFAULT_WINDOWS"), AUTO_ACCEPT_CONFIG["default_start"], AUTO_ACCEPT_CONFIG["default_end"]
+)
+AUTO_ACCEPT_CONFIG["extended_windows"] = _parse_windows(
+    os.getenv("AUTO_ACCEPT_EXTENDED_WINDOWS"), AUTO_ACCEPT_CONFIG["extended_start"], AUTO_ACCEPT_CONFIG["extended_end"]
+)
+
+# JSON file with per-weekday windows and date overrides (holidays, on-call swaps); empty = none
+AUTO_ACCEPT_SCHEDULE_FILE = os.getenv("AUTO_ACCEPT_SCHEDULE_FILE", "")
+# Daemon mode polls this many seconds before an auto-accept window opens (to refresh the token and
+# connection) and again right at the opening; 0 only aligns a poll with the opening
+SCHEDULE_WARMUP_SECONDS = max(0.0, _parse_float(os.getenv("SCHEDULE_WARMUP_SECONDS"), 30.0))
\ No newline at end of file
@@ -0,0 +1,107 @@
+"""
+JSON codec for HTTP bodies and state files
+
+Uses orjson, or else msgspec, when installed (the optional `fastjson` extra)
+and the stdlib json module otherwise; `JSON_CODEC` picks one explicitly. Output
+is always compact: nothing here is read by people, so there is no indentation
+and no spaces after separators. Every backend raises a ValueError subclass on
+bad input, so callers catch `ValueError` whichever one is active.
+"""
+import json
+import logging
+
+try:
+    import orjson
+except ImportError:  # optional dependency: pip install "caas-automation[fastjson]"
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # optional dependency, used when orjson is missing
+    msgspec = None
+
+from ..config import JSON_CODEC
+
+logger = logging.getLogger()
+
+BACKENDS = ("orjson", "msgspec", "json")
+
+
+class JSONDecodeError(ValueError):
+    """Raised by the msgspec backend, whose own decode error is not a ValueError"""
+
+
+def resolve_backend(name):
+    """'auto' picks orjson, then msgspec, then the stdlib json module"""
+    name = (name or "auto").strip().lower()
+    if name == "auto":
+        return "orjson" if orjson is not None else "msgspec" if msgspec is not None else "json"
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown JSON codec '{name}', expected auto, {', '.join(BACKENDS)}")
+    if (name == "orjson" and orjson is None) or (name == "msgspec" and msgspec is None):
+        raise ImportError(f"JSON codec {name} is not installed: pip install 'caas-automation[fastjson]'")
+    return name
+
+
+def _json_dumpb(obj):
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+def _json_loads(data):
+    return json.loads(data)
+
+
+def _orjson_dumpb(obj):
+    # Plain json turns int keys into strings; orjson only does when asked
+    return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _msgspec_loads(data):
+    try:
+        return msgspec.json.decode(data)
+    except msgspec.DecodeError as e:
+        raise JSONDecodeError(str(e)) from None
+
+
+def _select(name):
+    if name == "orjson":
+        return _orjson_dumpb, orjson.loads
+    if name == "msgspec":
+        return msgspec.json.encode, _msgspec_loads
+    return _json_dumpb, _json_loads
+
+
+try:
+    BACKEND = resolve_backend(JSON_CODEC)
+except (ImportError, ValueError) as e:
+    logger.warning(f"{str(e)}; using the best available JSON codec")
+    BACKEND = resolve_backend("auto")
+_dumpb, _loads = _select(BACKEND)
+
+
+def use_backend(name):
+    """Switch the codec for the rest of the process (benchmarks compare them this way)"""
+    global BACKEND, _dumpb, _loads
+    BACKEND = resolve_backend(name)
+    _dumpb, _loads = _select(BACKEND)
+    return BACKEND
+
+
+def dumpb(obj):
+    """Compact JSON as UTF-8 bytes"""
+    return _dumpb(obj)
+
+
+def dumps(obj):
+    """Compact JSON as str"""
+    return _dumpb(obj).decode()
+
+
+def loads(data):
+    """Decode JSON from str or bytes"""
+    return _loads(data)
+
+
+def load(f):
+    """Decode the JSON document in a file opened in text or binary mode"""
+    return _loads(f.read())
@@ -0,0 +1,260 @@
+"""
+Process-local metrics in the Prometheus text exposition format
+
+Metrics live in memory for the life of the process. In daemon mode they can be
+served on /metrics (METRICS_PORT) and/or written to a node_exporter textfile
+(METRICS_TEXTFILE) after every poll cycle. A one-shot cron run only covers its
+own cycle, so use the textfile there.
+"""
+import functools
+import inspect
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger()
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _labels(self, key, extra=()):
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def samples(self):
+        with self._lock:
+            if not self.labelnames and not self._values:
+                # Unlabelled series start at 0 so alerts on them work before the first event
+                return [(self.name, 0)]
+            return [(self.name + self._labels(key), value) for key, value in sorted(self._values.items())]
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0.0)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def set_to_current_time(self, **labels):
+        self.set(time.time(), **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def value(self, **labels):
+        """Number of observations recorded for these labels"""
+        counts, _ = self._values.get(self._key(labels), ([0], 0.0))
+        return counts[-1]
+
+    def samples(self):
+        lines = []
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, counts):
+                    lines.append((f"{self.name}_bucket" + self._labels(key, [("le", _format_value(bound))]), count))
+                lines.append((f"{self.name}_sum" + self._labels(key), total))
+                lines.append((f"{self.name}_count" + self._labels(key), counts[-1]))
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """All metrics in the Prometheus text format"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{name} {_format_value(value)}" for name, value in metric.samples())
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        for metric in self._metrics:
+            metric.clear()
+
+
+REGISTRY = Registry()
+
+PHASE_SECONDS = REGISTRY.register(Histogram(
+    "caas_phase_duration_seconds",
+    "Wall-clock time spent in each phase of the poll/accept/notify pipeline",
+    ["phase"],
+))
+POLLS = REGISTRY.register(Counter(
+    "caas_polls_total",
+    "Polls of /work/available by result (task, empty, unchanged, error)",
+    ["result"],
+))
+LAST_SUCCESSFUL_POLL = REGISTRY.register(Gauge(
+    "caas_last_successful_poll_timestamp_seconds",
+    "Unix time of the last poll that got a valid answer from /work/available",
+))
+TASKS_SEEN = REGISTRY.register(Counter(
+    "caas_tasks_seen_total",
+    "Tasks returned by /work/available, including repeats of an already handled task (unless short-circuited as unchanged)",
+))
+TASKS_SKIPPED = REGISTRY.register(Counter(
+    "caas_tasks_skipped_total",
+    "Tasks dropped by the dedup/state checks, by reason",
+    ["reason"],
+))
+TASKS_REJECTED = REGISTRY.register(Counter(
+    "caas_tasks_rejected_total",
+    "Tasks not auto-accepted, by the rule that rejected them",
+    ["rule"],
+))
+ACCEPT_ATTEMPTS = REGISTRY.register(Counter(
+    "caas_accept_attempts_total",
+    "Auto-accept attempts on /work/start by outcome (accepted, lost, failed)",
+    ["outcome"],
+))
+NOTIFICATIONS_FAILED = REGISTRY.register(Counter(
+    "caas_notifications_failed_total",
+    "Mattermost webhook posts that failed",
+))
+OUTBOX_PENDING = REGISTRY.register(Gauge(
+    "caas_outbox_pending_messages",
+    "Notifications queued in the Mattermost outbox and not yet delivered",
+))
+OUTBOX_DEAD_LETTERS = REGISTRY.register(Counter(
+    "caas_outbox_dead_letters_total",
+    "Outbox messages the webhook rejected permanently, moved to the failed/ directory",
+))
+SKIPPED_RUNS = REGISTRY.register(Counter(
+    "caas_skipped_runs_total",
+    "Poll runs (or daemon cycles) skipped because another process held the run lock",
+))
+
+
+def timed(phase):
+    """Decorator recording the call duration of a sync or async function under `phase`"""
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with PHASE_SECONDS.time(phase=phase):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with PHASE_SECONDS.time(phase=phase):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def write_textfile(path, registry=REGISTRY):
+    """Atomically write the metrics for node_exporter's textfile collector"""
+    try:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_file = path + ".tmp"
+        with open(temp_file, "w") as f:
+            f.write(registry.render())
+        os.replace(temp_file, path)
+    except Exception as e:
+        logger.error(f"Error writing metrics textfile: {str(e)}")
+
+
+def start_http_server(port, addr="127.0.0.1", registry=REGISTRY):
+    """Serve GET /metrics from a daemon thread and return the server"""
+    # Imported here: only daemon mode serves metrics, cron runs never need http.server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((addr, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info(f"Serving metrics on http://{addr}:{server.server_address[1]}/metrics")
+    return server
@@ -0,0 +1,31 @@
+"""Token bucket for client-side rate limiting."""
+
+import threading
+import time
+
+
+class TokenBucket:
+    """Allows `rate` operations per second on average, with bursts of up to `capacity`"""
+
+    def __init__(self, rate, capacity=1.0):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token and return how many seconds the caller has to wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self):
+        """Block until a token is available; returns the time spent waiting"""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+        return delay
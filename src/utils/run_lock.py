@@ -0,0 +1,90 @@
+"""
+Advisory single-instance lock for poll runs
+
+A cron run that overruns into the next tick would otherwise poll against the
+same state as its successor: both pass the "already notified" check, both post
+and both try to accept. RunLock holds an exclusive `fcntl.flock` on a lock file
+for the length of a run. The kernel drops it when the process exits, so a
+crashed run never leaves a stale lock behind. Where fcntl is unavailable
+(Windows) locking is a no-op.
+"""
+import logging
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+logger = logging.getLogger()
+
+# What to do when another process holds the lock
+SKIP = "skip"
+WAIT = "wait"
+
+
+class RunLock:
+    """Exclusive advisory lock on `path`; a `path` of None disables locking.
+
+    With the SKIP policy a busy lock is given up at once; with WAIT it is
+    retried every `poll_interval` seconds for up to `wait_ms` milliseconds.
+    """
+
+    def __init__(self, path, policy=SKIP, wait_ms=0, poll_interval=0.05):
+        if policy not in (SKIP, WAIT):
+            logger.warning(f"Unknown run lock policy '{policy}', using '{SKIP}'")
+            policy = SKIP
+        self.path = path
+        self.policy = policy
+        self.wait_ms = wait_ms
+        self.poll_interval = poll_interval
+        self._fd = None
+
+    @property
+    def held(self):
+        return self._fd is not None
+
+    def acquire(self):
+        """Take the lock; returns False when another process still holds it once the policy gives up"""
+        if self.path is None or fcntl is None or self._fd is not None:
+            return True
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        deadline = time.monotonic() + (self.wait_ms / 1000.0 if self.policy == WAIT else 0.0)
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    os.close(fd)
+                    return False
+                time.sleep(min(self.poll_interval, remaining))
+
+        # Record the holder for whoever finds the lock busy
+        os.ftruncate(fd, 0)
+        os.write(fd, f"{os.getpid()}\n".encode())
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is None:
+            return
+        try:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def holder(self):
+        """Pid written by the current holder, or None"""
+        try:
+            with open(self.path, "r") as f:
+                return int(f.read().strip())
+        except (OSError, TypeError, ValueError):
+            return None
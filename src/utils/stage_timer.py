@@ -0,0 +1,23 @@
+"""Per-stage wall-clock timestamps for a single task pipeline run."""
+
+import time
+
+
+class StageTimer:
+    def __init__(self):
+        self.stages = {}
+
+    def mark(self, stage: str) -> float:
+        self.stages[stage] = time.time()
+        return self.stages[stage]
+
+    def as_dict(self) -> dict:
+        """Stage name -> epoch seconds, in the order the stages were marked"""
+        return dict(self.stages)
+
+    def summary(self) -> str:
+        """Milliseconds since the first stage, e.g. `fetched=+12ms accept_done=+85ms`"""
+        if not self.stages:
+            return ""
+        start = next(iter(self.stages.values()))
+        return " ".join(f"{name}=+{(ts - start) * 1000:.0f}ms" for name, ts in self.stages.items())
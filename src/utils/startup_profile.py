@@ -0,0 +1,142 @@
+"""
+Startup-time profile of the cron entry point (`run_caas_check.py --startup-profile`)
+
+While installed, every module imported for the first time is timed the way
+`python -X importtime` does it (self and cumulative time), and named init
+phases (config, client construction, state init) are timed around the code
+that runs them. Interpreter startup before the profile is installed is not
+included.
+"""
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+class _TimedLoader:
+    """Wraps a module loader to time `exec_module`, then gets out of the module's way"""
+
+    def __init__(self, loader, profile):
+        self._loader = loader
+        self._profile = profile
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        # Code that inspects __loader__/__spec__.loader must see the real loader
+        module.__loader__ = self._loader
+        if module.__spec__ is not None:
+            module.__spec__.loader = self._loader
+        with self._profile._timed_import(module.__name__):
+            self._loader.exec_module(module)
+
+
+class _TimingFinder:
+    """Meta path finder asking the regular finders for the spec and wrapping its loader"""
+
+    def __init__(self, profile):
+        self._profile = profile
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+            spec.loader = _TimedLoader(spec.loader, self._profile)
+        return spec
+
+
+class StartupProfile:
+    """Import and init timings of one process start"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.imports = []  # (module, self seconds, cumulative seconds, nesting depth), in import order
+        self.phases = []  # (phase, seconds)
+        self._children = [0.0]
+        self._finder = None
+
+    def install(self):
+        if self._finder is None:
+            self._finder = _TimingFinder(self)
+            sys.meta_path.insert(0, self._finder)
+        return self
+
+    def uninstall(self):
+        if self._finder is not None:
+            sys.meta_path.remove(self._finder)
+            self._finder = None
+
+    @contextmanager
+    def _timed_import(self, name):
+        depth = len(self._children) - 1
+        self._children.append(0.0)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            cumulative = time.perf_counter() - started
+            children = self._children.pop()
+            self._children[-1] += cumulative
+            self.imports.append((name, cumulative - children, cumulative, depth))
+
+    @contextmanager
+    def phase(self, name):
+        """Time an init phase; imports it triggers are also listed on their own"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - started))
+
+    def total(self):
+        return time.perf_counter() - self.started
+
+    def per_package(self):
+        """Self import time summed per top-level package, slowest first"""
+        totals = defaultdict(float)
+        for name, self_seconds, _, _ in self.imports:
+            totals[name.split(".", 1)[0]] += self_seconds
+        return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+    def report(self, top=15):
+        """Plain dict of the timings in milliseconds"""
+        def ms(seconds):
+            return round(seconds * 1000, 2)
+
+        slowest = sorted(self.imports, key=lambda row: row[1], reverse=True)[:top]
+        return {
+            "total_ms": ms(self.total()),
+            "import_ms": ms(sum(cumulative for _, _, cumulative, depth in self.imports if depth == 0)),
+            "modules_imported": len(self.imports),
+            "phases_ms": {name: ms(seconds) for name, seconds in self.phases},
+            "packages_ms": {name: ms(seconds) for name, seconds in self.per_package()[:top]},
+            "slowest_modules_ms": {name: {"self": ms(self_s), "cumulative": ms(cumulative)} for name, self_s, cumulative, _ in slowest},
+        }
+
+    def format_report(self, top=15):
+        report = self.report(top)
+        lines = [
+            f"Startup: {report['total_ms']:.1f}ms total, {report['import_ms']:.1f}ms importing "
+            f"{report['modules_imported']} modules (interpreter startup not included)",
+            "",
+            "Phases (cumulative, including their imports)",
+        ]
+        lines += [f"  {name:<40} {value:>9.2f}ms" for name, value in report["phases_ms"].items()]
+        lines += ["", "Import time per top-level package (self)"]
+        lines += [f"  {name:<40} {value:>9.2f}ms" for name, value in report["packages_ms"].items()]
+        lines += ["", "Slowest modules (self / cumulative)"]
+        lines += [
+            f"  {name:<40} {times['self']:>9.2f}ms {times['cumulative']:>9.2f}ms"
+            for name, times in report["slowest_modules_ms"].items()
+        ]
+        return "\n".join(lines) + "\n"
@@ -18,3 +18,8 @@ def convert_utc_to_pakistan_time(utc_datetime: Union[str, datetime]) -> datetime
     if isinstance(utc_datetime, str):
         utc_datetime = datetime.fromisoformat(utc_datetime)
     return utc_datetime.astimezone(PAKISTAN_TZ)
+
+
+def pakistan_date_of(utc_datetime: Union[str, datetime]) -> str:
+    """Pakistan date (ISO string) of a UTC datetime or ISO timestamp"""
+    return convert_utc_to_pakistan_time(utc_datetime).date().isoformat()
@@ -0,0 +1,154 @@
+"""
+Auto-accept schedule bitmap: window edges, midnight and week wrap, date overrides and next_open
+"""
+import json
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from src.clients.accept_schedule import AcceptSchedule, load_schedule, parse_minute, parse_window
+from src.utils.timezone_utils import PAKISTAN_TZ
+
+MONDAY, SUNDAY = 0, 6
+SUNDAY_DATE = date(2026, 10, 18)
+MONDAY_DATE = date(2026, 10, 19)
+TUESDAY_DATE = date(2026, 10, 20)
+
+
+def at(day, hour, minute=0, second=0):
+    return datetime(day.year, day.month, day.day, hour, minute, second, tzinfo=PAKISTAN_TZ)
+
+
+def windows(*values):
+    return [parse_window(value) for value in values]
+
+
+def test_parse_minute_accepts_24_00_only_as_an_end():
+    assert parse_minute("00:00") == 0
+    assert parse_minute("17:00") == 1020
+    assert parse_minute("24:00") == 1440
+    for invalid in ("24:01", "25:00", "12:60", "-1:00"):
+        with pytest.raises(ValueError):
+            parse_minute(invalid)
+
+
+def test_end_is_exclusive_at_17_00_00():
+    # The old check was `start <= now <= end`, so 17:00:00 itself was still open
+    schedule = AcceptSchedule({MONDAY: windows("07:00-17:00")})
+
+    assert schedule.is_open(at(MONDAY_DATE, 16, 59, 59))
+    assert not schedule.is_open(at(MONDAY_DATE, 17, 0, 0))
+    assert not schedule.is_open(at(MONDAY_DATE, 6, 59, 59))
+    assert schedule.is_open(at(MONDAY_DATE, 7, 0, 0))
+
+
+def test_window_crossing_midnight_spills_into_the_next_day():
+    schedule = AcceptSchedule({MONDAY: windows("22:00-02:00")})
+
+    assert not schedule.is_open(at(MONDAY_DATE, 21, 59))
+    assert schedule.is_open(at(MONDAY_DATE, 23, 30))
+    assert schedule.is_open(at(TUESDAY_DATE, 1, 59))
+    assert not schedule.is_open(at(TUESDAY_DATE, 2, 0))
+    # Only the day it is configured on starts it
+    assert not schedule.is_open(at(MONDAY_DATE, 1, 0))
+
+
+def test_sunday_window_wraps_to_monday():
+    schedule = AcceptSchedule({SUNDAY: windows("23:00-01:00")})
+
+    assert schedule.is_open(at(SUNDAY_DATE, 23, 30))
+    assert schedule.is_open(at(MONDAY_DATE, 0, 30))
+    assert not schedule.is_open(at(MONDAY_DATE, 1, 0))
+    assert not schedule.is_open(at(SUNDAY_DATE, 0, 30))
+
+
+def test_24_00_runs_to_midnight_without_spilling_over():
+    schedule = AcceptSchedule({MONDAY: windows("18:00-24:00")})
+
+    assert schedule.is_open(at(MONDAY_DATE, 23, 59, 59))
+    assert not schedule.is_open(at(TUESDAY_DATE, 0, 0))
+
+
+def test_date_override_replaces_the_spill_over_from_the_previous_day():
+    schedule = AcceptSchedule({MONDAY: windows("22:00-02:00")}, {TUESDAY_DATE: windows("09:00-10:00")})
+
+    assert schedule.is_open(at(MONDAY_DATE, 23, 0))
+    assert not schedule.is_open(at(TUESDAY_DATE, 1, 0))
+    assert schedule.is_open(at(TUESDAY_DATE, 9, 30))
+    # The following Tuesday gets the weekly spill-over again
+    assert schedule.is_open(at(TUESDAY_DATE + timedelta(days=7), 1, 0))
+
+
+def test_empty_date_override_closes_the_day():
+    schedule = AcceptSchedule({MONDAY: windows("07:00-17:00")}, {MONDAY_DATE: []})
+
+    assert schedule.is_closed_all_day(MONDAY_DATE)
+    assert not schedule.is_open(at(MONDAY_DATE, 12, 0))
+    assert schedule.is_open(at(MONDAY_DATE + timedelta(days=7), 12, 0))
+
+
+def test_date_override_window_crossing_midnight_is_cut_at_24_00():
+    schedule = AcceptSchedule({}, {MONDAY_DATE: windows("22:00-02:00")})
+
+    assert schedule.is_open(at(MONDAY_DATE, 23, 59))
+    assert not schedule.is_open(at(TUESDAY_DATE, 1, 0))
+
+
+def test_next_open_is_now_while_open():
+    schedule = AcceptSchedule({MONDAY: windows("07:00-17:00")})
+    now = at(MONDAY_DATE, 12, 34, 56)
+
+    assert schedule.next_open(now) == now
+    assert schedule.seconds_until_open(now) == 0
+
+
+def test_next_open_finds_the_next_window_start():
+    schedule = AcceptSchedule({MONDAY: windows("07:00-12:00", "13:00-17:00")})
+
+    assert schedule.next_open(at(MONDAY_DATE, 12, 0)) == at(MONDAY_DATE, 13, 0)
+    assert schedule.next_open(at(MONDAY_DATE, 17, 0)) == at(MONDAY_DATE + timedelta(days=7), 7, 0)
+    assert schedule.seconds_until_open(at(MONDAY_DATE, 12, 59, 30)) == 30
+
+
+def test_next_open_skips_a_closed_date():
+    schedule = AcceptSchedule({MONDAY: windows("07:00-17:00")}, {MONDAY_DATE: []})
+
+    assert schedule.next_open(at(SUNDAY_DATE, 20, 0)) == at(MONDAY_DATE + timedelta(days=7), 7, 0)
+
+
+def test_next_open_reaches_a_date_override_beyond_a_week():
+    later = MONDAY_DATE + timedelta(days=30)
+    schedule = AcceptSchedule({}, {later: windows("10:00-11:00")})
+
+    assert schedule.next_open(at(MONDAY_DATE, 0, 0)) == at(later, 10, 0)
+
+
+def test_next_open_is_none_when_nothing_is_scheduled():
+    closed_dates = {MONDAY_DATE + timedelta(days=offset): [] for offset in range(10)}
+
+    for schedule in (AcceptSchedule({}), AcceptSchedule({MONDAY: []}, closed_dates)):
+        assert schedule.next_open(at(MONDAY_DATE, 8, 0)) is None
+        assert schedule.seconds_until_open(at(MONDAY_DATE, 8, 0)) is None
+
+
+def test_load_schedule_applies_weekday_and_date_overrides(tmp_path):
+    path = tmp_path / "schedule.json"
+    path.write_text(json.dumps({
+        "weekly": {"Monday": ["09:00-10:00", "not a window"], "funday": ["00:00-24:00"]},
+        "dates": {TUESDAY_DATE.isoformat(): [], "not-a-date": ["00:00-24:00"]},
+    }))
+
+    schedule = load_schedule(str(path))
+
+    assert schedule.is_open(at(MONDAY_DATE, 9, 30))
+    assert not schedule.is_open(at(MONDAY_DATE, 10, 0))
+    assert schedule.is_closed_all_day(TUESDAY_DATE)
+    assert list(schedule.dates) == [TUESDAY_DATE]
+
+
+def test_unreadable_schedule_file_falls_back_to_the_configured_windows(tmp_path):
+    path = tmp_path / "schedule.json"
+    path.write_text("{broken")
+
+    assert load_schedule(str(path)).minutes == load_schedule(None).minutes
+    assert load_schedule(str(tmp_path / "missing.json")).minutes == load_schedule(None).minutes
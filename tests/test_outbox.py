@@ -0,0 +1,219 @@
+"""
+Outbox delivery: backoff, dead-lettering, coalescing, draining after an outage and claims
+"""
+import os
+import threading
+import time
+
+import pytest
+
+from src.clients.outbox import DELIVERED, REJECTED, RETRY, NotificationOutbox, OutboxSender
+
+
+class FakeWebhook:
+    """Records posted payloads and answers with a scripted result per post (DELIVERED once the script runs out)"""
+
+    def __init__(self, results=()):
+        self.results = list(results)
+        self.posts = []
+        self.times = []
+
+    def __call__(self, payload):
+        self.posts.append(payload)
+        self.times.append(time.monotonic())
+        return self.results.pop(0) if self.results else DELIVERED
+
+    def texts(self):
+        return [post["text"] for post in self.posts]
+
+
+def merge(payloads):
+    return {"text": " + ".join(payload["text"] for payload in payloads)}
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    return NotificationOutbox(str(tmp_path / "outbox"))
+
+
+def enqueue(outbox, *texts, coalesce=False):
+    return [outbox.enqueue({"text": text}, coalesce=coalesce) for text in texts]
+
+
+def test_drain_posts_in_enqueue_order_and_acks(outbox):
+    enqueue(outbox, "one", "two", "three")
+    webhook = FakeWebhook()
+
+    assert OutboxSender(outbox, webhook).drain() == 3
+    assert webhook.texts() == ["one", "two", "three"]
+    assert len(outbox) == 0
+    assert os.listdir(outbox.inflight_directory) == []
+
+
+def test_backoff_doubles_up_to_max_delay(outbox):
+    enqueue(outbox, "one")
+    sender = OutboxSender(outbox, FakeWebhook([RETRY] * 4), base_delay=1.0, max_delay=3.0)
+
+    delays = []
+    for _ in range(4):
+        assert sender.drain() == 0
+        delays.append(round(sender.next_attempt_at - time.time()))
+    assert delays == [1, 2, 3, 3]
+    assert sender.failures == 4
+    assert outbox.load(outbox.pending()[0])["attempts"] == 4
+
+
+def test_success_resets_backoff(outbox):
+    enqueue(outbox, "one")
+    sender = OutboxSender(outbox, FakeWebhook([RETRY]), base_delay=1.0)
+
+    sender.drain()
+    assert sender.failures == 1
+    assert sender.drain() == 1
+    assert sender.failures == 0
+    assert sender.next_attempt_at == 0.0
+
+
+def test_background_sender_retries_when_the_backoff_ends(outbox):
+    enqueue(outbox, "one")
+    webhook = FakeWebhook([RETRY, RETRY])
+    sender = OutboxSender(outbox, webhook, base_delay=0.1, idle_interval=30.0).start()
+    try:
+        deadline = time.monotonic() + 5
+        while len(outbox) and time.monotonic() < deadline:
+            time.sleep(0.02)
+    finally:
+        sender.stop(timeout=1.0)
+
+    assert len(webhook.posts) == 3
+    gaps = [later - earlier for earlier, later in zip(webhook.times, webhook.times[1:])]
+    assert gaps[0] >= 0.09 and gaps[1] >= 0.19
+    # Woken by the backoff, not by the 30s idle interval
+    assert gaps[1] < 5
+
+
+def test_rejected_message_is_dead_lettered_and_the_queue_moves_on(outbox):
+    rejected, delivered = enqueue(outbox, "bad", "good")
+    webhook = FakeWebhook([REJECTED])
+
+    assert OutboxSender(outbox, webhook).drain() == 1
+    assert webhook.texts() == ["bad", "good"]
+    assert len(outbox) == 0
+    assert os.listdir(outbox.failed_directory) == [rejected + ".json"]
+
+
+def test_corrupted_message_is_dead_lettered(outbox):
+    good = enqueue(outbox, "good")[0]
+    with open(os.path.join(outbox.directory, "00000000000000000000-corrupt.json"), "w") as f:
+        f.write("{not json")
+    webhook = FakeWebhook()
+
+    assert OutboxSender(outbox, webhook).drain() == 1
+    assert webhook.texts() == ["good"]
+    assert os.listdir(outbox.failed_directory) == ["00000000000000000000-corrupt.json"]
+    assert good + ".json" not in os.listdir(outbox.failed_directory)
+
+
+def test_coalescible_burst_is_merged_into_one_post(outbox):
+    enqueue(outbox, "a", "b", "c", coalesce=True)
+    enqueue(outbox, "standalone")
+    webhook = FakeWebhook()
+
+    sender = OutboxSender(outbox, webhook, coalesce_window=10.0, merge=merge)
+    assert sender.flush() == 4
+    assert webhook.texts() == ["a + b + c", "standalone"]
+
+
+def test_coalescing_respects_coalesce_max(outbox):
+    enqueue(outbox, "a", "b", "c", coalesce=True)
+    webhook = FakeWebhook()
+
+    OutboxSender(outbox, webhook, coalesce_window=10.0, coalesce_max=2, merge=merge).flush()
+    assert webhook.texts() == ["a + b", "c"]
+
+
+def test_coalescing_waits_for_the_window_before_posting(outbox):
+    enqueue(outbox, "a", coalesce=True)
+    sender = OutboxSender(outbox, FakeWebhook(), coalesce_window=10.0, merge=merge)
+
+    assert 9.0 < sender._coalesce_wait() <= 10.0
+    assert OutboxSender(outbox, FakeWebhook())._coalesce_wait() == 0.0
+
+
+def test_rejected_merged_post_falls_back_to_single_posts(outbox):
+    enqueue(outbox, "a", "b", coalesce=True)
+    webhook = FakeWebhook([REJECTED])
+
+    assert OutboxSender(outbox, webhook, coalesce_window=10.0, merge=merge).flush() == 2
+    assert webhook.texts() == ["a + b", "a", "b"]
+    assert len(outbox) == 0
+
+
+def test_retried_merged_post_returns_every_message_to_the_queue(outbox):
+    enqueue(outbox, "a", "b", coalesce=True)
+    sender = OutboxSender(outbox, FakeWebhook([RETRY]), coalesce_window=10.0, merge=merge)
+
+    assert sender.flush() == 0
+    assert len(outbox) == 2
+    assert os.listdir(outbox.inflight_directory) == []
+
+
+def test_backlog_is_drained_in_one_go_after_an_outage(outbox):
+    enqueue(outbox, *[f"message {i}" for i in range(5)])
+    webhook = FakeWebhook([RETRY, RETRY])
+    sender = OutboxSender(outbox, webhook, base_delay=1.0)
+
+    # The outage: each attempt stops at the first failure and keeps everything queued
+    assert sender.drain() == 0
+    assert sender.drain() == 0
+    assert len(outbox) == 5
+
+    assert sender.drain() == 5
+    assert webhook.texts()[2:] == [f"message {i}" for i in range(5)]
+    assert len(outbox) == 0
+
+
+def test_drain_stops_at_the_deadline(outbox):
+    enqueue(outbox, "one", "two")
+    webhook = FakeWebhook()
+
+    assert OutboxSender(outbox, webhook).drain(deadline=time.time() - 1) == 0
+    assert len(outbox) == 2
+
+
+def test_message_claimed_by_another_sender_is_skipped(outbox):
+    taken, free = enqueue(outbox, "taken", "free")
+    other = NotificationOutbox(outbox.directory)
+    assert other.claim(taken)
+    webhook = FakeWebhook()
+
+    assert OutboxSender(outbox, webhook).drain() == 1
+    assert webhook.texts() == ["free"]
+    assert not outbox.claim(taken)
+
+
+def test_concurrent_senders_post_each_message_once(outbox):
+    enqueue(outbox, *[str(i) for i in range(200)])
+    webhooks = [FakeWebhook() for _ in range(3)]
+    senders = [OutboxSender(NotificationOutbox(outbox.directory), webhook) for webhook in webhooks]
+
+    threads = [threading.Thread(target=sender.drain) for sender in senders]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    posted = [text for webhook in webhooks for text in webhook.texts()]
+    assert sorted(posted, key=int) == [str(i) for i in range(200)]
+
+
+def test_stale_claim_is_returned_to_the_queue(outbox):
+    message_id = enqueue(outbox, "orphaned")[0]
+    assert outbox.claim(message_id)
+    webhook = FakeWebhook()
+
+    # A fresh claim belongs to a live sender
+    assert OutboxSender(outbox, webhook, claim_timeout=60.0).drain() == 0
+    os.utime(outbox._inflight_path(message_id), (0, 0))
+    assert OutboxSender(outbox, webhook, claim_timeout=60.0).drain() == 1
+    assert webhook.texts() == ["orphaned"]
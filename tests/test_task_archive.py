@@ -0,0 +1,154 @@
+"""
+Round trips through the columnar archive: entries -> .cta block -> entries()
+"""
+import os
+from array import array
+from datetime import datetime
+
+import pytest
+
+from src.clients import task_archive
+from src.clients.task_archive import ArchiveBlock, TaskArchive, encode_columns
+
+CODECS = [
+    "gzip",
+    pytest.param("zstd", marks=pytest.mark.skipif(task_archive.zstandard is None, reason="zstandard not installed")),
+]
+
+
+def entry(task_id, timestamp, **fields):
+    data = {
+        "task_id": task_id,
+        "title": f"Task {task_id}",
+        "stack_type": "frontend",
+        "timestamp": timestamp,
+        "priority": "high",
+        "skills": ["react", "typescript"],
+    }
+    data.update(fields)
+    return data
+
+
+ENTRIES = [
+    entry("t1", "2026-03-02T04:10:11.123456+00:00", accept_outcome="accepted",
+          timings={"fetched": 12.5, "accept_done": 80.25}),
+    entry("t2", "2026-03-02T04:10:11+00:00", stack_type="backend", priority="N/A", skills=["python"]),
+    entry(3, "2026-03-02T06:00:00.000001+00:00", title="Ünïcode — title", skills=[], accept_outcome="lost"),
+    entry("t4", "2026-03-02T07:30:45.500000+00:00", stack_type="qa", priority=None, source="import", retries=2),
+]
+
+
+@pytest.fixture(params=CODECS)
+def archive(request, tmp_path):
+    return TaskArchive(str(tmp_path / "archive"), codec=request.param, retention_days=0)
+
+
+def by_time(entries):
+    return sorted(entries, key=lambda item: datetime.fromisoformat(item["timestamp"]))
+
+
+def test_round_trip_keeps_every_field(archive):
+    assert archive.archive(ENTRIES) == len(ENTRIES)
+
+    assert list(archive.iter_entries()) == by_time(ENTRIES)
+
+
+def test_round_trip_keeps_microseconds(archive):
+    archive.archive(ENTRIES)
+
+    timestamps = [item["timestamp"] for item in archive.iter_entries()]
+    assert "2026-03-02T04:10:11.123456+00:00" in timestamps
+    assert "2026-03-02T06:00:00.000001+00:00" in timestamps
+
+
+def test_extra_column_holds_unknown_keys(archive):
+    archive.archive(ENTRIES)
+    block = ArchiveBlock(archive.day_path("2026-03-02"))
+
+    extras = dict(zip(block.column("task_id"), block.column("extra")))
+    assert extras["t1"] == {"timings": {"fetched": 12.5, "accept_done": 80.25}}
+    assert extras["t2"] is None
+    assert extras["t4"] == {"source": "import", "retries": 2}
+
+
+def test_columns_decode_per_row(archive):
+    archive.archive(ENTRIES)
+    block = ArchiveBlock(archive.day_path("2026-03-02"))
+
+    assert block.rows == 4
+    assert block.column("stack_type") == ["backend", "frontend", "frontend", "qa"]
+    assert block.column("skills") == [["python"], ["react", "typescript"], [], ["react", "typescript"]]
+    assert block.column("accept_outcome") == [None, "accepted", "lost", None]
+    assert list(block.column("timestamp")) == [
+        int(datetime.fromisoformat(item["timestamp"]).timestamp()) for item in by_time(ENTRIES)
+    ]
+
+
+def test_encode_columns_matches_the_stored_raw_columns(archive):
+    archive.archive(ENTRIES)
+    block = ArchiveBlock(archive.day_path("2026-03-02"))
+    encoded = encode_columns(by_time(ENTRIES))
+
+    for name in task_archive.COLUMNS:
+        stored = block.raw(name)
+        if isinstance(stored, tuple):
+            assert [list(part) for part in stored] == [list(part) for part in encoded[name]]
+        else:
+            assert list(stored) == list(encoded[name])
+
+
+def test_entries_are_split_into_pakistan_day_blocks(archive):
+    late = entry("late", "2026-03-02T20:30:00+00:00")  # 01:30 on 2026-03-03 in Pakistan
+    archive.archive(ENTRIES + [late])
+
+    assert archive.days() == ["2026-03-02", "2026-03-03"]
+    assert list(ArchiveBlock(archive.day_path("2026-03-03")).entries()) == [late]
+    assert archive.days(start="2026-03-03") == ["2026-03-03"]
+
+
+def test_merging_into_an_existing_day_block(archive):
+    first, second = ENTRIES[:2], ENTRIES[2:]
+    archive.archive(first)
+
+    repeated = dict(ENTRIES[0], title="changed after archiving")
+    assert archive.archive(second + [repeated]) == len(second)
+
+    merged = list(archive.iter_entries())
+    assert merged == by_time(ENTRIES)
+    assert [item["task_id"] for item in merged].count("t1") == 1
+
+
+def test_merging_adds_nothing_when_every_entry_is_archived(archive):
+    archive.archive(ENTRIES)
+    path = archive.day_path("2026-03-02")
+    before = os.stat(path).st_mtime_ns
+
+    assert archive.archive(ENTRIES) == 0
+    assert os.stat(path).st_mtime_ns == before
+
+
+def test_version_1_block_reads_whole_seconds(archive, monkeypatch):
+    parts = task_archive._Encoder.parts
+
+    def version_1_parts(encoder):
+        for name, column, data in parts(encoder):
+            if name == "timestamp":
+                seconds = task_archive._to_seconds(encoder.timestamps)
+                deltas = array("q", (current - previous for previous, current in zip([0] + list(seconds), seconds)))
+                column, data = {"encoding": "delta"}, [("q", task_archive._to_bytes(deltas))]
+            yield name, column, data
+
+    monkeypatch.setattr(task_archive._Encoder, "parts", version_1_parts)
+    archive.archive(ENTRIES[:1])
+
+    restored = next(archive.iter_entries())
+    assert restored["timestamp"] == "2026-03-02T04:10:11+00:00"
+    assert restored["timings"] == ENTRIES[0]["timings"]
+
+
+def test_non_block_file_is_rejected(tmp_path):
+    path = tmp_path / "2026-03-02.cta"
+    path.write_bytes(b"JUNK\x00\x00\x00\x00")
+
+    with pytest.raises(ValueError):
+        ArchiveBlock(str(path))